@@ -93,6 +93,14 @@ class VirtTestOptionsProcess(object):
         set_opt_from_settings(self.config, "vt.qemu", "defconfig", default="yes")
         set_opt_from_settings(self.config, "vt.qemu", "malloc_perturb", default="yes")
 
+        # cartesian config section
+        set_opt_from_settings(
+            self.config, "vt", "cartesian_cache", key_type=bool, default=True
+        )
+        set_opt_from_settings(
+            self.config, "vt", "parallel_dicts", key_type=int, default=0
+        )
+
         # debug section
         set_opt_from_settings(
             self.config, "vt.debug", "no_cleanup", key_type=bool, default=False
@@ -545,7 +553,14 @@ class VirtTestOptionsProcess(object):
                     % (vt_type_setting, vt_type, " ".join(SUPPORTED_TEST_TYPES))
                 )
 
-        self.cartesian_parser = cartesian_config.Parser(debug=False)
+        cache_dir = None
+        if get_opt(self.config, "vt.cartesian_cache"):
+            cache_dir = data_dir.get_cache_dir("cartesian")
+        self.cartesian_parser = cartesian_config.Parser(
+            debug=False,
+            cache_dir=cache_dir,
+            parallel_dicts=get_opt(self.config, "vt.parallel_dicts") or 0,
+        )
 
         if vt_config:
             cfg = os.path.abspath(vt_config)
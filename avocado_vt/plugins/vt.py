@@ -68,6 +68,18 @@ def add_basic_vt_options(parser):
         help=help_msg,
     )
 
+    help_msg = (
+        "Number of processes used to generate the cartesian config "
+        "dicts when resolving the tests. Default: sequential generation"
+    )
+    add_option(
+        parser,
+        dest="vt.parallel_dicts",
+        arg="--vt-parallel-dicts",
+        type=int,
+        help=help_msg,
+    )
+
     help_msg = "Choose test type (%s). Default: %%(default)s" % ", ".join(
         SUPPORTED_TEST_TYPES
     )
@@ -24,7 +24,6 @@ down for cluster-based tests.
 import logging
 import os
 import sys
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from avocado.core import exit_codes
 from avocado.core.plugin_interfaces import JobPostTests as Post
@@ -32,6 +31,7 @@ from avocado.core.plugin_interfaces import JobPreTests as Pre
 from avocado.utils.stacktrace import log_exc_info
 
 from virttest.vt_cluster import cluster, node_properties
+from virttest.vt_cluster.node import run_on_nodes
 from virttest.vt_resmgr import resmgr
 
 
@@ -87,40 +87,37 @@ class VTCluster(Pre, Post):
         self._log = logging.getLogger("avocado.app")
 
     @staticmethod
-    def _setup_nodes():
+    def _format_errors(msg, errors):
         """
-        Starts agent servers on all cluster nodes in parallel.
-
-        :raise ClusterSetupError: If starting an agent fails.
+        Format the errors of the nodes that failed into a single report.
+
+        :param msg: The description of what failed.
+        :type msg: str
+        :param errors: The errors by node name, as returned by `run_on_nodes`.
+        :type errors: dict
+        :return: The report listing every failed node with its error.
+        :rtype: str
         """
-        nodes = cluster.get_all_nodes()
-        if not nodes:
-            return
+        lines = [f"{msg} on {len(errors)} node(s):"]
+        lines.extend(f"  {name}: {err}" for name, err in sorted(errors.items()))
+        return "\n".join(lines)
 
-        def __start_node_agent(node):
-            """Helper function to start agent on a single node."""
-            try:
-                node.start_agent_server()
-                return node, None
-            except Exception as err:
-                return node, err
+    def _setup_nodes(self):
+        """
+        Starts agent servers on all cluster nodes in parallel.
 
-        try:
-            with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
-                future_to_node = {
-                    executor.submit(__start_node_agent, node): node for node in nodes
-                }
-
-                for future in as_completed(future_to_node):
-                    node, error = future.result()
-                    if error:
-                        raise ClusterSetupError(
-                            f"Failed to start agent on node '{node.name}': {error}"
-                        )
-        except Exception as err:
-            if isinstance(err, ClusterSetupError):
-                raise
-            raise ClusterSetupError(err)
+        :raise ClusterSetupError: If starting the agent fails on any node,
+                                  listing all the nodes that failed.
+        """
+        errors = run_on_nodes(
+            cluster.get_all_nodes(),
+            lambda node: node.start_agent_server(),
+            "start the agent server",
+        )
+        if errors:
+            raise ClusterSetupError(
+                self._format_errors("Failed to start the agent server", errors)
+            )
 
     @staticmethod
     def _setup_mgr():
@@ -154,57 +151,38 @@ class VTCluster(Pre, Post):
 
         This method is responsible for creating directories for each node's
         logs, uploading the agent logs, and ensuring that agent servers are
-        stopped. It also unloads the node metadata.
+        stopped. It also unloads the node metadata. Failing to stop the agent
+        servers is reported as a single warning listing all the nodes that
+        failed.
 
         :param job: The Avocado job object.
         :type job: avocado.core.job.Job
-        :raises ClusterCleanupError: If stopping an agent server fails (logged as warning).
         """
         cluster_dir = os.path.join(job.logdir, "cluster")
-        nodes = cluster.get_all_nodes()
-
-        if not nodes:
-            return
 
         def __cleanup_agent_node(node):
             """Helper function to cleanup agent on a single node."""
             node_dir = os.path.join(cluster_dir, node.name)
             os.makedirs(node_dir, exist_ok=True)
 
-            upload_error = None
-            stop_error = None
-
             try:
                 remote_path = node.proxy.core.get_agent_log_filename()
                 if remote_path:
                     node.copy_files_from(node_dir, remote_path)
             except Exception as err:
-                upload_error = err
+                self._log.warning(
+                    f"Failed to upload the agent log of node '{node.name}': {err}"
+                )
             finally:
-                try:
-                    node.stop_agent_server()
-                except Exception as stop_err:
-                    stop_error = ClusterCleanupError(stop_err)
-
-                return node, upload_error, stop_error
-
-        with ThreadPoolExecutor(max_workers=len(nodes)) as executor:
-            future_to_node = {
-                executor.submit(__cleanup_agent_node, node): node for node in nodes
-            }
-
-            for future in as_completed(future_to_node):
-                node, upload_error, stop_error = future.result()
-
-                if upload_error:
-                    self._log.warning(upload_error)
-
-                if stop_error:
-                    msg = (
-                        f"Failed to stop the agent "
-                        f"server on node '{node.name}': {stop_error}"
-                    )
-                    self._log.warning(msg)
+                node.stop_agent_server()
+
+        errors = run_on_nodes(
+            cluster.get_all_nodes(), __cleanup_agent_node, "clean up the agent"
+        )
+        if errors:
+            self._log.warning(
+                self._format_errors("Failed to stop the agent server", errors)
+            )
 
     def pre_tests(self, job):
         """
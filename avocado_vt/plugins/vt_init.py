@@ -100,6 +100,30 @@ if hasattr(plugin_interfaces, "Init"):
                 help_msg=help_msg,
             )
 
+            help_msg = (
+                "Cache the compiled cartesian config trees on disk and "
+                "reuse them while none of the parsed files change"
+            )
+            settings.register_option(
+                section,
+                key="cartesian_cache",
+                key_type=bool,
+                default=True,
+                help_msg=help_msg,
+            )
+
+            help_msg = (
+                "Number of processes used to generate the cartesian "
+                "config dicts. The default 0 generates them sequentially"
+            )
+            settings.register_option(
+                section,
+                key="parallel_dicts",
+                key_type=int,
+                default=0,
+                help_msg=help_msg,
+            )
+
             help_msg = (
                 "Also list the available guests (this option ignores "
                 "the --vt-config and --vt-guest-os)"
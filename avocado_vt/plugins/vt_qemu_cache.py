@@ -0,0 +1,68 @@
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; either version 2 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.
+#
+# See LICENSE for more details.
+
+import logging
+import sys
+
+from avocado.core.plugin_interfaces import CLICmd
+
+from virttest import standalone_test, utils_qemu
+from virttest.qemu_devices import qcontainer
+
+LOG = logging.getLogger("avocado.app")
+
+
+class VTQemuCache(CLICmd):
+    """
+    Avocado VT - implements the 'vt-qemu-cache' subcommand
+    """
+
+    name = "vt-qemu-cache"
+    description = "Avocado VT - warm or purge the qemu capability probe cache"
+
+    def configure(self, parser):
+        parser = super(VTQemuCache, self).configure(parser)
+        parser.add_argument(
+            "vt.qemu_cache.action",
+            choices=("warm", "purge"),
+            metavar="ACTION",
+            help=(
+                "Probe the qemu binaries and store their capabilities, or "
+                "remove the stored capabilities"
+            ),
+        )
+        parser.add_argument(
+            "vt.qemu_cache.qemu_bin",
+            nargs="*",
+            metavar="QEMU_BIN",
+            help=(
+                "Path to the qemu binaries. Default: the one found in PATH "
+                "when warming, all the cached ones when purging"
+            ),
+        )
+
+    def run(self, config):
+        qemu_bins = config.get("vt.qemu_cache.qemu_bin")
+        if config.get("vt.qemu_cache.action") == "purge":
+            removed = 0
+            for qemu_bin in qemu_bins or [None]:
+                removed += utils_qemu.purge_probe_cache(qemu_bin)
+            LOG.info("Removed %d cached qemu capabilities", removed)
+            sys.exit(0)
+
+        if not qemu_bins:
+            qemu_bins = standalone_test.find_default_qemu_paths()[:1]
+        for qemu_bin in qemu_bins:
+            # Creating the containers runs all the capability probes
+            qcontainer.DevContainer(qemu_bin, "vt-qemu-cache")
+            qcontainer.DevContainer(qemu_bin, "vt-qemu-cache", probe_mode="qmp")
+            LOG.info("Cached the capabilities of %s", qemu_bin)
+        sys.exit(0)
@@ -36,6 +36,12 @@ class VTResolverUtils(DiscoveryMixIn):
         if reference != "":
             cartesian_parser.only_filter(reference)
 
+        # The dicts are generated one at a time and dropped once converted,
+        # but the runnables are kept in a list: avocado's TestSuite turns
+        # all the resolutions into runnables before the first test starts
+        # (to count them and check their runner requirements), and
+        # "avocado list" goes through them more than once. A lazy
+        # resolution would neither start the job earlier nor save memory.
         runnables = [
             self._parameters_to_runnable(d) for d in cartesian_parser.get_dicts()
         ]
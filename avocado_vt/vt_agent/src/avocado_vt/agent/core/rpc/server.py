@@ -18,8 +18,14 @@ Core XML-RPC server implementation for the agent.
 This module provides the RPCServer class that sets up and manages an
 XML-RPC server, including custom error handling and dynamic registration
 of API functions and external services.
+
+Connections are kept alive between calls, and besides XML-RPC the server
+accepts JSON encoded calls on `JSON_RPC_PATH`, which is what the cluster
+proxies use when the agent supports it.
 """
 
+import base64
+import datetime
 import inspect
 import json
 import logging
@@ -27,8 +33,8 @@ import socket
 import sys
 import traceback
 from socketserver import ThreadingMixIn
-from xmlrpc.client import Fault, dumps, loads
-from xmlrpc.server import SimpleXMLRPCServer
+from xmlrpc.client import Binary, DateTime, Fault, dumps, loads
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
 
 # pylint: disable=E0611
 from avocado_vt.agent.core.logger import DEFAULT_LOG_NAME
@@ -36,6 +42,53 @@ from avocado_vt.agent.services import core
 
 LOG = logging.getLogger(f"{DEFAULT_LOG_NAME}." + __name__)
 
+JSON_RPC_PATH = "/json"
+
+
+def _json_default(obj):
+    """
+    Encode the values JSON lacks the way XML-RPC marshals them.
+    """
+    if isinstance(obj, Binary):
+        obj = obj.data
+    if isinstance(obj, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+    if isinstance(obj, DateTime):
+        return {"__datetime__": obj.value}
+    if isinstance(obj, datetime.datetime):
+        return {"__datetime__": obj.strftime("%Y%m%dT%H:%M:%S")}
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    raise TypeError(f"cannot marshal {type(obj)} objects")
+
+
+def _json_object_hook(obj):
+    """
+    Decode the values encoded by `_json_default` into the same objects
+    the XML-RPC unmarshaller produces.
+    """
+    if len(obj) == 1:
+        if "__bytes__" in obj:
+            return Binary(base64.b64decode(obj["__bytes__"]))
+        if "__datetime__" in obj:
+            return DateTime(obj["__datetime__"])
+    return obj
+
+
+class _RequestHandler(SimpleXMLRPCRequestHandler):
+    """
+    Request handler keeping the connection open between the calls of a
+    client, so a connection is served by a single thread.
+    """
+
+    protocol_version = "HTTP/1.1"
+    rpc_paths = SimpleXMLRPCRequestHandler.rpc_paths + (JSON_RPC_PATH,)
+
+    def send_header(self, keyword, value):
+        if keyword.lower() == "content-type" and self.path == JSON_RPC_PATH:
+            value = "application/json"
+        super().send_header(keyword, value)
+
 
 class _CustomSimpleXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
     """
@@ -60,6 +113,8 @@ class _CustomSimpleXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
             raise
 
     def _marshaled_dispatch(self, data, dispatch_method=None, path=None):
+        if path == JSON_RPC_PATH:
+            return self._json_dispatch(data, dispatch_method)
         try:
             params, method = loads(data, use_builtin_types=self.use_builtin_types)
 
@@ -80,51 +135,109 @@ class _CustomSimpleXMLRPCServer(ThreadingMixIn, SimpleXMLRPCServer):
                 fault, allow_none=self.allow_none, encoding=self.encoding
             )
         except Exception:
-            exc_type, exc_value, exc_tb = sys.exc_info()
-            tb_list = traceback.format_exception(exc_type, exc_value, exc_tb)
-            tb_info_str = "".join(tb_list)
+            response_xml = dumps(
+                self._exception_fault(),
+                encoding=self.encoding,
+                allow_none=self.allow_none,
+            )
+
+        return response_xml.encode(self.encoding, "xmlcharrefreplace")
+
+    def system_multicall(self, call_list):
+        """
+        Run several calls sent in a single request.
 
+        Unlike the default implementation, the fault of a failed call is
+        formatted like the one of a direct call.
+
+        :param call_list: The calls, dicts with their "methodName" and
+                          "params".
+        :return: For each call, a list holding the returned value, or a
+                 dict with the "faultCode" and "faultString" of its fault.
+        """
+        results = []
+        for call in call_list:
             try:
-                mod = getattr(exc_type, "__module__", "")
-                if mod and mod not in ("__main__", "builtins"):
-                    exc_type_str = f"{mod}.{exc_type.__name__}"
-                else:
-                    exc_type_str = exc_type.__name__
-
-                exc_value_str = str(exc_value)
-                error_string = (
-                    f"Server Error: {exc_type_str}: {exc_value_str}\n"
-                    f"\nTraceback:\n{tb_info_str}"
-                )
-                exe_info = {
-                    "exc_type": exc_type_str,
-                    "exc_value": exc_value_str,
-                    "tb_info": tb_info_str,
-                }
-                fault_string = json.dumps(exe_info)
-                response_xml = dumps(
-                    Fault(1, fault_string),
-                    encoding=self.encoding,
-                    allow_none=self.allow_none,
+                response = self._dispatch(call["methodName"], call["params"])
+                results.append([response])
+            except Fault as fault:
+                results.append(
+                    {"faultCode": fault.faultCode, "faultString": fault.faultString}
                 )
-                LOG.error(error_string)
-            except Exception as e_dumps:
-                LOG.error(
-                    "Error while formatting an exception for RPC response: %s",
-                    e_dumps,
-                    exc_info=True,
-                )
-                response_xml = dumps(
-                    Fault(
-                        1,
-                        "Server error: An internal error occurred while processing "
-                        "the request and formatting the error response.",
-                    ),
-                    encoding=self.encoding,
-                    allow_none=self.allow_none,
+            except Exception:
+                fault = self._exception_fault()
+                results.append(
+                    {"faultCode": fault.faultCode, "faultString": fault.faultString}
                 )
+        return results
 
-        return response_xml.encode(self.encoding, "xmlcharrefreplace")
+    def _json_dispatch(self, data, dispatch_method=None):
+        """
+        Dispatch a JSON encoded call.
+
+        The request is an object with the "method" name and its "params",
+        the response an object with either the "result" of the call or
+        an "error" with the "code" and "message" of the fault.
+        """
+        try:
+            request = json.loads(data, object_hook=_json_object_hook)
+            method, params = request["method"], tuple(request["params"])
+
+            if dispatch_method is not None:
+                response = dispatch_method(method, params)
+            else:
+                response = self._dispatch(method, params)
+
+            return json.dumps({"result": response}, default=_json_default).encode()
+        except Fault as e:
+            fault = e
+        except Exception:
+            fault = self._exception_fault()
+        error = {"code": fault.faultCode, "message": fault.faultString}
+        return json.dumps({"error": error}).encode()
+
+    def _exception_fault(self):
+        """
+        Build the fault reporting the exception being handled.
+
+        The fault string is a JSON object with the "exc_type", "exc_value"
+        and "tb_info" of the exception, used by the client to re-raise it.
+        """
+        exc_type, exc_value, exc_tb = sys.exc_info()
+        tb_list = traceback.format_exception(exc_type, exc_value, exc_tb)
+        tb_info_str = "".join(tb_list)
+
+        try:
+            mod = getattr(exc_type, "__module__", "")
+            if mod and mod not in ("__main__", "builtins"):
+                exc_type_str = f"{mod}.{exc_type.__name__}"
+            else:
+                exc_type_str = exc_type.__name__
+
+            exc_value_str = str(exc_value)
+            error_string = (
+                f"Server Error: {exc_type_str}: {exc_value_str}\n"
+                f"\nTraceback:\n{tb_info_str}"
+            )
+            exe_info = {
+                "exc_type": exc_type_str,
+                "exc_value": exc_value_str,
+                "tb_info": tb_info_str,
+            }
+            fault = Fault(1, json.dumps(exe_info))
+            LOG.error(error_string)
+        except Exception as e_dumps:
+            LOG.error(
+                "Error while formatting an exception for RPC response: %s",
+                e_dumps,
+                exc_info=True,
+            )
+            fault = Fault(
+                1,
+                "Server error: An internal error occurred while processing "
+                "the request and formatting the error response.",
+            )
+        return fault
 
 
 class RPCServer(object):
@@ -153,8 +266,12 @@ class RPCServer(object):
             host, port = "localhost", 0
 
         self._server = _CustomSimpleXMLRPCServer(
-            (host, port), allow_none=True, use_builtin_types=False
+            (host, port),
+            requestHandler=_RequestHandler,
+            allow_none=True,
+            use_builtin_types=False,
         )
+        self._server.register_multicall_functions()
         self._register_core_service()
 
     def _register_core_service(self):
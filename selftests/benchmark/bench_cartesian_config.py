@@ -0,0 +1,58 @@
+#!/usr/bin/python
+"""
+Compare cold and warm (compiled tree cache) parsing of cartesian configs.
+
+Usage: bench_cartesian_config.py [config ...]
+
+Without arguments the configs bundled with the unit tests are used.
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.insert(0, basedir)
+
+from virttest import cartesian_config
+
+testdatadir = os.path.join(basedir, "selftests", "unit", "unittest_data")
+BUNDLED_CONFIGS = [
+    os.path.join(testdatadir, "testcfg.huge", "test1.cfg"),
+    os.path.join(testdatadir, "testcfg.huge", "tests.cfg"),
+]
+
+
+def _time_parse(config, cache_dir, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cartesian_config.Parser(config, cache_dir=cache_dir)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(configs, repeat=5):
+    print("%-60s %10s %10s %8s" % ("config", "cold [s]", "warm [s]", "speedup"))
+    for config in configs:
+        cache_dir = tempfile.mkdtemp(prefix="cartesian_cache_")
+        try:
+            cold = _time_parse(config, None, repeat)
+            # Populate the cache, then measure the reload only
+            cartesian_config.Parser(config, cache_dir=cache_dir)
+            warm = _time_parse(config, cache_dir, repeat)
+        finally:
+            shutil.rmtree(cache_dir)
+        print(
+            "%-60s %10.4f %10.4f %7.1fx"
+            % (os.path.relpath(config, basedir), cold, warm, cold / warm)
+        )
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:] or BUNDLED_CONFIGS)
@@ -0,0 +1,130 @@
+#!/usr/bin/python
+"""
+Measure how long comparing and cropping PPM screendumps takes.
+
+Usage: bench_ppm_utils.py [width height]
+
+The images are random full-HD frames differing in a band of rows, like
+two screendumps of a guest whose clock or cursor changed. The pixel
+walking implementations ppm_utils used before are timed for reference;
+the old image_comparison appends to a bytearray here, as appending to
+bytes makes it quadratic and keeps it busy for many minutes on a full-HD
+frame. ppm_utils uses numpy when it is installed and plain Python
+otherwise.
+"""
+
+import os
+import random
+import struct
+import sys
+import time
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.insert(0, basedir)
+
+from virttest import ppm_utils
+
+
+def legacy_image_crop(width, height, data, x1, y1, dx, dy):
+    newdata = b""
+    index = (x1 + y1 * width) * 3
+    for _ in range(dy):
+        newdata += data[index : (index + dx * 3)]
+        index += width * 3
+    return (dx, dy, newdata)
+
+
+def legacy_image_comparison(width, height, data1, data2):
+    newdata = bytearray()
+    i = 0
+    while i < width * height * 3:
+        pixel1_str = data1[i : i + 3]
+        temp = struct.unpack("BBB", pixel1_str)
+        value1 = int((temp[0] + temp[1] + temp[2]) / 3)
+        pixel2_str = data2[i : i + 3]
+        temp = struct.unpack("BBB", pixel2_str)
+        value2 = int((temp[0] + temp[1] + temp[2]) / 3)
+        value = int((value1 + value2) / 2)
+        value = 128 + value // 2
+        if pixel1_str == pixel2_str:
+            newpixel = [0, value, 0]
+        else:
+            newpixel = [value, 0, 0]
+        newdata += struct.pack("BBB", newpixel[0], newpixel[1], newpixel[2])
+        i += 3
+    return (width, height, bytes(newdata))
+
+
+def legacy_image_fuzzy_compare(width, height, data1, data2):
+    equal = 0.0
+    different = 0.0
+    i = 0
+    while i < width * height * 3:
+        pixel1_str = data1[i : i + 3]
+        pixel2_str = data2[i : i + 3]
+        if pixel1_str == pixel2_str:
+            equal += 1.0
+        else:
+            different += 1.0
+        i += 3
+    return equal / (equal + different)
+
+
+def _make_frames(width, height):
+    data1 = random.Random(0).randbytes(width * height * 3)
+    # Change every other pixel in the middle tenth of the rows
+    data2 = bytearray(data1)
+    row = width * 3
+    for start in range(height * 9 // 20 * row, height * 11 // 20 * row, 6):
+        data2[start] ^= 0xFF
+    return data1, bytes(data2)
+
+
+def _time(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def main(width, height):
+    data1, data2 = _make_frames(width, height)
+    crop = (width // 4, height // 4, width // 2, height // 2)
+    cases = (
+        (
+            "image_crop",
+            legacy_image_crop,
+            ppm_utils.image_crop,
+            (width, height, data1) + crop,
+        ),
+        (
+            "image_comparison",
+            legacy_image_comparison,
+            ppm_utils.image_comparison,
+            (width, height, data1, data2),
+        ),
+        (
+            "image_fuzzy_compare",
+            legacy_image_fuzzy_compare,
+            ppm_utils.image_fuzzy_compare,
+            (width, height, data1, data2),
+        ),
+    )
+    print("%dx%d, numpy: %s" % (width, height, ppm_utils.numpy is not None))
+    print("%-20s %10s %10s %8s" % ("", "old [s]", "new [s]", "speedup"))
+    for name, old, new, args in cases:
+        old_time, old_result = _time(old, *args)
+        new_time, new_result = _time(new, *args)
+        assert old_result == new_result, "%s results differ" % name
+        print(
+            "%-20s %10.4f %10.4f %7.1fx"
+            % (name, old_time, new_time, old_time / new_time)
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        main(int(sys.argv[1]), int(sys.argv[2]))
+    else:
+        main(1920, 1080)
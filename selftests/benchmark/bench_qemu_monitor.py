@@ -0,0 +1,82 @@
+#!/usr/bin/python
+"""
+Measure how fast QMPMonitor reads and decodes large QMP responses.
+
+Usage: bench_qemu_monitor.py [size_in_MiB ...]
+
+Each response is sent over a socket pair by a separate thread, the way
+qemu streams replies such as query-qmp-schema, and read with
+QMPMonitor._read_objects().
+"""
+
+import collections
+import json
+import os
+import socket
+import sys
+import threading
+import time
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.insert(0, basedir)
+
+from virttest import qemu_monitor
+
+
+class BenchQMPMonitor(qemu_monitor.QMPMonitor):
+    def __init__(self, sock):  # pylint: disable=W0231
+        self._socket = sock
+        self._server_closed = False
+        self._buffer = bytearray()
+        self._events = collections.deque(maxlen=self.EVENTS_MAXLEN)
+        self._responses = []
+        self._received = 0
+        self._cond = threading.Condition()
+        self._reader = None
+        self._reader_running = False
+
+    def __del__(self):
+        pass
+
+    def _log_lines(self, log_str):
+        pass
+
+
+def _make_response(size):
+    node = {"name": "x" * 200, "meta-type": "object", "members": []}
+    count = size // len(json.dumps(node)) + 1
+    return json.dumps({"return": [node] * count, "id": "bench"}).encode() + b"\r\n"
+
+
+def _time_read(data, repeat):
+    best = None
+    for _ in range(repeat):
+        sock, peer = socket.socketpair()
+        monitor = BenchQMPMonitor(peer)
+        sender = threading.Thread(target=sock.sendall, args=(data,))
+        start = time.perf_counter()
+        sender.start()
+        objs = []
+        while not objs:
+            objs = monitor._read_objects()
+        elapsed = time.perf_counter() - start
+        sender.join()
+        sock.close()
+        peer.close()
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes, repeat=3):
+    print("%10s %10s %12s" % ("size [MiB]", "time [s]", "MiB/s"))
+    for size in sizes:
+        data = _make_response(int(size * 1024 * 1024))
+        elapsed = _time_read(data, repeat)
+        mib = len(data) / 1024.0 / 1024.0
+        print("%10.1f %10.4f %12.1f" % (mib, elapsed, mib / elapsed))
+
+
+if __name__ == "__main__":
+    main([float(size) for size in sys.argv[1:]] or [1, 4, 16])
@@ -0,0 +1,82 @@
+#!/usr/bin/python
+"""
+Measure how long saving and loading an env file holding many VMs takes.
+
+Usage: bench_utils_env.py [number_of_vms]
+
+The VMs are qemu VM objects sharing one address cache, each holding a
+parameter dict of the size cartesian configs usually produce.
+"""
+
+import os
+import pickle
+import shutil
+import sys
+import tempfile
+import time
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.insert(0, basedir)
+
+from virttest import ip_sniffing, qemu_vm, utils_env, utils_params
+
+
+def _make_env(filename, vms):
+    env = utils_env.Env(filename, utils_env.get_env_version())
+    env["address_cache"] = ip_sniffing.AddrCache()
+    for index in range(vms):
+        name = "vm%d" % index
+        params = {"main_vm": name, "vms": name, "nics": "nic1", "images": "image1"}
+        params.update(("param_%d" % i, "value %d " % i * 4) for i in range(1500))
+        vm = qemu_vm.VM(name, utils_params.Params(params), "/tmp", env["address_cache"])
+        env.register_vm(name, vm)
+    return env
+
+
+def _best(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(vms, repeat=5):
+    tmpdir = tempfile.mkdtemp(prefix="env_bench_")
+    filename = os.path.join(tmpdir, "env")
+    try:
+        env = _make_env(filename, vms)
+
+        def save_legacy():
+            with open(filename, "wb") as env_file:
+                pickle.dump(env.data, env_file, protocol=0)
+
+        def save_changed():
+            env["changing"] = time.perf_counter()
+            env.save()
+
+        legacy_save = _best(save_legacy, repeat)
+        legacy_size = os.path.getsize(filename)
+        legacy_load = _best(lambda: utils_env.Env(filename), repeat)
+        save = _best(save_changed, repeat)
+        size = os.path.getsize(filename)
+        unchanged = _best(env.save, repeat)
+        load = _best(lambda: utils_env.Env(filename), repeat)
+    finally:
+        shutil.rmtree(tmpdir)
+    print("%d VMs" % vms)
+    print("%-22s %10s %10s %10s" % ("", "save [s]", "load [s]", "size [KiB]"))
+    print(
+        "%-22s %10.4f %10.4f %10d"
+        % ("protocol 0", legacy_save, legacy_load, legacy_size // 1024)
+    )
+    print("%-22s %10.4f %10.4f %10d" % ("Env.save", save, load, size // 1024))
+    print("%-22s %10.4f" % ("Env.save (unchanged)", unchanged))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50)
@@ -0,0 +1,52 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest import bootstrap
+
+
+class SubtestTypesTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cfg = os.path.join(self.tmpdir, "boot.cfg")
+        with open(self.cfg, "w") as cfg_file:
+            cfg_file.write("- boot:\n    type = boot reboot\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_parse(self):
+        types_cache = {}
+        types = bootstrap._get_subtest_types(self.cfg, types_cache)
+        self.assertEqual(types, ["boot", "reboot"])
+        self.assertEqual(types_cache[self.cfg][2], types)
+
+    def test_cached(self):
+        types_cache = {}
+        bootstrap._get_subtest_types(self.cfg, types_cache)
+        parser = "virttest.bootstrap.cartesian_config.Parser"
+        with patch(parser, side_effect=AssertionError("parsed again")):
+            types = bootstrap._get_subtest_types(self.cfg, types_cache)
+        self.assertEqual(types, ["boot", "reboot"])
+
+    def test_modified(self):
+        types_cache = {}
+        bootstrap._get_subtest_types(self.cfg, types_cache)
+        with open(self.cfg, "w") as cfg_file:
+            cfg_file.write("- boot:\n    type = shutdown\n")
+        types = bootstrap._get_subtest_types(self.cfg, types_cache)
+        self.assertEqual(types, ["shutdown"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,7 +2,9 @@
 
 import gzip
 import os
+import shutil
 import sys
+import tempfile
 import unittest
 
 # simple magic for using scripts within a source tree
@@ -1369,11 +1371,125 @@ class CartesianConfigTest(unittest.TestCase):
             True,
         )
 
+    def testFilterPruning(self):
+        p = cartesian_config.Parser()
+        p.parse_string(
+            """
+            variants:
+                - a:
+                - b:
+            variants:
+                - x:
+                - y:
+                - z:
+            """
+        )
+        p.only_filter("y")
+        p.no_filter("a")
+        self.assertEqual([d["name"] for d in p.get_dicts()], ["y.b"])
+        # x and z are skipped by the only filter, a by the no filter
+        self.assertEqual(p.pruned_nodes, 3)
+
+    def testLeafParamsNotShared(self):
+        p = cartesian_config.Parser()
+        p.parse_string(
+            """
+            x = base
+            y = ${x}_value
+            variants:
+                - a:
+                    x += _a
+                - b:
+            """
+        )
+        d1, d2 = p.get_dicts()
+        self.assertEqual((d1["x"], d1["y"]), ("base_a", "base_value"))
+        self.assertEqual((d2["x"], d2["y"]), ("base", "base_value"))
+        self.assertIsNot(d1["_name_map_file"], d2["_name_map_file"])
+        d1["_name_map_file"]["<string>"] = "changed"
+        self.assertEqual(d2["_name_map_file"], {"<string>": "b"})
+
     def testHugeTest1(self):
         self._checkConfigDump(
             "testcfg.huge/test1.cfg", "testcfg.huge/test1.cfg.repr.gz"
         )
 
 
+class CartesianConfigTreeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache_dir = os.path.join(self.tmpdir, "cache")
+        self.cfg_dir = os.path.join(self.tmpdir, "cfg")
+        shutil.copytree(os.path.join(testdatadir, "testcfg.huge"), self.cfg_dir)
+        self.cfg = os.path.join(self.cfg_dir, "test1.cfg")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _get_dicts(self, cache_dir):
+        parser = cartesian_config.Parser(self.cfg, cache_dir=cache_dir)
+        parser.only_filter("mig_online")
+        return parser, list(parser.get_dicts())
+
+    def testReuse(self):
+        _, reference = self._get_dicts(None)
+        self.assertTrue(reference)
+        cold_parser, cold = self._get_dicts(self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        warm_parser, warm = self._get_dicts(self.cache_dir)
+        self.assertEqual(cold, reference)
+        self.assertEqual(warm, reference)
+        self.assertEqual(warm_parser.parsed_files, cold_parser.parsed_files)
+        self.assertIn(
+            os.path.join(self.cfg_dir, "guest-os.cfg"), cold_parser.parsed_files
+        )
+
+    def testIncludedFileChanged(self):
+        self._get_dicts(self.cache_dir)
+        with open(os.path.join(self.cfg_dir, "base.cfg"), "a") as base_cfg:
+            base_cfg.write("cache_test_param = changed\n")
+        _, dicts = self._get_dicts(self.cache_dir)
+        self.assertTrue(dicts)
+        for d in dicts:
+            self.assertEqual(d["cache_test_param"], "changed")
+
+    def testCorruptedCache(self):
+        parser, reference = self._get_dicts(self.cache_dir)
+        for name in os.listdir(self.cache_dir):
+            with open(os.path.join(self.cache_dir, name), "wb") as cache_file:
+                cache_file.write(b"garbage")
+        _, dicts = self._get_dicts(self.cache_dir)
+        self.assertEqual(dicts, reference)
+
+
+class CartesianConfigParallelDictsTest(unittest.TestCase):
+    def _get_dicts(self, parallel_dicts, *filters):
+        parser = cartesian_config.Parser(
+            os.path.join(testdatadir, "testcfg.huge", "test1.cfg"),
+            parallel_dicts=parallel_dicts,
+        )
+        for only in filters:
+            parser.only_filter(only)
+        return list(parser.get_dicts())
+
+    def testSameOrder(self):
+        reference = self._get_dicts(0)
+        self.assertTrue(reference)
+        self.assertEqual(self._get_dicts(4), reference)
+
+    def testFiltered(self):
+        reference = self._get_dicts(0, "mig_online")
+        self.assertTrue(reference)
+        self.assertEqual(self._get_dicts(2, "mig_online"), reference)
+
+    def testDefaultsSequential(self):
+        parser = cartesian_config.Parser(
+            os.path.join(testdatadir, "testcfg.huge", "test1.cfg"),
+            defaults=True,
+            parallel_dicts=4,
+        )
+        self.assertEqual(parser._get_dicts_shards(), [])
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/python
+
+import json
+import os
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import unittest
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest import ip_sniffing
+
+
+class AddrCacheTest(unittest.TestCase):
+    def test_wait_for_update(self):
+        cache = ip_sniffing.AddrCache()
+        self.assertFalse(cache.wait_for_update(0.01))
+        timer = threading.Timer(
+            0.1, cache.__setitem__, ("52:54:00:AA:BB:CC", "10.0.0.2")
+        )
+        timer.start()
+        self.assertTrue(cache.wait_for_update(5))
+        timer.join()
+        self.assertEqual(cache["52:54:00:aa:bb:cc"], "10.0.0.2")
+
+
+class LeaseSnifferTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.cache = ip_sniffing.AddrCache()
+        self.sniffer = ip_sniffing.LeaseSniffer(
+            self.cache, os.path.join(self.tmpdir, "ip-sniffer.log")
+        )
+
+    def tearDown(self):
+        self.sniffer.stop()
+        shutil.rmtree(self.tmpdir)
+
+    def test_dnsmasq_leases(self):
+        path = os.path.join(self.tmpdir, "dnsmasq.leases")
+        with open(path, "w") as lease_file:
+            lease_file.write(
+                "1700000000 52:54:00:aa:bb:cc 192.168.122.10 guest *\n"
+                "duid 00:01:00:01:2c:5f:7a:1b:52:54:00:00:00:01\n"
+                "1700000000 1234 fd00::10 guest 00:01:00:01:2c\n"
+            )
+        self.sniffer._read_lease_file(path)
+        self.assertEqual(self.cache["52:54:00:aa:bb:cc"], "192.168.122.10")
+        self.assertEqual(
+            repr(self.cache), repr({"52:54:00:aa:bb:cc": "192.168.122.10"})
+        )
+
+    def test_libvirt_status(self):
+        path = os.path.join(self.tmpdir, "virbr0.status")
+        with open(path, "w") as lease_file:
+            json.dump(
+                [
+                    {
+                        "ip-address": "192.168.122.11",
+                        "mac-address": "52:54:00:aa:bb:cd",
+                    },
+                    {"ip-address": "fd00::11", "mac-address": "52:54:00:aa:bb:cd"},
+                ],
+                lease_file,
+            )
+        self.sniffer._read_lease_file(path)
+        self.assertEqual(self.cache["52:54:00:aa:bb:cd"], "192.168.122.11")
+        self.assertEqual(self.cache["52:54:00:aa:bb:cd_6"], "fd00::11")
+
+    def test_neighbour_update(self):
+        attrs = struct.pack("HH", 8, ip_sniffing.NDA_DST) + socket.inet_aton(
+            "192.168.122.12"
+        )
+        attrs += struct.pack("HH", 10, ip_sniffing.NDA_LLADDR)
+        attrs += b"\x52\x54\x00\xaa\xbb\xce\x00\x00"
+        msg = struct.pack("BxxxiHBB", socket.AF_INET, 3, 0x02, 0, 0) + attrs
+        data = struct.pack("IHHII", 16 + len(msg), ip_sniffing.RTM_NEWNEIGH, 0, 0, 0)
+        sock, peer = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.addCleanup(sock.close)
+        self.addCleanup(peer.close)
+        peer.send(data + msg)
+        self.sniffer._handle_neigh(sock)
+        self.assertEqual(self.cache["52:54:00:aa:bb:ce"], "192.168.122.12")
+
+    def test_watch_lease_dir(self):
+        self.sniffer.lease_dirs = (self.tmpdir,)
+        self.sniffer.start()
+        self.assertTrue(self.sniffer.is_alive())
+        path = os.path.join(self.tmpdir, "default.leases")
+        with open(path, "w") as lease_file:
+            lease_file.write("1700000000 52:54:00:aa:bb:cf 192.168.122.13 guest *\n")
+        while self.cache["52:54:00:aa:bb:cf"] is None:
+            self.assertTrue(self.cache.wait_for_update(5))
+        self.assertEqual(self.cache["52:54:00:aa:bb:cf"], "192.168.122.13")
+        self.sniffer.stop()
+        self.assertFalse(self.sniffer.is_alive())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/python
+
+import os
+import sys
+import threading
+import unittest
+
+import aexpect
+from avocado.utils import process
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest.remote_commander import messenger as ms
+from virttest.remote_commander import remote_interface, remote_master, remote_runner
+
+
+class MessengerTest(unittest.TestCase):
+    def _pair(self, in_cls, out_cls, binary=False):
+        r_pipe, w_pipe = os.pipe()
+        reader = ms.Messenger(in_cls(r_pipe), out_cls(os.dup(w_pipe)), binary)
+        writer = ms.Messenger(in_cls(os.dup(r_pipe)), out_cls(w_pipe), binary)
+        self.addCleanup(reader.close)
+        self.addCleanup(writer.close)
+        return reader, writer
+
+    def _roundtrip(self, reader, writer, data):
+        # Large messages fill the pipe, write them from another thread
+        thread = threading.Thread(target=writer.write_msg, args=(data,))
+        thread.start()
+        succ, msg = reader.read_msg()
+        thread.join()
+        self.assertTrue(succ)
+        return msg
+
+    def test_text(self):
+        reader, writer = self._pair(ms.StdIOWrapperIn, ms.StdIOWrapperOut)
+        self.assertEqual(self._roundtrip(reader, writer, "start"), "start")
+
+    def test_base64(self):
+        reader, writer = self._pair(ms.StdIOWrapperInBase64, ms.StdIOWrapperOutBase64)
+        self.assertFalse(reader.supports_binary())
+        self.assertRaises(ms.MessengerError, reader.set_binary)
+        data = os.urandom(100000)
+        self.assertEqual(self._roundtrip(reader, writer, data), data)
+
+    def test_binary(self):
+        reader, writer = self._pair(ms.StdIOWrapperIn, ms.StdIOWrapperOut, True)
+        data = os.urandom(3 * ms.READ_CHUNK_SIZE + 5)
+        self.assertEqual(self._roundtrip(reader, writer, data), data)
+        error = remote_interface.CommanderError("failed")
+        msg = self._roundtrip(reader, writer, error)
+        self.assertIsInstance(msg, remote_interface.CommanderError)
+        self.assertEqual(msg.msg, "failed")
+
+    def test_foreign_classes(self):
+        reader, writer = self._pair(ms.StdIOWrapperIn, ms.StdIOWrapperOut, True)
+        result = process.CmdResult("ls", stdout=b"out", exit_status=2)
+        msg = self._roundtrip(reader, writer, result)
+        self.assertIsInstance(msg, process.CmdResult)
+        self.assertEqual((msg.command, msg.stdout, msg.exit_status), ("ls", b"out", 2))
+        error = aexpect.ExpectTimeoutError(["login:"], "output")
+        msg = self._roundtrip(reader, writer, error)
+        self.assertIsInstance(msg, aexpect.ExpectTimeoutError)
+        self.assertEqual((msg.patterns, msg.output), (["login:"], "output"))
+
+    def test_switch_to_binary(self):
+        reader, writer = self._pair(ms.StdIOWrapperIn, ms.StdIOWrapperOut)
+        self._roundtrip(reader, writer, "Started")
+        reader.set_binary()
+        writer.set_binary()
+        self.assertEqual(self._roundtrip(reader, writer, b"\0" * 20), b"\0" * 20)
+
+    def test_closed(self):
+        r_pipe, w_pipe = os.pipe()
+        os.close(w_pipe)
+        reader = ms.Messenger(
+            ms.StdIOWrapperIn(r_pipe), ms.StdIOWrapperOut(os.dup(1)), True
+        )
+        self.addCleanup(reader.close)
+        self.assertEqual(reader.read_msg(), (False, None))
+
+    def test_timeout(self):
+        reader, _ = self._pair(ms.StdIOWrapperIn, ms.StdIOWrapperOut, True)
+        self.assertEqual(reader.read_msg(0.1), (None, None))
+
+
+class NegotiationTest(unittest.TestCase):
+    def _commander(self, slave_cls):
+        m_read, s_write = os.pipe()
+        s_read, m_write = os.pipe()
+        o_stdout, o_stdout_w = os.pipe()
+        o_stderr, o_stderr_w = os.pipe()
+        for fd in (o_stdout_w, o_stderr_w):
+            self.addCleanup(os.close, fd)
+
+        def _slave():
+            slave = slave_cls(
+                ms.StdIOWrapperIn(s_read),
+                ms.StdIOWrapperOut(s_write),
+                o_stdout,
+                o_stderr,
+            )
+            slave.cmd_loop()
+
+        thread = threading.Thread(target=_slave, daemon=True)
+        thread.start()
+        master = remote_master.CommanderMaster(
+            ms.StdIOWrapperIn(m_read), ms.StdIOWrapperOut(m_write)
+        )
+        return master, thread
+
+    def test_binary(self):
+        master, thread = self._commander(remote_runner.CommanderSlaveCmds)
+        self.assertTrue(master.binary)
+        self.assertEqual(master.manage.exit().results, "bye")
+        thread.join(10)
+
+    def test_slave_without_binary(self):
+        class OldSlave(remote_runner.CommanderSlaveCmds):
+            binary_transport = None
+
+        master, thread = self._commander(OldSlave)
+        self.assertFalse(master.binary)
+        self.assertEqual(master.manage.exit().results, "bye")
+        thread.join(10)
+
+
+if __name__ == "__main__":
+    unittest.main()
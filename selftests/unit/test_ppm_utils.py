@@ -0,0 +1,81 @@
+#!/usr/bin/python
+
+import os
+import random
+import struct
+import sys
+import unittest
+from unittest.mock import patch
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest import ppm_utils
+
+
+def _reference_comparison(width, height, data1, data2):
+    newdata = bytearray()
+    for i in range(0, width * height * 3, 3):
+        pixel1 = struct.unpack("BBB", data1[i : i + 3])
+        pixel2 = struct.unpack("BBB", data2[i : i + 3])
+        value = int((int(sum(pixel1) / 3) + int(sum(pixel2) / 3)) / 2)
+        value = 128 + value // 2
+        if pixel1 == pixel2:
+            newdata += struct.pack("BBB", 0, value, 0)
+        else:
+            newdata += struct.pack("BBB", value, 0, 0)
+    return bytes(newdata)
+
+
+class PixelOperationsTest(unittest.TestCase):
+    WIDTH = 17
+    HEIGHT = 11
+
+    def setUp(self):
+        rand = random.Random(0)
+        size = self.WIDTH * self.HEIGHT * 3
+        self.data1 = bytes(rand.randrange(256) for _ in range(size))
+        data2 = bytearray(self.data1)
+        for index in rand.sample(range(size), 40):
+            data2[index] = 255 - data2[index]
+        self.data2 = bytes(data2)
+        self.size = (self.WIDTH, self.HEIGHT)
+
+    def _check(self):
+        ref = _reference_comparison(*self.size + (self.data1, self.data2))
+        self.assertEqual(
+            ppm_utils.image_comparison(*self.size + (self.data1, self.data2)),
+            self.size + (ref,),
+        )
+        equal = sum(ref[i] == 0 for i in range(0, len(ref), 3))
+        self.assertEqual(
+            ppm_utils.image_fuzzy_compare(*self.size + (self.data1, self.data2)),
+            equal / float(self.WIDTH * self.HEIGHT),
+        )
+        self.assertEqual(
+            ppm_utils.image_fuzzy_compare(*self.size + (self.data1, self.data1)), 1.0
+        )
+
+    def test_pixel_operations(self):
+        self._check()
+
+    def test_pixel_operations_without_numpy(self):
+        with patch.object(ppm_utils, "numpy", None):
+            self._check()
+
+    def test_image_crop(self):
+        width, height, data = ppm_utils.image_crop(
+            *self.size + (self.data1, 15, 3, 5, 20)
+        )
+        self.assertEqual((width, height), (2, 8))
+        rows = [
+            self.data1[(15 + y * self.WIDTH) * 3 : (17 + y * self.WIDTH) * 3]
+            for y in range(3, 11)
+        ]
+        self.assertEqual(data, b"".join(rows))
+
+
+if __name__ == "__main__":
+    unittest.main()
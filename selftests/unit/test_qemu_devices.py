@@ -715,6 +715,31 @@ class Container(unittest.TestCase):
         )
         return qdev
 
+    def test_probe_keys(self):
+        """Test the cached probes depend on the machine workaround"""
+        probes = []
+
+        def _cached_probe(bin_path, probe, func):
+            probes.append(probe)
+            return func()
+
+        def _kvm_failing_run(cmd, *args, **kwargs):
+            if "echo -e 'quit'" in cmd:
+                return CmdResult(
+                    cmd, stderr="kvm_init_vcpu failed: Invalid argument", exit_status=1
+                )
+            return self._qemu_run(cmd, *args, **kwargs)
+
+        self.god.stub_with(qcontainer.utils_qemu, "get_cached_probe", _cached_probe)
+        self.create_qdev("vm1")
+        plain_probes = set(probes)
+        self.assertNotIn("quit", plain_probes)
+        del probes[:]
+        self.god.stub_with(qcontainer.process, "run", _kvm_failing_run)
+        self.create_qdev("vm1")
+        self.assertFalse(plain_probes & set(probes))
+        self.assertIn("execute_qemu -machine none -help", probes)
+
     def test_qdev_functional(self):
         """Test basic qdev workflow"""
         qdev = self.create_qdev("vm1")
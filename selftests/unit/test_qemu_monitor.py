@@ -1,7 +1,12 @@
 #!/usr/bin/python
 
+import collections
+import json
 import os
+import socket
 import sys
+import threading
+import time
 import unittest
 
 # simple magic for using scripts within a source tree
@@ -24,6 +29,149 @@ class MockMonitor(qemu_monitor.Monitor):
         pass
 
 
+class MockQMPMonitor(qemu_monitor.QMPMonitor):
+    """Dummy QMP monitor reading from one end of a socket pair"""
+
+    def __init__(self, sock):  # pylint: disable=W0231
+        self.vm = qemu_monitor.VM("vm1")
+        self.name = "qmpmonitor1"
+        self._socket = sock
+        self._server_closed = False
+        self._buffer = bytearray()
+        self._lock = threading.RLock()
+        self._events = collections.deque(maxlen=self.EVENTS_MAXLEN)
+        self._responses = []
+        self._received = 0
+        self._cond = threading.Condition()
+        self._reader = None
+        self._reader_running = False
+
+    def __del__(self):
+        pass
+
+    def _log_lines(self, log_str):
+        pass
+
+
+class QMPReadObjectsTests(unittest.TestCase):
+    def setUp(self):
+        self.sock, peer = socket.socketpair()
+        self.addCleanup(self.sock.close)
+        self.addCleanup(peer.close)
+        self.monitor = MockQMPMonitor(peer)
+
+    def testNoData(self):
+        self.assertEqual(self.monitor._read_objects(), [])
+
+    def testSeveralObjects(self):
+        self.sock.sendall(
+            b'{"return": {}, "id": "a"}\r\n'
+            b'{"event": "STOP", "data": {}}\r\n'
+            b"garbage\r\n"
+        )
+        objs = self.monitor._read_objects()
+        self.assertEqual(
+            objs, [{"return": {}, "id": "a"}, {"event": "STOP", "data": {}}]
+        )
+        self.assertEqual(list(self.monitor._events), [{"event": "STOP", "data": {}}])
+
+    def testIncompleteLine(self):
+        self.sock.sendall(b'{"return": {}}\r\n{"return": ')
+        self.assertEqual(self.monitor._read_objects(timeout=0.1), [{"return": {}}])
+        self.sock.sendall(b"[1, 2]}\r\n")
+        self.assertEqual(self.monitor._read_objects(), [{"return": [1, 2]}])
+
+    def testLargeResponse(self):
+        reply = {"return": [{"name": "x" * 100, "id": i} for i in range(20000)]}
+        data = json.dumps(reply).encode() + b"\r\n"
+        sender = threading.Thread(target=self.sock.sendall, args=(data,))
+        sender.start()
+        objs = []
+        while not objs:
+            objs = self.monitor._read_objects()
+        sender.join()
+        self.assertEqual(objs, [reply])
+
+    def testGetResponse(self):
+        self.sock.sendall(
+            b'{"return": 1, "id": "a"}\r\n{"event": "STOP"}\r\n'
+            b'{"return": 2, "id": "b"}\r\n'
+        )
+        self.assertEqual(self.monitor._get_response("b", 1), {"return": 2, "id": "b"})
+        self.assertEqual(self.monitor._get_response(None, 1), {"return": 1, "id": "a"})
+        self.assertIsNone(self.monitor._get_response("c", 0.1))
+
+    def testWaitForEventPolling(self):
+        self.sock.sendall(b'{"event": "DEVICE_DELETED", "data": {"device": "a"}}\r\n')
+        event = self.monitor.wait_for_event("DEVICE_DELETED", timeout=1)
+        self.assertEqual(event["data"], {"device": "a"})
+        self.assertIsNone(self.monitor.wait_for_event("RESET", timeout=0.1))
+
+
+class QMPReaderTests(unittest.TestCase):
+    def setUp(self):
+        self.sock, peer = socket.socketpair()
+        self.addCleanup(self.sock.close)
+        self.monitor = MockQMPMonitor(peer)
+        self.monitor._start_reader()
+
+    def tearDown(self):
+        reader = self.monitor._reader
+        self.monitor._close_sock()
+        reader.join(5)
+        self.assertFalse(reader.is_alive())
+
+    def _send_later(self, data, delay=0.2):
+        timer = threading.Timer(delay, self.sock.sendall, (data,))
+        timer.start()
+        self.addCleanup(timer.join)
+
+    def testWaitForEvent(self):
+        self._send_later(
+            b'{"event": "BLOCK_JOB_COMPLETED", "data": {"device": "a"}}\r\n'
+            b'{"event": "BLOCK_JOB_COMPLETED", "data": {"device": "b"}}\r\n'
+        )
+        event = self.monitor.wait_for_event(
+            "BLOCK_JOB_COMPLETED",
+            lambda event: event["data"]["device"] == "b",
+            timeout=5,
+        )
+        self.assertEqual(event["data"], {"device": "b"})
+        self.assertEqual(len(self.monitor.get_events()), 2)
+        self.monitor.clear_event("BLOCK_JOB_COMPLETED")
+        self.assertEqual(self.monitor.get_events(), [])
+
+    def testResponseById(self):
+        self._send_later(
+            b'{"event": "STOP"}\r\n{"return": {}, "id": "other"}\r\n'
+            b'{"return": {"status": "paused"}, "id": "mine"}\r\n'
+        )
+        response = self.monitor._get_response("mine", 5)
+        self.assertEqual(response["return"], {"status": "paused"})
+        self.assertEqual(self.monitor.get_event("STOP"), {"event": "STOP"})
+
+    def testServerClosed(self):
+        self.sock.close()
+        self.assertIsNone(self.monitor.wait_for_event("SHUTDOWN", timeout=5))
+        self.monitor._reader.join(5)
+        self.assertFalse(self.monitor._reader_running)
+
+    def testCommandEventWait(self):
+        self.monitor.verify_supported_cmd = lambda cmd: None
+        self.monitor.cmd = lambda cmd: self._send_later(b'{"event": "POWERDOWN"}\r\n')
+        start = time.time()
+        self.monitor.system_powerdown()
+        self.assertLess(time.time() - start, 5)
+
+    def testEventsBounded(self):
+        self.monitor._events = collections.deque(maxlen=2)
+        self._send_later(b"".join(b'{"event": "E%d"}\r\n' % i for i in range(3)))
+        self.assertIsNotNone(self.monitor.wait_for_event("E2", timeout=5))
+        self.assertEqual(
+            [event["event"] for event in self.monitor.get_events()], ["E1", "E2"]
+        )
+
+
 class InfoNumaTests(unittest.TestCase):
     def testZeroNodes(self):
         d = "0 nodes\n"
@@ -0,0 +1,123 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest import screendump_utils
+
+
+def _fake_encode(encoder, data, image_format, timestamp, filename):
+    # An empty frame stands for one PIL fails to decode
+    if data:
+        with open(filename, "wb") as frame:
+            frame.write(data)
+
+
+class FrameCacheTest(unittest.TestCase):
+    def test_lru(self):
+        cache = screendump_utils.FrameCache(2)
+        cache["a"] = 1
+        cache["b"] = 2
+        self.assertEqual(cache.get("a"), 1)
+        cache["c"] = 3
+        self.assertNotIn("b", cache)
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+
+
+class ScreendumpEncoderTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        patcher = patch.object(
+            screendump_utils.ScreendumpEncoder, "_encode", _fake_encode
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        # Pretend PIL is available, _encode is replaced anyway
+        patcher = patch.object(screendump_utils.ppm_utils, "Image", object())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _frame(self, index):
+        return os.path.join(self.tmpdir, "%04d.jpg" % index)
+
+    def test_read_screendump(self):
+        filename = os.path.join(self.tmpdir, "scrdump.ppm")
+        with open(filename, "wb") as screendump:
+            screendump.write(b"P6\n")
+        data, timestamp = screendump_utils.read_screendump(filename)
+        self.assertEqual(data, b"P6\n")
+        self.assertGreater(timestamp, 0)
+        self.assertFalse(os.path.exists(filename))
+
+    def test_duplicates_linked(self):
+        encoder = screendump_utils.ScreendumpEncoder(cache_size=1)
+        frames = [b"a", b"a", b"b", b"a"]
+        seen = [
+            encoder.add(data, "ppm", 0, self._frame(index))
+            for index, data in enumerate(frames, 1)
+        ]
+        encoder.close()
+        self.assertEqual(seen, [False, True, False, False])
+        for index, data in enumerate(frames, 1):
+            with open(self._frame(index), "rb") as frame:
+                self.assertEqual(frame.read(), data)
+        self.assertTrue(os.path.samefile(self._frame(1), self._frame(2)))
+        self.assertFalse(os.path.samefile(self._frame(1), self._frame(4)))
+
+    def test_gaps_closed(self):
+        encoder = screendump_utils.ScreendumpEncoder()
+        for index, data in enumerate([b"a", b"", b"", b"b"], 1):
+            encoder.add(data, "ppm", 0, self._frame(index))
+        encoder.close()
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["0001.jpg", "0002.jpg"])
+        with open(self._frame(2), "rb") as frame:
+            self.assertEqual(frame.read(), b"b")
+
+    def test_full_queue_drops(self):
+        encoding = threading.Event()
+
+        def _blocked_encode(*args):
+            encoding.wait(10)
+            _fake_encode(encoder, *args)
+
+        encoder = screendump_utils.ScreendumpEncoder(workers=1, queue_size=1)
+        with patch.object(encoder, "_encode", _blocked_encode):
+            seen = [
+                encoder.add(data, "ppm", 0, self._frame(index))
+                for index, data in enumerate([b"a", b"b", b"a"], 1)
+            ]
+            encoding.set()
+            encoder.close()
+        self.assertEqual(seen, [False, False, True])
+        self.assertEqual(sorted(os.listdir(self.tmpdir)), ["0001.jpg", "0002.jpg"])
+        with open(self._frame(2), "rb") as frame:
+            self.assertEqual(frame.read(), b"a")
+        self.assertIsNone(encoder.cache.get(b"b"))
+
+    @patch.object(screendump_utils.ppm_utils, "Image", None)
+    @patch.object(screendump_utils.LOG, "warning")
+    def test_no_pil(self, warning):
+        encoder = screendump_utils.ScreendumpEncoder()
+        seen = [encoder.add(b"a", "ppm", 0, self._frame(index)) for index in (1, 2)]
+        encoder.close()
+        self.assertEqual(seen, [False, True])
+        self.assertEqual(os.listdir(self.tmpdir), [])
+        warning.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
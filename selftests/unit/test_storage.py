@@ -0,0 +1,194 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest import storage, utils_params
+
+
+class CopyImageFileTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.src = os.path.join(self.tmpdir, "src")
+        self.dst = os.path.join(self.tmpdir, "dst")
+        with open(self.src, "wb") as src:
+            src.write(b"a" * 4096)
+            src.seek(8 << 20)
+            src.write(b"b" * 4096)
+            src.truncate(16 << 20)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _read(self, path):
+        with open(path, "rb") as image:
+            return image.read()
+
+    def test_clone(self):
+        copied = storage.copy_image_file(self.src, self.dst)
+        self.assertEqual(self._read(self.dst), self._read(self.src))
+        self.assertLessEqual(copied, os.path.getsize(self.src))
+
+    @patch("virttest.storage.fcntl.ioctl", side_effect=OSError(95, "EOPNOTSUPP"))
+    def test_sparse_copy(self, _):
+        copied = storage.copy_image_file(self.src, self.dst)
+        self.assertEqual(self._read(self.dst), self._read(self.src))
+        self.assertGreaterEqual(copied, 8192)
+        # The holes of src are not copied where the filesystem reports them
+        self.assertLessEqual(
+            os.stat(self.dst).st_blocks, os.stat(self.src).st_blocks + 8
+        )
+
+    @patch("virttest.storage.COPY_RANGE_SIZE", 1024)
+    def test_parallel_copy(self):
+        copied = storage.copy_image_file(self.src, self.dst, reflink=False)
+        self.assertEqual(self._read(self.dst), self._read(self.src))
+        self.assertGreaterEqual(copied, 8192)
+
+    @patch("virttest.storage.fcntl.ioctl", side_effect=OSError(95, "EOPNOTSUPP"))
+    @patch("virttest.storage.os.copy_file_range", side_effect=OSError(18, "EXDEV"))
+    def test_read_write_copy(self, *_):
+        storage.copy_image_file(self.src, self.dst)
+        self.assertEqual(self._read(self.dst), self._read(self.src))
+
+
+def _read_image(path):
+    """Return the backing file and the own data of a fake image."""
+    with open(path, "rb") as image:
+        data = image.read()
+    if not data.startswith(b"overlay:"):
+        return None, data
+    header, _, data = data.partition(b"\n")
+    return header[len(b"overlay:") :].decode(), data
+
+
+def _image_data(path):
+    """Return the data a guest sees in a fake image."""
+    backing_file, data = _read_image(path)
+    if backing_file is None or data:
+        return data
+    return _image_data(backing_file)
+
+
+def _write_image(path, data, backing_file=None):
+    with open(path, "wb") as image:
+        if backing_file:
+            image.write(b"overlay:%s\n" % backing_file.encode())
+        image.write(data)
+
+
+def _qemu_img_run(cmd, *args, **kwargs):
+    """Fake the qemu-img subcommands used by the overlay restore."""
+    cmd = cmd.split()
+    if cmd[1] == "create":
+        _write_image(cmd[-1], b"", cmd[-2])
+    elif cmd[1] == "convert":
+        _write_image(cmd[-1], _image_data(cmd[-2]))
+    elif cmd[1] == "commit":
+        backing_file, data = _read_image(cmd[-1])
+        if data:
+            _write_image(backing_file, data)
+        _write_image(cmd[-1], b"", backing_file)
+
+
+class OverlayRestoreTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.params = utils_params.Params(
+            {
+                "image_name": os.path.join(self.tmpdir, "image"),
+                "image_format": "qcow2",
+                "backup_dir": os.path.join(self.tmpdir, "backup"),
+                "image_restore_method": "overlay",
+                "qemu_img_binary": "qemu-img",
+            }
+        )
+        self.image = os.path.join(self.tmpdir, "image.qcow2")
+        self.backup = os.path.join(self.tmpdir, "backup", "image.qcow2.backup")
+        _write_image(self.image, b"golden")
+        for target, func in (
+            ("virttest.storage.process.run", _qemu_img_run),
+            ("virttest.storage.utils_misc.get_qemu_img_binary", lambda _: "qemu-img"),
+            (
+                "virttest.storage.QemuImg.get_backing_file",
+                lambda _, filename: _read_image(filename)[0],
+            ),
+        ):
+            patcher = patch(target, func)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.qemu_img = storage.QemuImg(self.params, self.tmpdir, "image1")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _backup(self, action, good=True):
+        self.qemu_img.backup_image(self.params, self.tmpdir, action, good)
+
+    def test_cycle(self):
+        self._backup("backup")
+        self._backup("restore")
+        self.assertEqual(_read_image(self.image), (self.backup, b""))
+        self.assertFalse(os.stat(self.backup).st_mode & 0o222)
+        # The test writes to the overlay, the backup stays pristine
+        _write_image(self.image, b"changed", self.backup)
+        self.assertEqual(_image_data(self.backup), b"golden")
+        self._backup("restore")
+        self.assertEqual(_image_data(self.image), b"golden")
+        # A new backup of the overlay flattens it into the backup
+        _write_image(self.image, b"installed", self.backup)
+        self._backup("backup")
+        self.assertEqual(_read_image(self.backup), (None, b"installed"))
+        self.assertEqual(_read_image(self.image), (self.backup, b""))
+        self.assertEqual(_image_data(self.image), b"installed")
+
+    def test_bad_backup_flattened(self):
+        self._backup("backup")
+        self._backup("restore")
+        _write_image(self.image, b"corrupted", self.backup)
+        self._backup("backup", good=False)
+        backup_dir = os.path.dirname(self.backup)
+        bad = [name for name in os.listdir(backup_dir) if ".bad." in name]
+        self.assertEqual(len(bad), 1)
+        bad = os.path.join(backup_dir, bad[0])
+        self.assertEqual(_read_image(bad), (None, b"corrupted"))
+        # The bad copy survives the removal of the backup it came from
+        self.qemu_img.rm_backup_image()
+        self.assertEqual(_image_data(bad), b"corrupted")
+
+    def test_rm_backup_keeps_data(self):
+        self._backup("backup")
+        self._backup("restore")
+        _write_image(self.image, b"changed", self.backup)
+        self.qemu_img.rm_backup_image()
+        self.assertFalse(os.path.exists(self.backup))
+        self.assertEqual(_read_image(self.image), (None, b"changed"))
+
+    def test_rm_backup_unchanged_overlay(self):
+        self._backup("backup")
+        self._backup("restore")
+        self.qemu_img.rm_backup_image()
+        self.assertFalse(os.path.exists(self.backup))
+        self.assertEqual(_read_image(self.image), (None, b"golden"))
+
+    def test_copy_from_overlay_backup(self):
+        self._backup("backup")
+        self._backup("restore")
+        for method in ("copy", "reflink"):
+            self.params["image_restore_method"] = method
+            self._backup("restore")
+            self.assertEqual(_read_image(self.image), (None, b"golden"))
+            self.assertTrue(os.stat(self.image).st_mode & 0o200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 import logging
 import os
+import pickle
 import sys
 import threading
 import time
@@ -86,6 +87,52 @@ class TestEnv(unittest.TestCase):
         sync2 = env4.get_syncserver(222)
         assert sync2.instance == sync1.instance
 
+    def test_save_unchanged(self):
+        """
+        1) Save an env, then save it again without changes and verify the
+           file was not rewritten.
+        2) Change a registered object and verify the next save replaces the
+           file, keeping objects shared between entries shared.
+        3) Verify an env pickled the legacy way (plain dict) still loads.
+        """
+        params = utils_params.Params({"main_vm": "vm1"})
+        env = utils_env.Env(filename=self.envfilename)
+        env["address_cache"] = {}
+        vm = FakeVm(params["main_vm"], params)
+        vm.address_cache = env["address_cache"]
+        env.register_vm(params["main_vm"], vm)
+        env.save()
+        inode = os.stat(self.envfilename).st_ino
+        env.save()
+        self.assertEqual(os.stat(self.envfilename).st_ino, inode)
+
+        vm.address_cache["00:11:22:33:44:55"] = "10.0.0.2"
+        env.save()
+        self.assertNotEqual(os.stat(self.envfilename).st_ino, inode)
+        env3 = utils_env.Env(filename=self.envfilename)
+        vm3 = env3.get_vm(params["main_vm"])
+        self.assertIs(vm3.address_cache, env3["address_cache"])
+        self.assertEqual(vm3.address_cache, {"00:11:22:33:44:55": "10.0.0.2"})
+
+        with open(self.envfilename, "wb") as env_file:
+            pickle.dump(env.data, env_file, protocol=0)
+        env4 = utils_env.Env(filename=self.envfilename)
+        self.assertEqual(env4.get_vm(params["main_vm"]).instance, vm.instance)
+
+    def test_save_replaced(self):
+        """
+        Save an env, let another env rewrite the file and verify saving the
+        first env again writes its contents back.
+        """
+        env = utils_env.Env(filename=self.envfilename)
+        env["owner"] = "first"
+        env.save()
+        other = utils_env.Env(filename=self.envfilename)
+        other["owner"] = "second"
+        other.save()
+        env.save()
+        self.assertEqual(utils_env.Env(filename=self.envfilename)["owner"], "first")
+
     def test_register_vm(self):
         """
         1) Create an env object.
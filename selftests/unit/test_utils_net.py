@@ -6,6 +6,7 @@ import logging
 import os
 import random
 import shelve
+import shutil
 import sys
 import tempfile
 import time
@@ -296,6 +297,41 @@ class TestVmNet(unittest.TestCase):
         self.assertEqual(test_data[2]["mac"], vmnet[2]["mac"])
 
 
+class TestAddressPool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.db_filename = os.path.join(self.tmpdir, "address_pool")
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_mac_index(self):
+        db = utils_net.AddressPool(self.db_filename)
+        db["vm1"] = str([{"nic_name": "nic1", "mac": "02:00:00:00:00:01"}])
+        db["vm2"] = str([{"nic_name": "nic1", "mac": "02:00:00:00:00:01"}])
+        db.close()
+        db = utils_net.AddressPool(self.db_filename)
+        self.assertTrue(db.mac_allocated("02:00:00:00:00:01"))
+        del db["vm1"]
+        self.assertTrue(db.mac_allocated("02:00:00:00:00:01"))
+        db["vm2"] = str([{"nic_name": "nic1", "mac": "02:00:00:00:00:02"}])
+        self.assertFalse(db.mac_allocated("02:00:00:00:00:01"))
+        self.assertEqual(db.macs(), ["02:00:00:00:00:02"])
+        self.assertRaises(KeyError, db.__getitem__, "vm1")
+        db.close()
+
+    def test_import_shelve(self):
+        entry = str([{"nic_name": "nic1", "mac": "02:00:00:00:00:03"}])
+        legacy = shelve.open(self.db_filename)
+        legacy["vm1"] = entry
+        legacy.close()
+        db = utils_net.AddressPool(self.db_filename)
+        self.assertEqual(db.keys(), ["vm1"])
+        self.assertEqual(db["vm1"], entry)
+        self.assertTrue(db.mac_allocated("02:00:00:00:00:03"))
+        db.close()
+
+
 class TestVmNetSubclasses(unittest.TestCase):
 
     nettests_cartesian = """
@@ -557,7 +593,7 @@ class TestVmNetSubclasses(unittest.TestCase):
         """
         # Verify on-disk data matches dummy data just written
         self.zero_counter()
-        db = shelve.open(self.db_filename)
+        db = utils_net.AddressPool(self.db_filename)
         db_keys = list(db.keys())
         self.assertEqual(len(db_keys), self.db_item_count)
         for key in db_keys:
@@ -1,6 +1,7 @@
 #!/usr/bin/python
 
 import os
+import pickle
 import sys
 import unittest
 from collections import OrderedDict
@@ -82,6 +83,24 @@ class TestParams(unittest.TestCase):
                 self.params.object_params(key), CORRECT_RESULT_MAPPING[key]
             )
 
+    def testObjectParamsModified(self):
+        stg_params = self.params.object_params("stg")
+        stg_params["image_size"] = "1G"
+        self.assertEqual(self.params["image_size"], "10G")
+        self.params["image_size_stg"] = "2G"
+        self.assertEqual(self.params.object_params("stg")["image_size"], "2G")
+        del self.params["image_name_stg"]
+        self.assertEqual(
+            self.params.object_params("stg")["image_name"], "images/f18-64"
+        )
+        self.assertEqual(stg_params["image_name"], "enospc")
+
+    def testObjectParamsPickle(self):
+        self.params.object_params("stg")
+        params = pickle.loads(pickle.dumps(self.params))
+        self.assertNotIn("_object_cache", params.__dict__)
+        self.assertEqual(params.object_params("stg"), CORRECT_RESULT_MAPPING["stg"])
+
     def testGetItemMissing(self):
         try:
             self.params["bogus"]
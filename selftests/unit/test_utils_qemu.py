@@ -0,0 +1,147 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest.mock import patch
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest import utils_qemu
+
+
+class ProbeCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.qemu_bin = os.path.join(self.tmpdir, "qemu-kvm")
+        with open(self.qemu_bin, "w") as qemu_bin:
+            qemu_bin.write("#!/bin/sh\n")
+        self.calls = 0
+        patcher = patch.object(
+            utils_qemu,
+            "get_probe_cache_dir",
+            return_value=os.path.join(self.tmpdir, "cache"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        utils_qemu._probe_cache.clear()
+
+    def tearDown(self):
+        utils_qemu._probe_cache.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def _probe(self):
+        self.calls += 1
+        return "QEMU emulator version 8.2.0"
+
+    def _get(self, probe="-version"):
+        return utils_qemu.get_cached_probe(self.qemu_bin, probe, self._probe)
+
+    def test_cached_across_processes(self):
+        self.assertEqual(self._get(), "QEMU emulator version 8.2.0")
+        # Forget the in-process copy, the result comes from the disk
+        utils_qemu._probe_cache.clear()
+        self.assertEqual(self._get(), "QEMU emulator version 8.2.0")
+        self.assertEqual(self.calls, 1)
+
+    def test_binary_changed(self):
+        self._get()
+        with open(self.qemu_bin, "a") as qemu_bin:
+            qemu_bin.write("exit 0\n")
+        self._get()
+        self.assertEqual(self.calls, 2)
+
+    def test_empty_result_not_cached(self):
+        utils_qemu.get_cached_probe(self.qemu_bin, "-help", lambda: "")
+        self._get("-help")
+        self.assertEqual(self.calls, 1)
+
+    def test_missing_binary(self):
+        self.qemu_bin = os.path.join(self.tmpdir, "missing")
+        self._get()
+        self._get()
+        self.assertEqual(self.calls, 2)
+
+    def test_purge(self):
+        self._get()
+        self.assertEqual(utils_qemu.purge_probe_cache(), 1)
+        self._get()
+        self.assertEqual(self.calls, 2)
+        self.assertEqual(utils_qemu.purge_probe_cache(self.qemu_bin), 1)
+
+    def test_img_help_text(self):
+        with open(self.qemu_bin, "w") as qemu_bin:
+            qemu_bin.write(
+                '#!/bin/sh\necho x >> %s\necho "$1 -U, --force-share"\n'
+                % os.path.join(self.tmpdir, "calls")
+            )
+        os.chmod(self.qemu_bin, 0o755)
+        for _ in range(2):
+            help_text = utils_qemu.get_img_help_text(self.qemu_bin, "info")
+            self.assertEqual(help_text, "info -U, --force-share\n")
+        self.assertIn("-h", utils_qemu.get_img_help_text(self.qemu_bin))
+        with open(os.path.join(self.tmpdir, "calls")) as calls:
+            self.assertEqual(len(calls.readlines()), 2)
+
+
+class QMPIntrospectionTest(unittest.TestCase):
+    RETURNS = {
+        "version": {
+            "qemu": {"major": 9, "minor": 1, "micro": 0},
+            "package": " (qemu-kvm-9.1.0-1.el9)",
+        },
+        "commands": [{"name": "block-stream"}, {"name": "query-status"}],
+        "schema": [
+            {"name": "block-stream", "meta-type": "command", "arg-type": "0"},
+            {
+                "name": "0",
+                "meta-type": "object",
+                "members": [{"name": "device"}, {"name": "backing-mask-protocol"}],
+            },
+        ],
+        "objects": [{"name": "sev-guest"}],
+        "machines": [
+            {
+                "name": "pc-q35-9.1",
+                "alias": "q35",
+                "description": "Standard PC (Q35 + ICH9, 2009)",
+                "is-default": True,
+            }
+        ],
+        "machine_props": [{"name": "memory-backend"}],
+        "options": [{"option": "incoming", "parameters": []}],
+        "hmp_help": "help|? [cmd] -- show the help\n",
+    }
+
+    def test_introspect(self):
+        with patch.object(utils_qemu, "run_qmp_session", return_value=self.RETURNS):
+            caps = utils_qemu._introspect_qmp("/usr/bin/qemu-kvm")
+        self.assertEqual(caps["version"], "9.1.0")
+        self.assertEqual(caps["package"], "qemu-kvm-9.1.0-1.el9")
+        self.assertEqual(caps["commands"], ["block-stream", "query-status"])
+        self.assertEqual(
+            caps["command_args"], {"block-stream": ["device", "backing-mask-protocol"]}
+        )
+        self.assertEqual(caps["objects"], ["sev-guest"])
+        self.assertEqual(
+            caps["machines"],
+            {
+                "q35": "Standard PC (Q35 + ICH9, 2009) (alias of pc-q35-9.1)",
+                "pc-q35-9.1": "Standard PC (Q35 + ICH9, 2009) (default)",
+            },
+        )
+        self.assertEqual(caps["machine_props"], ["memory-backend"])
+        self.assertEqual(caps["options"], {"incoming": []})
+
+    def test_introspect_failed(self):
+        with patch.object(utils_qemu, "run_qmp_session", return_value={}):
+            self.assertEqual(utils_qemu._introspect_qmp("/usr/bin/qemu-kvm"), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/python
+
+import os
+import sys
+import threading
+import time
+import unittest
+from unittest.mock import Mock, patch
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest.vt_cluster import node
+
+
+class RunOnNodesTest(unittest.TestCase):
+    def setUp(self):
+        self.nodes = []
+        for index in range(6):
+            fake_node = Mock()
+            fake_node.name = "node%d" % index
+            self.nodes.append(fake_node)
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+
+    def _operate(self, fake_node):
+        with self.lock:
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        time.sleep(0.05)
+        with self.lock:
+            self.running -= 1
+        if fake_node.name in ("node1", "node4"):
+            raise node.NodeError("%s is down" % fake_node.name)
+        fake_node.done()
+
+    def test_errors_collected(self):
+        errors = node.run_on_nodes(self.nodes, self._operate, "operate")
+        self.assertEqual(sorted(errors), ["node1", "node4"])
+        self.assertEqual(str(errors["node4"]), "node4 is down")
+        for fake_node in self.nodes:
+            if fake_node.name not in errors:
+                fake_node.done.assert_called_once_with()
+
+    def test_bounded(self):
+        node.run_on_nodes(self.nodes, self._operate, "operate", max_workers=2)
+        self.assertEqual(self.max_running, 2)
+
+    def test_no_nodes(self):
+        self.assertEqual(node.run_on_nodes([], self._operate, "operate"), {})
+
+
+class AgentArchiveTest(unittest.TestCase):
+    def setUp(self):
+        self.node = node.Node({"address": "192.0.2.1"}, "node1")
+        self.session = Mock()
+        patcher = patch.object(
+            node, "_get_agent_archive", return_value=("abc", "/tmp/abc.tar.gz")
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(node.os.path, "getsize", return_value=1024)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(self.node, "_scp_to_remote")
+        self.scp = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_cached(self):
+        self.session.cmd_status_output.return_value = (
+            0,
+            '{"digest": "abc", "size": 1024, "seconds": 2.5}',
+        )
+        remote_archive = self.node._push_agent_archive(self.session)
+        self.assertEqual(
+            remote_archive, "/var/run/vt_agent_server/pkg_cache/abc.tar.gz"
+        )
+        self.scp.assert_not_called()
+
+    def test_transferred(self):
+        self.session.cmd_status_output.return_value = (1, "")
+        remote_archive = self.node._push_agent_archive(self.session)
+        tmp_archive = remote_archive + ".node1.tmp"
+        self.scp.assert_called_once_with("/tmp/abc.tar.gz", tmp_archive)
+        manifest = self.session.cmd.call_args_list[-1][0][0]
+        self.assertIn('"size": 1024', manifest)
+        self.assertTrue(manifest.endswith("pkg_cache/abc.json"))
+
+
+if __name__ == "__main__":
+    unittest.main()
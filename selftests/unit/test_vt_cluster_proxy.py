@@ -0,0 +1,92 @@
+#!/usr/bin/python
+
+import datetime
+import os
+import pickle
+import sys
+import threading
+import unittest
+from unittest.mock import patch
+from xmlrpc.server import SimpleXMLRPCServer
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest.vt_cluster import proxy
+
+
+class ClientProxyTest(unittest.TestCase):
+    def setUp(self):
+        # A plain XML-RPC server, like agents without JSON support
+        self.server = SimpleXMLRPCServer(
+            ("127.0.0.1", 0), logRequests=False, allow_none=True
+        )
+        self.server.register_function(lambda *args: list(args), "svc.echo")
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        self.uri = "http://127.0.0.1:%d/" % self.server.server_address[1]
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+    def test_json_codec(self):
+        values = [b"\x00\xff", datetime.datetime(2025, 1, 2, 3, 4, 5), {"a": None}]
+        encoded = proxy.json.dumps(values, default=proxy._json_default)
+        decoded = proxy.json.loads(encoded, object_hook=proxy._json_object_hook)
+        self.assertEqual(decoded, values)
+
+    def test_xml_fallback(self):
+        client_proxy = proxy.get_server_proxy(self.uri)
+        self.assertEqual(client_proxy.svc.echo(b"\x00", None), [b"\x00", None])
+        self.assertEqual(client_proxy._encoding, "xml")
+        client_proxy = pickle.loads(pickle.dumps(client_proxy))
+        self.assertEqual(client_proxy._encoding, "xml")
+        self.assertEqual(client_proxy.svc.echo(1), [1])
+
+    def test_connections_reused(self):
+        client_proxy = proxy.get_server_proxy(self.uri, "xml")
+        results = []
+
+        def call():
+            for index in range(20):
+                results.append(client_proxy.svc.echo(index))
+
+        threads = [threading.Thread(target=call) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(results), 80)
+        self.assertLessEqual(len(client_proxy._ServerProxy__transport._idle), 4)
+
+    def test_batch_without_multicall(self):
+        client_proxy = proxy.get_server_proxy(self.uri, "xml")
+        with client_proxy.batch() as batch:
+            calls = [batch.svc.echo(index) for index in range(3)]
+            self.assertRaises(proxy.ServerProxyError, calls[0].result)
+        self.assertEqual([call.result() for call in calls], [[0], [1], [2]])
+        self.assertIsNone(calls[0].exception())
+
+    def test_batch(self):
+        self.server.register_multicall_functions()
+        client_proxy = proxy.get_server_proxy(self.uri, "xml")
+        with patch.object(
+            client_proxy, "_request", wraps=client_proxy._request
+        ) as request:
+            with client_proxy.batch() as batch:
+                first = batch.svc.echo(1)
+                second = batch.svc.echo(b"2")
+        self.assertEqual(request.call_count, 1)
+        self.assertEqual(first.result(), [1])
+        self.assertEqual(second.result(), [b"2"])
+
+    def test_invalid_encoding(self):
+        self.assertRaises(ValueError, proxy.get_server_proxy, self.uri, "yaml")
+
+
+if __name__ == "__main__":
+    unittest.main()
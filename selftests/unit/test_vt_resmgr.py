@@ -0,0 +1,110 @@
+#!/usr/bin/python
+
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+from xmlrpc.server import SimpleXMLRPCRequestHandler, SimpleXMLRPCServer
+
+# simple magic for using scripts within a source tree
+basedir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if os.path.isdir(os.path.join(basedir, "virttest")):
+    sys.path.append(basedir)
+
+from virttest.vt_cluster import proxy
+from virttest.vt_resmgr import resource_manager
+from virttest.vt_resmgr.resources.storage.dir.dir_pool import DirPool
+
+
+class _Node(object):
+    def __init__(self, name, uri):
+        self.name = name
+        self.proxy = proxy._ClientProxy(uri, "xml")
+
+
+class StartupTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.requests = []
+        self.calls = []
+        requests = self.requests
+
+        class _Handler(SimpleXMLRPCRequestHandler):
+            def do_POST(self):
+                requests.append(self.path)
+                super().do_POST()
+
+        self.server = SimpleXMLRPCServer(
+            ("127.0.0.1", 0),
+            requestHandler=_Handler,
+            logRequests=False,
+            allow_none=True,
+        )
+        self.server.register_multicall_functions()
+        for name in (
+            "start_resource_backing_service",
+            "stop_resource_backing_service",
+            "create_pool_connection",
+            "destroy_pool_connection",
+        ):
+            self.server.register_function(self._recorder(name), "resource." + name)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.start()
+        uri = "http://127.0.0.1:%d/" % self.server.server_address[1]
+        self.node = _Node("node1", uri)
+        patcher = patch.object(
+            resource_manager,
+            "RESMGR_ENV_FILENAME",
+            os.path.join(self.tmpdir, "vt_resmgr.env"),
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(
+            resource_manager.cluster, "get_all_nodes", lambda: [self.node]
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+        shutil.rmtree(self.tmpdir)
+
+    def _recorder(self, name):
+        def _call(*args):
+            self.calls.append(name)
+            return 0, {"out": {"spec": {"path": "/var/lib/pool"}}}
+
+        return _call
+
+    def test_one_request_per_node(self):
+        resmgr = resource_manager._VTResourceManager()
+        pools = [DirPool(DirPool.define_default_config(["node1"])) for _ in range(3)]
+        for pool in pools:
+            resmgr.pools[pool.uuid] = pool
+        resmgr.startup()
+        self.assertEqual(len(self.requests), 1)
+        self.assertEqual(
+            self.calls,
+            ["start_resource_backing_service"] + ["create_pool_connection"] * 3,
+        )
+        for pool in pools:
+            self.assertEqual(pool.connected_nodes, [self.node])
+            self.assertEqual(pool.spec["path"], "/var/lib/pool")
+        del self.calls[:]
+        resmgr.teardown()
+        self.assertEqual(len(self.requests), 2)
+        self.assertEqual(
+            self.calls,
+            ["destroy_pool_connection"] * 3 + ["stop_resource_backing_service"],
+        )
+        for pool in pools:
+            self.assertEqual(pool.connected_nodes, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -307,6 +307,55 @@ class test_XMLTreeFile(xml_test_data):
         self.assertTrue(testxml.find("foo/bar/baz") is not None)
 
 
+class test_LazyXMLTreeFile(xml_test_data):
+    def test_no_file_until_name(self):
+        before = set(self.get_tmp_files(xml_utils.TMPPFX, xml_utils.TMPSFX))
+        xml = xml_utils.LazyXMLTreeFile(self.XMLSTR)
+        copy = xml.backup_copy()
+        self.assertEqual(str(copy), str(xml))
+        after = set(self.get_tmp_files(xml_utils.TMPPFX, xml_utils.TMPSFX))
+        self.assertEqual(before, after)
+        self.assertTrue(self.is_same_contents(xml.name))
+        del xml
+        del copy
+
+    def test_name_follows_tree(self):
+        xml = xml_utils.LazyXMLTreeFile(self.XMLFILE)
+        filename = xml.name
+        xml.find("guest/arch/wordsize").text = "64"
+        self.assertEqual(xml.name, filename)
+        self.assertFalse(self.is_same_contents(filename))
+        with open(filename) as xmlfile:
+            self.assertIn("<wordsize>64</wordsize>", xmlfile.read())
+
+    def test_unlink(self):
+        xml = xml_utils.LazyXMLTreeFile(self.XMLSTR)
+        filename = xml.name
+        xml.unlink()
+        self.assertFalse(os.path.exists(filename))
+
+    def test_restore_from_string(self):
+        xml = xml_utils.LazyXMLTreeFile(self.XMLSTR)
+        xml.find("guest/arch/wordsize").text = "64"
+        xml.restore()
+        self.assertEqual(xml.find("guest/arch/wordsize").text, "32")
+        self.assertTrue(self.is_same_contents(xml.name))
+
+    def test_backup_to_file(self):
+        xml = xml_utils.LazyXMLTreeFile(self.XMLFILE)
+        xml.find("guest/arch/wordsize").text = "64"
+        xml.backup()
+        self.assertFalse(self.is_same_contents(self.XMLFILE))
+        xml.find("guest/arch/wordsize").text = "16"
+        xml.restore()
+        self.assertEqual(xml.find("guest/arch/wordsize").text, "64")
+
+    def test_is_xmltreefile(self):
+        xml = xml_utils.LazyXMLTreeFile(self.XMLSTR)
+        self.assertIsInstance(xml, xml_utils.XMLTreeFile)
+        self.assertEqual(xml.get_xpath(xml.find("host/cpu/arch")), "host/cpu/arch")
+
+
 class test_templatized_xml(xml_test_data):
     def setUp(self):
         self.MAPPING = {"foo": "bar", "bar": "baz", "baz": "foo"}
@@ -5,6 +5,9 @@ import os
 import re
 import shutil
 import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from avocado.utils import cpu, distro, genio, linux_modules
 from avocado.utils import path as utils_path
@@ -430,9 +433,97 @@ def create_host_os_cfg(options):
     LOG.debug("Config file %s generated from %s", host_os_cfg_path, source)
 
 
+def _scan_provider_subdirs(subdirs, config_filter):
+    """
+    List the test modules and config files of the provider subdirs.
+
+    The subdirs are scanned in parallel, the time each took is logged.
+
+    :param subdirs: The provider subdirs to scan.
+    :param config_filter: The filter of the config files.
+    :return: The lists of test modules and of config files.
+    """
+
+    def _scan(subdir):
+        start = time.monotonic()
+        tests = data_dir.SubdirGlobList(subdir, "*.py", test_filter)
+        configs = data_dir.SubdirGlobList(subdir, "*.cfg", config_filter)
+        LOG.debug(
+            "Scanned %s in %.2fs: %d test modules, %d config files",
+            subdir,
+            time.monotonic() - start,
+            len(tests),
+            len(configs),
+        )
+        return tests, configs
+
+    test_list = []
+    file_list = []
+    if subdirs:
+        with ThreadPoolExecutor(max_workers=min(len(subdirs), 8)) as executor:
+            for tests, configs in executor.map(_scan, subdirs):
+                test_list += tests
+                file_list += configs
+    return test_list, file_list
+
+
+def _get_subtest_types_cache_file():
+    return os.path.join(data_dir.get_cache_dir("bootstrap"), "subtest_types.json")
+
+
+def _load_subtest_types_cache():
+    try:
+        with open(_get_subtest_types_cache_file(), "r") as cache:
+            return json.load(cache)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_subtest_types_cache(types_cache):
+    cache_file = _get_subtest_types_cache_file()
+    tmp_file = None
+    try:
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+        with os.fdopen(fd, "w") as cache:
+            json.dump(types_cache, cache)
+        os.replace(tmp_file, cache_file)
+    except OSError as details:
+        LOG.debug("Unable to store the subtest types cache: %s", details)
+        if tmp_file and os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+
+
+def _get_subtest_types(cfg_path, types_cache):
+    """
+    Get the test types set by the ``type =`` lines of a subtest config.
+
+    The types are kept in types_cache, keyed by path and invalidated when
+    the mtime or size of the file change, so only new or modified files
+    are parsed.
+
+    :param cfg_path: Path of the subtest config file.
+    :param types_cache: Dict of the types of the files parsed before.
+    :return: The list of test types.
+    """
+    stat = os.stat(cfg_path)
+    entry = types_cache.get(cfg_path)
+    if entry and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+        return entry[2]
+    types = []
+    with open(cfg_path, "r") as cfg_file:
+        for line in cfg_file:
+            line = line.strip()
+            if re.match(r"type\s*=.*", line):
+                cartesian_parser = cartesian_config.Parser()
+                cartesian_parser.parse_string(line)
+                td = next(cartesian_parser.get_dicts())
+                types.extend(td["type"].split(" "))
+    types_cache[cfg_path] = [stat.st_mtime_ns, stat.st_size, types]
+    return types
+
+
 def create_subtests_cfg(t_type):
-    specific_test_list = []
-    specific_file_list = []
     specific_subdirs = asset.get_test_provider_subdirs(t_type)
     provider_names_specific = asset.get_test_provider_names(t_type)
     config_filter = get_config_filter()
@@ -441,9 +532,9 @@ def create_subtests_cfg(t_type):
     for specific_provider in provider_names_specific:
         provider_info_specific.append(asset.get_test_provider_info(specific_provider))
 
-    for subdir in specific_subdirs:
-        specific_test_list += data_dir.SubdirGlobList(subdir, "*.py", test_filter)
-        specific_file_list += data_dir.SubdirGlobList(subdir, "*.cfg", config_filter)
+    specific_test_list, specific_file_list = _scan_provider_subdirs(
+        specific_subdirs, config_filter
+    )
 
     shared_test_list = []
     shared_file_list = []
@@ -457,9 +548,9 @@ def create_subtests_cfg(t_type):
         provider_info_shared.append(asset.get_test_provider_info(shared_provider))
 
     if not t_type == "lvsb":
-        for subdir in shared_subdirs:
-            shared_test_list += data_dir.SubdirGlobList(subdir, "*.py", test_filter)
-            shared_file_list += data_dir.SubdirGlobList(subdir, "*.cfg", config_filter)
+        shared_test_list, shared_file_list = _scan_provider_subdirs(
+            shared_subdirs, config_filter
+        )
 
     all_specific_test_list = []
     for test in specific_test_list:
@@ -499,7 +590,10 @@ def create_subtests_cfg(t_type):
 
     first_subtest_file = []
     last_subtest_file = []
-    non_dropin_tests = []
+    non_dropin_tests = set()
+    listed_files = set()
+    types_cache = _load_subtest_types_cache()
+    cached_types = dict(types_cache)
     tmp = []
 
     for shared_file in shared_file_list:
@@ -514,29 +608,20 @@ def create_subtests_cfg(t_type):
                 provider_name = p["name"]
                 break
 
-        shared_file_obj = open(shared_file, "r")
-        for line in shared_file_obj.readlines():
-            line = line.strip()
-            if re.match(r"type\s*=.*", line):
-                cartesian_parser = cartesian_config.Parser()
-                cartesian_parser.parse_string(line)
-                td = next(cartesian_parser.get_dicts())
-                values = td["type"].split(" ")
-                for value in values:
-                    if t_type not in non_dropin_tests:
-                        non_dropin_tests.append("%s.%s" % (provider_name, value))
+        for value in _get_subtest_types(shared_file, types_cache):
+            non_dropin_tests.add("%s.%s" % (provider_name, value))
 
         shared_file_name = os.path.basename(shared_file)
         shared_file_name = shared_file_name.split(".")[0]
+        if (provider_name, shared_file) in listed_files:
+            continue
+        listed_files.add((provider_name, shared_file))
         if shared_file_name in first_subtest[t_type]:
-            if [provider_name, shared_file] not in first_subtest_file:
-                first_subtest_file.append([provider_name, shared_file])
+            first_subtest_file.append([provider_name, shared_file])
         elif shared_file_name in last_subtest[t_type]:
-            if [provider_name, shared_file] not in last_subtest_file:
-                last_subtest_file.append([provider_name, shared_file])
+            last_subtest_file.append([provider_name, shared_file])
         else:
-            if [provider_name, shared_file] not in tmp:
-                tmp.append([provider_name, shared_file])
+            tmp.append([provider_name, shared_file])
     shared_file_list = tmp
 
     tmp = []
@@ -548,30 +633,23 @@ def create_subtests_cfg(t_type):
                 provider_name = p["name"]
                 break
 
-        shared_file_obj = open(shared_file, "r")
-        for line in shared_file_obj.readlines():
-            line = line.strip()
-            if re.match(r"type\s*=.*", line):
-                cartesian_parser = cartesian_config.Parser()
-                cartesian_parser.parse_string(line)
-                td = next(cartesian_parser.get_dicts())
-                values = td["type"].split(" ")
-                for value in values:
-                    if value not in non_dropin_tests:
-                        non_dropin_tests.append("%s.%s" % (provider_name, value))
+        for value in _get_subtest_types(shared_file, types_cache):
+            non_dropin_tests.add("%s.%s" % (provider_name, value))
 
         shared_file_name = os.path.basename(shared_file)
         shared_file_name = shared_file_name.split(".")[0]
+        if (provider_name, shared_file) in listed_files:
+            continue
+        listed_files.add((provider_name, shared_file))
         if shared_file_name in first_subtest[t_type]:
-            if [provider_name, shared_file] not in first_subtest_file:
-                first_subtest_file.append([provider_name, shared_file])
+            first_subtest_file.append([provider_name, shared_file])
         elif shared_file_name in last_subtest[t_type]:
-            if [provider_name, shared_file] not in last_subtest_file:
-                last_subtest_file.append([provider_name, shared_file])
+            last_subtest_file.append([provider_name, shared_file])
         else:
-            if [provider_name, shared_file] not in tmp:
-                tmp.append([provider_name, shared_file])
+            tmp.append([provider_name, shared_file])
     specific_file_list = tmp
+    if types_cache != cached_types:
+        _save_subtest_types_cache(types_cache)
 
     subtests_cfg = os.path.join(data_dir.get_backend_dir(t_type), "cfg", "subtests.cfg")
     subtests_file = open(subtests_cfg, "w")
@@ -893,23 +971,34 @@ def _load_cluster_config(cluster_config):
 def _register_hosts(hosts_configs):
     """Register the configs of the hosts into the cluster.
 
-    It cleans up any previous environment and then iterates through the
-    host configurations, setting up an agent environment for each and
-    registering it as a node in the cluster.
+    It cleans up any previous environment, sets up an agent environment
+    for the hosts in parallel and registers the ones that succeeded as
+    nodes in the cluster.
 
     :param hosts_configs: A dictionary of host configurations.
     :type hosts_configs: dict
     """
     if hosts_configs:
         cluster.cleanup_env()
+        nodes = []
         for host, host_params in hosts_configs.items():
             try:
-                _node = node.Node(host_params, host)
-                _node.setup_agent_env()
-                cluster.register_node(_node.name, _node)
-                LOG.debug("Host %s registered", host)
+                nodes.append(node.Node(host_params, host))
             except Exception as e:
                 LOG.warning("Skipping host %s due to setup error: %s", host, e)
+        errors = node.run_on_nodes(
+            nodes, lambda _node: _node.setup_agent_env(), "set up the agent environment"
+        )
+        for _node in nodes:
+            if _node.name in errors:
+                LOG.warning(
+                    "Skipping host %s due to setup error: %s",
+                    _node.name,
+                    errors[_node.name],
+                )
+                continue
+            cluster.register_node(_node.name, _node)
+            LOG.debug("Host %s registered", _node.name)
 
 
 def _setup_managers(pools_params):
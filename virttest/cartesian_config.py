@@ -133,17 +133,24 @@ The base of the definitions come verbatim as follows:
 """
 
 import collections
+import hashlib
 import logging
+import multiprocessing
 import optparse
 import os
+import pickle
 import re
 import sys
+import tempfile
 
 _reserved_keys = set(
     ("name", "shortname", "dep", "_short_name_map_file", "_name_map_file")
 )
 options = None
 num_failed_cases = 5
+# Bump whenever the layout of the parsed tree (Node, filters, operators)
+# changes, so stale on-disk caches are ignored.
+_tree_cache_version = 1
 
 
 LOG = logging.getLogger("avocado." + __name__)
@@ -617,11 +624,19 @@ def _substitution(value, d):
     if "$" in value:
         start = 0
         st = ""
-        d_flat = _drop_suffixes(d)
+        # Flattening copies the whole dict, plain keys are looked up
+        # directly and only suffixed ones need the flattened copy
+        d_flat = None
         try:
             match = match_substitute.search(value, start)
             while match:
-                val = d_flat[match.group(1)]
+                key = match.group(1)
+                if key in d:
+                    val = d[key]
+                else:
+                    if d_flat is None:
+                        d_flat = _drop_suffixes(d)
+                    val = d_flat[key]
                 st += value[start : match.start()] + str(val)
                 start = match.end()
                 match = match_substitute.search(value, start)
@@ -1480,11 +1495,31 @@ def parse_filter(lexer, tokens):
 class Parser(object):
     # pylint: disable=W0102
 
-    def __init__(self, filename=None, defaults=False, expand_defaults=[], debug=False):
+    def __init__(
+        self,
+        filename=None,
+        defaults=False,
+        expand_defaults=[],
+        debug=False,
+        cache_dir=None,
+        parallel_dicts=0,
+    ):
         self.node = Node()
         self.debug = debug
         self.defaults = defaults
         self.expand_defaults = [LIdentifier(x) for x in expand_defaults]
+        # Directory holding compiled trees of previously parsed files,
+        # caching is disabled when None.
+        self.cache_dir = cache_dir
+        # Files read while parsing, used to validate the compiled tree cache
+        self.parsed_files = []
+        # Number of processes generating the dicts, sequential when <= 1
+        self.parallel_dicts = parallel_dicts
+        # Parameters shared by the dicts of each leaf, see _get_leaf_base()
+        self._leaf_bases = {}
+        # Nodes visited and subtrees pruned while generating the dicts
+        self.visited_nodes = 0
+        self.pruned_nodes = 0
 
         self.filename = filename
         if self.filename:
@@ -1513,12 +1548,97 @@ class Parser(object):
         """
         Parse a file.
 
+        When a cache dir was given and nothing was parsed so far, the
+        compiled tree is loaded from the cache if none of the files it
+        was built from changed, otherwise it is parsed and stored there.
+
         :param filename: Path of the configuration file.
         """
         self.node.filename = filename
-        self.node = self._parse(Lexer(FileReader(filename)), self.node)
+        self.parsed_files.append(filename)
+        if self.cache_dir and not (self.node.content or self.node.children):
+            cache_file = self._get_tree_cache_file(filename)
+            node = self._load_tree_cache(cache_file)
+            if node is None:
+                node = self._parse(Lexer(FileReader(filename)), self.node)
+                self._store_tree_cache(cache_file, node)
+            self.node = node
+        else:
+            self.node = self._parse(Lexer(FileReader(filename)), self.node)
         self.filename = filename
 
+    def _get_tree_cache_file(self, filename):
+        """
+        Get the path of the compiled tree cache of a top level file.
+
+        :param filename: Path of the configuration file.
+        :return: Path of the cache file, it may not exist.
+        """
+        key = repr(
+            (
+                _tree_cache_version,
+                filename,
+                os.path.abspath(filename),
+                self.defaults,
+                [str(x) for x in self.expand_defaults],
+            )
+        )
+        digest = hashlib.sha256(key.encode()).hexdigest()
+        return os.path.join(self.cache_dir, "%s.tree" % digest)
+
+    @staticmethod
+    def _hash_files(filenames):
+        digests = {}
+        for filename in filenames:
+            with open(filename, "rb") as f:
+                digests[filename] = hashlib.sha256(f.read()).hexdigest()
+        return digests
+
+    def _load_tree_cache(self, cache_file):
+        """
+        Load a compiled tree unless any of its source files changed.
+
+        :param cache_file: Path of the cache file.
+        :return: The root Node or None if the cache is missing or stale.
+        """
+        try:
+            with open(cache_file, "rb") as f:
+                digests = pickle.load(f)
+                if self._hash_files(digests) != digests:
+                    self._debug("compiled tree %s is stale", cache_file)
+                    return None
+                node = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as details:
+            self._warn("Ignoring unusable compiled tree %s: %s", cache_file, details)
+            return None
+        self._debug("using compiled tree %s", cache_file)
+        self.parsed_files = list(digests)
+        return node
+
+    def _store_tree_cache(self, cache_file, node):
+        """
+        Store a compiled tree along with the digests of its source files.
+
+        :param cache_file: Path of the cache file.
+        :param node: The root Node to be stored.
+        """
+        tmp_file = None
+        try:
+            digests = self._hash_files(self.parsed_files)
+            os.makedirs(self.cache_dir, exist_ok=True)
+            fd, tmp_file = tempfile.mkstemp(dir=self.cache_dir, suffix=".tmp")
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(digests, f, pickle.HIGHEST_PROTOCOL)
+                pickle.dump(node, f, pickle.HIGHEST_PROTOCOL)
+            # Atomic for concurrent jobs sharing the same cache dir
+            os.replace(tmp_file, cache_file)
+        except Exception as details:
+            self._warn("Unable to store compiled tree %s: %s", cache_file, details)
+            if tmp_file and os.path.exists(tmp_file):
+                os.unlink(tmp_file)
+
     def parse_string(self, s):
         """
         Parse a string.
@@ -1959,6 +2079,7 @@ class Parser(object):
                             lexer.line, lexer.filename, lexer.linenum
                         )
                     pre_dict = apply_predict(lexer, node, pre_dict)
+                    self.parsed_files.append(filename)
                     lch = Lexer(FileReader(filename))
                     node = self._parse(lch, node, -1)
                     lexer.set_prev_indent(prev_indent)
@@ -2021,6 +2142,13 @@ class Parser(object):
             Transforms into:
                 join a a
         """
+        if node is None and self.parent_generator and self.parallel_dicts > 1:
+            shards = self._get_dicts_shards()
+            if shards:
+                for d in self._get_dicts_parallel(shards):
+                    yield d
+                return
+
         node = node or self.node
 
         # Keep track to know who is a parent generator
@@ -2048,9 +2176,16 @@ class Parser(object):
             # Accumulate all joins at one node
             joins += [t]
 
+        if parent:
+            self.visited_nodes = 0
+            self.pruned_nodes = 0
+            yielded = 0
+
         if not joins:
             # Return generator
             for d in self.get_dicts_plain(node, ctx, content, shortname, dep):
+                if parent:
+                    yielded += 1
                 yield _drop_suffixes(d) if parent else d
         else:
             # Rewrite all separate joins in one node as many `only'
@@ -2064,9 +2199,87 @@ class Parser(object):
             old_content = node.content[:]
             node.content = new_content
             for d in self.multiply_join(onlys, node, ctx, content, shortname, dep):
+                if parent:
+                    yielded += 1
                 yield _drop_suffixes(d) if parent else d
             node.content = old_content[:]
 
+        if parent:
+            self._debug(
+                "visited %d nodes, pruned %d subtrees, yielded %d dicts",
+                self.visited_nodes,
+                self.pruned_nodes,
+                yielded,
+            )
+
+    def _get_split_node(self):
+        """
+        Get the first node of the tree that branches into several variants.
+
+        :return: The node or None if the tree does not branch at all.
+        """
+        node = self.node
+        while len(node.children) == 1:
+            node = node.children[0]
+        if node.children:
+            return node
+        return None
+
+    def _get_dicts_shards(self):
+        """
+        Split the variants of the first branching node into ranges.
+
+        Each range is a contiguous slice of the children of that node, so
+        concatenating the dicts generated for every range in order gives
+        the very same sequence as the sequential generator.
+
+        :return: List of (start, stop) children ranges, empty when the
+                 tree can't be generated in parallel.
+        """
+        # Defaults and joins depend on the dicts generated by siblings
+        if self.defaults:
+            return []
+        node = self.node
+        while True:
+            for _, _, obj in node.content:
+                if isinstance(obj, JoinFilter):
+                    return []
+            if len(node.children) != 1:
+                break
+            node = node.children[0]
+        split_node = self._get_split_node()
+        if split_node is None:
+            return []
+        children = len(split_node.children)
+        # Several shards per process to balance unevenly sized subtrees
+        count = min(children, self.parallel_dicts * 4)
+        bounds = [children * i // count for i in range(count + 1)]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _get_dicts_parallel(self, shards):
+        """
+        Generate the dicts of every shard in a pool of processes.
+
+        :param shards: List of (start, stop) children ranges.
+        :return: A dict generator, in the same order as get_dicts().
+        """
+        processes = min(self.parallel_dicts, len(shards))
+        self._debug(
+            "generating dicts of %d shards in %d processes", len(shards), processes
+        )
+        pool = multiprocessing.Pool(
+            processes, initializer=_init_dicts_worker, initargs=(self,)
+        )
+        try:
+            for dicts in pool.imap(_get_dicts_shard, shards):
+                for d in dicts:
+                    yield d
+        finally:
+            pool.terminate()
+            pool.join()
+        # Match the sequential generator, which is a parent only once
+        self.parent_generator = False
+
     def mk_name(self, n1, n2):
         """Make name for test. Case: two dics were merged"""
         common_prefix = n1[: [x[0] == x[1] for x in list(zip(n1, n2))].index(0)]
@@ -2109,6 +2322,60 @@ class Parser(object):
                     d["shortname"] = self.mk_name(d1["shortname"], d2["shortname"])
                     yield d
 
+    def _get_leaf_base(self, node):
+        """
+        Get the parameters shared by every dict generated from a leaf.
+
+        The leading assignments of a leaf don't depend on the variant
+        being generated, so they are applied only once per leaf and the
+        result is copied into every dict instead of replaying them.
+
+        :param node: Leaf node.
+        :return: Tuple with the count of content items already applied
+                 and the resulting parameters.
+        """
+        prefix = []
+        for t in node.content:
+            op = t[2]
+            if not isinstance(op, LOperators):
+                break
+            # Values substituted from name, shortname or dep differ per dict
+            if isinstance(op.value, str) and "$" in op.value:
+                if _reserved_keys.intersection(match_substitute.findall(op.value)):
+                    break
+            prefix.append(t)
+        cached = self._leaf_bases.get(id(node))
+        if cached is not None:
+            items, base = cached
+            if len(items) == len(prefix) and all(a is b for a, b in zip(items, prefix)):
+                return len(prefix), base
+        base = {}
+        for _, _, op in prefix:
+            op.apply_to_dict(base)
+        self._leaf_bases[id(node)] = (prefix, base)
+        return len(prefix), base
+
+    def _prune_child(self, node, ctx, filters):
+        """
+        Check whether a child can be skipped without descending into it.
+
+        The descendant labels of every node are indexed while parsing, so
+        the only/no filters still pending in the parent can reject whole
+        subtrees before their content is processed.
+
+        :param node: Child node about to be visited.
+        :param ctx: Labels of the parent context.
+        :param filters: Pending OnlyFilter and NoFilter objects.
+        :return: True if the child subtree can't yield any dict.
+        """
+        ctx = ctx + node.name
+        ctx_set = set(ctx)
+        for obj in filters:
+            if obj.requires_action(ctx, ctx_set, node.labels):
+                self.pruned_nodes += 1
+                return True
+        return False
+
     def get_dicts_plain(self, node=None, ctx=[], content=[], shortname=[], dep=[]):
         """
         Generate dictionaries from the code parsed so far.  This should
@@ -2207,6 +2474,7 @@ class Parser(object):
                 node.failed_cases.pop()
 
         node = node or self.node
+        self.visited_nodes += 1
         # if self.debug:    #Print dict on which is working now.
         #    node.dump(0)
         # Update dep
@@ -2255,8 +2523,15 @@ class Parser(object):
 
         # Recurse into children
         count = 0
+        filters = [
+            obj
+            for _, _, obj in new_content
+            if type(obj) is OnlyFilter or type(obj) is NoFilter
+        ]
         if self.defaults and node.var_name not in self.expand_defaults:
             for n in node.children:
+                if filters and self._prune_child(n, ctx, filters):
+                    continue
                 for d in self.get_dicts(n, ctx, new_content, shortname, dep):
                     count += 1
                     yield d
@@ -2264,6 +2539,8 @@ class Parser(object):
                     break
         else:
             for n in node.children:
+                if filters and self._prune_child(n, ctx, filters):
+                    continue
                 for d in self.get_dicts(n, ctx, new_content, shortname, dep):
                     count += 1
                     yield d
@@ -2275,12 +2552,44 @@ class Parser(object):
                 "dep": dep,
                 "shortname": ".".join([str(sn.name) for sn in shortname]),
             }
-            for _, _, op in new_content:
+            count, base = self._get_leaf_base(node)
+            d.update(base)
+            for key in ("_name_map_file", "_short_name_map_file"):
+                if key in base:
+                    d[key] = base[key].copy()
+            for _, _, op in new_content[count:]:
                 op.apply_to_dict(d)
             postfix_parse(d)
             yield d
 
 
+_dicts_worker_parser = None
+
+
+def _init_dicts_worker(parser):
+    global _dicts_worker_parser
+    _dicts_worker_parser = parser
+
+
+def _get_dicts_shard(shard):
+    """
+    Generate the dicts of a range of variants in a pool worker.
+
+    :param shard: (start, stop) range of the children of the split node.
+    :return: List of the generated dicts.
+    """
+    parser = _dicts_worker_parser
+    split_node = parser._get_split_node()
+    children = split_node.children
+    split_node.children = children[shard[0] : shard[1]]
+    try:
+        parser.parallel_dicts = 0
+        parser.parent_generator = True
+        return list(parser.get_dicts())
+    finally:
+        split_node.children = children
+
+
 def print_dicts_default(options, dicts):
     """Print dictionaries in the default mode"""
     for count, dic in enumerate(dicts):
@@ -2370,6 +2679,8 @@ def postfix_parse(dic):
         # Bypass the case that use tuple as key value
         if isinstance(key, tuple):
             continue
+        if not key.endswith(("_max", "_min", "_fixed")):
+            continue
         if key.endswith("_max"):
             tmp_key = key.split("_max")[0]
             if tmp_key not in dic or compare_string(dic[tmp_key], dic[key]) > 0:
@@ -2443,6 +2754,21 @@ if __name__ == "__main__":
         help="Don't drop variables with different suffixes and same val",
     )
 
+    parser.add_option(
+        "--parallel-dicts",
+        dest="parallel_dicts",
+        type="int",
+        default=0,
+        help="number of processes used to generate the dicts",
+    )
+
+    parser.add_option(
+        "--cache-dir",
+        dest="cache_dir",
+        type="string",
+        help="directory used to cache compiled config trees across runs",
+    )
+
     options, args = parser.parse_args()
     if not args:
         parser.error("filename required")
@@ -2454,7 +2780,12 @@ if __name__ == "__main__":
     if options.expand:
         expand = [x.strip() for x in options.expand.split(",")]
     c = Parser(
-        args[0], defaults=options.defaults, expand_defaults=expand, debug=options.debug
+        args[0],
+        defaults=options.defaults,
+        expand_defaults=expand,
+        debug=options.debug,
+        cache_dir=options.cache_dir,
+        parallel_dicts=options.parallel_dicts,
     )
     for s in args[1:]:
         c.parse_string(s)
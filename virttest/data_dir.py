@@ -229,6 +229,18 @@ def get_tmp_dir(public=True):
     return tmp_dir
 
 
+def get_cache_dir(name=None):
+    """
+    Get the directory holding data cached across jobs.
+
+    :param name: Optional name of a cache subdirectory.
+    """
+    cache_dir = os.path.join(get_data_dir(), "cache")
+    if name is not None:
+        cache_dir = os.path.join(cache_dir, name)
+    return cache_dir
+
+
 def get_base_download_dir():
     return BASE_DOWNLOAD_DIR
 
@@ -17,7 +17,7 @@ from aexpect import remote
 from avocado.core import exceptions
 from avocado.utils import archive
 from avocado.utils import cpu as cpu_utils
-from avocado.utils import crypto, path
+from avocado.utils import path
 from avocado.utils import process as a_process
 from six.moves import xrange
 
@@ -30,6 +30,7 @@ from virttest import (
     ppm_utils,
     qemu_monitor,
     qemu_storage,
+    screendump_utils,
     storage,
     test_setup,
     utils_libguestfs,
@@ -1411,7 +1412,9 @@ def postprocess(test, params, env):
     global _screendump_thread, _screendump_thread_termination_event
     if _screendump_thread is not None:
         _screendump_thread_termination_event.set()
-        _screendump_thread.join(30)
+        # The frames are renumbered when the thread ends, wait for it
+        # before encoding the video
+        _screendump_thread.join()
         _screendump_thread = None
 
     # Encode an HTML 5 compatible video from the screenshots produced
@@ -1714,106 +1717,100 @@ def _take_screendumps(test, params, env):
     inactivity_treshold = float(params.get("inactivity_treshold", 1800))
     inactivity_watcher = params.get("inactivity_watcher", "log")
 
-    cache = {}
+    encoder = screendump_utils.ScreendumpEncoder(
+        quality,
+        int(params.get("screendump_workers", screendump_utils.WORKERS)),
+        int(params.get("screendump_cache_size", screendump_utils.CACHE_SIZE)),
+        int(params.get("screendump_queue_size", screendump_utils.QUEUE_SIZE)),
+    )
     counter = {}
     inactivity = {}
 
-    while True:
-        for vm in env.get_all_vms():
-            if vm.instance not in list(counter.keys()):
-                counter[vm.instance] = 0
-            if vm.instance not in list(inactivity.keys()):
-                inactivity[vm.instance] = time.time()
-            if not vm.is_alive():
-                continue
-            vm_pid = vm.get_pid()
-            try:
-                vm.screendump(filename=temp_filename, debug=False)
-            except qemu_monitor.MonitorError as e:
-                LOG.warning(e)
-                continue
-            except AttributeError as e:
-                LOG.warning(e)
-                continue
-            if not os.path.exists(temp_filename):
-                LOG.warning("VM '%s' failed to produce a screendump", vm.name)
-                continue
-            verify_image_format = {
-                "ppm": ppm_utils.image_verify_ppm_file,
-                "png": png_utils.image_verify_png_file,
-            }
-            verify_result = verify_image_format.get(image_format)
-            if verify_result and not verify_result(temp_filename):
-                if not verify_result(temp_filename):
-                    LOG.warning("VM '%s' produced an invalid screendump", vm.name)
-                    os.unlink(temp_filename)
+    try:
+        while True:
+            for vm in env.get_all_vms():
+                if vm.instance not in list(counter.keys()):
+                    counter[vm.instance] = 0
+                if vm.instance not in list(inactivity.keys()):
+                    inactivity[vm.instance] = time.time()
+                if not vm.is_alive():
                     continue
-            screendump_dir = "screendumps_%s_%s_iter%s" % (
-                vm.name,
-                vm_pid,
-                test.iteration,
-            )
-            screendump_dir = os.path.join(test.debugdir, screendump_dir)
-            try:
-                os.makedirs(screendump_dir)
-            except OSError:
-                pass
-            counter[vm.instance] += 1
-            filename = "%04d.jpg" % counter[vm.instance]
-            screendump_filename = os.path.join(screendump_dir, filename)
-            vm.verify_bsod(screendump_filename)
-            image_hash = crypto.hash_file(temp_filename)
-            if image_hash in cache:
-                time_inactive = time.time() - inactivity[vm.instance]
-                if time_inactive > inactivity_treshold:
-                    msg = "%s screen is inactive for more than %d s (%d min)" % (
-                        vm.name,
-                        time_inactive,
-                        time_inactive // 60,
-                    )
-                    if inactivity_watcher == "error":
-                        try:
-                            raise virt_vm.VMScreenInactiveError(vm, time_inactive)
-                        except virt_vm.VMScreenInactiveError:
-                            LOG.error(msg)
-                            # Let's reset the counter
-                            inactivity[vm.instance] = time.time()
-                            test.background_errors.put(sys.exc_info())
-                    elif inactivity_watcher == "log":
-                        LOG.debug(msg)
-            else:
-                inactivity[vm.instance] = time.time()
-            cache[image_hash] = screendump_filename
-            try:
+                vm_pid = vm.get_pid()
+                try:
+                    vm.screendump(filename=temp_filename, debug=False)
+                except qemu_monitor.MonitorError as e:
+                    LOG.warning(e)
+                    continue
+                except AttributeError as e:
+                    LOG.warning(e)
+                    continue
+                if not os.path.exists(temp_filename):
+                    LOG.warning("VM '%s' failed to produce a screendump", vm.name)
+                    continue
+                verify_image_format = {
+                    "ppm": ppm_utils.image_verify_ppm_file,
+                    "png": png_utils.image_verify_png_file,
+                }
+                verify_result = verify_image_format.get(image_format)
+                if verify_result and not verify_result(temp_filename):
+                    if not verify_result(temp_filename):
+                        LOG.warning("VM '%s' produced an invalid screendump", vm.name)
+                        os.unlink(temp_filename)
+                        continue
+                screendump_dir = "screendumps_%s_%s_iter%s" % (
+                    vm.name,
+                    vm_pid,
+                    test.iteration,
+                )
+                screendump_dir = os.path.join(test.debugdir, screendump_dir)
+                try:
+                    os.makedirs(screendump_dir)
+                except OSError:
+                    pass
+                counter[vm.instance] += 1
+                filename = "%04d.jpg" % counter[vm.instance]
+                screendump_filename = os.path.join(screendump_dir, filename)
+                vm.verify_bsod(screendump_filename)
                 try:
-                    timestamp = os.stat(temp_filename).st_ctime
-                    image = PIL.Image.open(temp_filename)
-                    if image_format == "ppm":
-                        image = ppm_utils.add_timestamp(image, timestamp)
-                    if image_format == "png":
-                        image = png_utils.add_png_timestamp(image, timestamp)
-                    image.save(screendump_filename, format="JPEG", quality=quality)
+                    data, timestamp = screendump_utils.read_screendump(temp_filename)
                 except (IOError, OSError) as error_detail:
                     LOG.warning(
-                        "VM '%s' failed to produce a " "screendump: %s",
+                        "VM '%s' failed to produce a screendump: %s",
                         vm.name,
                         error_detail,
                     )
-                    # Decrement the counter as we in fact failed to
-                    # produce a converted screendump
-                    counter[vm.instance] -= 1
-            except NameError:
-                pass
-            os.unlink(temp_filename)
-
-        if _screendump_thread_termination_event is not None:
-            if _screendump_thread_termination_event.is_set():
-                _screendump_thread_termination_event = None
+                    continue
+                if encoder.add(data, image_format, timestamp, screendump_filename):
+                    time_inactive = time.time() - inactivity[vm.instance]
+                    if time_inactive > inactivity_treshold:
+                        msg = "%s screen is inactive for more than %d s (%d min)" % (
+                            vm.name,
+                            time_inactive,
+                            time_inactive // 60,
+                        )
+                        if inactivity_watcher == "error":
+                            try:
+                                raise virt_vm.VMScreenInactiveError(vm, time_inactive)
+                            except virt_vm.VMScreenInactiveError:
+                                LOG.error(msg)
+                                # Let's reset the counter
+                                inactivity[vm.instance] = time.time()
+                                test.background_errors.put(sys.exc_info())
+                        elif inactivity_watcher == "log":
+                            LOG.debug(msg)
+                else:
+                    inactivity[vm.instance] = time.time()
+
+            if _screendump_thread_termination_event is not None:
+                if _screendump_thread_termination_event.is_set():
+                    _screendump_thread_termination_event = None
+                    break
+                _screendump_thread_termination_event.wait(delay)
+            else:
+                # Exit event was deleted, exit this thread
                 break
-            _screendump_thread_termination_event.wait(delay)
-        else:
-            # Exit event was deleted, exit this thread
-            break
+    finally:
+        encoder.close()
 
 
 def store_vm_info(vm, log_filename, info_cmd="registers", append=False, vmtype="qemu"):
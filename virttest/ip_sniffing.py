@@ -2,8 +2,18 @@
 IP sniffing facilities
 """
 
+import ctypes
+import ctypes.util
+import errno
+import glob
+import json
 import logging
+import os
 import re
+import select
+import socket
+import struct
+import sys
 import threading
 
 try:
@@ -22,6 +32,26 @@ from virttest.utils_version import VersionInterval
 
 LOG = logging.getLogger("avocado." + __name__)
 
+# From linux/netlink.h and linux/rtnetlink.h
+NETLINK_ROUTE = 0
+NLM_F_REQUEST = 0x1
+NLM_F_DUMP = 0x300
+RTM_NEWNEIGH = 28
+RTM_GETNEIGH = 30
+RTMGRP_NEIGH = 0x4
+NDA_DST = 1
+NDA_LLADDR = 2
+# From linux/neighbour.h
+NUD_INCOMPLETE = 0x01
+NUD_FAILED = 0x20
+# From linux/inotify.h
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = os.O_CLOEXEC
+
 
 class AddrCache(object):
     """
@@ -32,6 +62,7 @@ class AddrCache(object):
         """Initializes the address cache."""
         self._data = {}
         self._lock = threading.RLock()
+        self._updated = threading.Condition(self._lock)
 
     def __repr__(self):
         return repr(self._data)
@@ -39,11 +70,13 @@ class AddrCache(object):
     def __getstate__(self):
         state = self.__dict__.copy()
         del state["_lock"]
+        state.pop("_updated", None)
         return state
 
     def __setstate__(self, state):
         self.__dict__.update(state)
         self._lock = threading.RLock()
+        self._updated = threading.Condition(self._lock)
 
     @staticmethod
     def _format_hwaddr(hwaddr):
@@ -55,6 +88,7 @@ class AddrCache(object):
             if self._data.get(hwaddr) == ipaddr:
                 return
             self._data[hwaddr] = ipaddr
+            self._updated.notify_all()
         LOG.debug(
             "Updated HWADDR (%s)<->(%s) IP pair " "into address cache", hwaddr, ipaddr
         )
@@ -90,6 +124,16 @@ class AddrCache(object):
         """
         return self.__delitem__(hwaddr)
 
+    def wait_for_update(self, timeout):
+        """
+        Wait until an address pair is added or changed.
+
+        :param timeout: Time to wait for an update.
+        :return: True if the cache was updated, False on timeout.
+        """
+        with self._lock:
+            return self._updated.wait(timeout)
+
     def update(self, cache):
         """
         Update the address cache with the address pairs from other,
@@ -124,6 +168,8 @@ class Sniffer(object):
     provided by the subclasses.
     """
 
+    #: Name selecting the sniffer through the `ip_sniffer` param
+    name = ""
     #: Sniffer's command name
     command = ""
     #: Sniffer's options
@@ -244,6 +290,7 @@ class TcpdumpSniffer(Sniffer):
     Tcpdump sniffer class.
     """
 
+    name = "tcpdump"
     command = "tcpdump"
     options = "-tnpvvvi any 'port 68 or port 546'"
 
@@ -293,6 +340,7 @@ class TSharkSniffer(Sniffer):
     TShark sniffer base class.
     """
 
+    name = "tshark"
     command = "tshark"
     # Supported versions by the class
     supported_versions = ()
@@ -387,5 +435,201 @@ class TShark3ToLatest(TSharkSniffer):
     supported_versions = VersionInterval("[3.0.0,)")
 
 
+class LeaseSniffer(Sniffer):
+    """
+    Lease file and neighbour table sniffer class.
+
+    Instead of parsing the DHCP traffic, it watches the lease files of
+    dnsmasq (and of the libvirt networks) with inotify, and listens to the
+    updates of the kernel IPv4 neighbour table over rtnetlink.  Only the
+    local host is supported.
+    """
+
+    name = "lease"
+    #: Directories holding the dnsmasq lease files
+    lease_dirs = ("/var/lib/libvirt/dnsmasq", "/var/lib/dnsmasq", "/var/lib/misc")
+    _re_mac = re.compile(r"^([0-9a-f]{2}:){5}[0-9a-f]{2}$", re.I)
+
+    def __init__(self, addr_cache, log_file, remote_opts=None):
+        super(LeaseSniffer, self).__init__(addr_cache, log_file, remote_opts)
+        self._thread = None
+        self._stop_pipe = None
+
+    @classmethod
+    def is_supported(cls, session=None):
+        return session is None and sys.platform.startswith("linux")
+
+    def _update(self, mac, ip, origin):
+        if not self._re_mac.match(mac):
+            return
+        if ":" in ip:
+            mac = "%s_6" % mac
+        if self._cache[mac] == ip:
+            return
+        try:
+            log_line(self._logfile, "%s: %s %s" % (origin, mac, ip))
+        except Exception as e:
+            LOG.warning("Can't log ip sniffer output: '%s'", e)
+        self._cache[mac] = ip
+
+    def _read_lease_file(self, path):
+        try:
+            with open(path) as lease_file:
+                content = lease_file.read()
+        except IOError:
+            return
+        if path.endswith(".status"):
+            # libvirt network: JSON list of the active leases
+            try:
+                leases = json.loads(content or "[]")
+            except ValueError:
+                return
+            for lease in leases:
+                mac = lease.get("mac-address")
+                ip = lease.get("ip-address")
+                if mac and ip:
+                    self._update(mac, ip, path)
+        else:
+            # dnsmasq: "<expiry> <mac> <ip> <hostname> <client-id>"
+            for line in content.splitlines():
+                fields = line.split()
+                if len(fields) >= 3:
+                    self._update(fields[1], fields[2], path)
+
+    @staticmethod
+    def _is_lease_file(name):
+        return name.endswith(".leases") or name.endswith(".status")
+
+    def _read_lease_dir(self, lease_dir):
+        for path in sorted(glob.glob(os.path.join(lease_dir, "*"))):
+            if self._is_lease_file(path):
+                self._read_lease_file(path)
+
+    def _watch_lease_dirs(self):
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        inotify_fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if inotify_fd < 0:
+            LOG.warning(
+                "Can't watch the lease files: %s", os.strerror(ctypes.get_errno())
+            )
+            return None, {}
+        watches = {}
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        for lease_dir in self.lease_dirs:
+            if not os.path.isdir(lease_dir):
+                continue
+            wd = libc.inotify_add_watch(inotify_fd, lease_dir.encode(), mask)
+            if wd >= 0:
+                watches[wd] = lease_dir
+        return inotify_fd, watches
+
+    def _handle_inotify(self, inotify_fd, watches):
+        try:
+            data = os.read(inotify_fd, 65536)
+        except BlockingIOError:
+            return
+        changed = set()
+        while data:
+            wd, _, _, length = struct.unpack("iIII", data[:16])
+            name = data[16 : 16 + length].rstrip(b"\0").decode(errors="replace")
+            data = data[16 + length :]
+            if wd in watches and self._is_lease_file(name):
+                changed.add(os.path.join(watches[wd], name))
+        for path in sorted(changed):
+            self._read_lease_file(path)
+
+    @staticmethod
+    def _open_neigh_socket():
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_ROUTE)
+        sock.bind((0, RTMGRP_NEIGH))
+        # Dump the current IPv4 neighbours, then the updates follow
+        ndmsg = struct.pack("BxxxiHBB", socket.AF_INET, 0, 0, 0, 0)
+        sock.send(
+            struct.pack(
+                "IHHII", 16 + len(ndmsg), RTM_GETNEIGH, NLM_F_REQUEST | NLM_F_DUMP, 1, 0
+            )
+            + ndmsg
+        )
+        return sock
+
+    def _handle_neigh(self, sock):
+        try:
+            data = sock.recv(65536)
+        except socket.error as e:
+            # Updates were dropped while we were busy, go on with the next
+            if e.errno == errno.ENOBUFS:
+                return
+            raise
+        while len(data) >= 16:
+            length, msgtype = struct.unpack("IH", data[:6])
+            if length < 16:
+                break
+            msg, data = data[16:length], data[(length + 3) & ~3 :]
+            if msgtype != RTM_NEWNEIGH or len(msg) < 12:
+                continue
+            family, _, state, _, _ = struct.unpack("BxxxiHBB", msg[:12])
+            if family != socket.AF_INET or state & (NUD_INCOMPLETE | NUD_FAILED):
+                continue
+            attrs = {}
+            msg = msg[12:]
+            while len(msg) >= 4:
+                attr_len, attr_type = struct.unpack("HH", msg[:4])
+                if attr_len < 4:
+                    break
+                attrs[attr_type] = msg[4:attr_len]
+                msg = msg[(attr_len + 3) & ~3 :]
+            lladdr = attrs.get(NDA_LLADDR)
+            dst = attrs.get(NDA_DST)
+            if lladdr and len(lladdr) == 6 and dst and len(dst) == 4:
+                mac = ":".join("%02x" % byte for byte in bytearray(lladdr))
+                self._update(mac, socket.inet_ntoa(dst), "neighbour")
+
+    def _run(self, stop_fd):
+        inotify_fd, watches = self._watch_lease_dirs()
+        try:
+            neigh_sock = self._open_neigh_socket()
+        except socket.error as e:
+            LOG.warning("Can't listen to the neighbour table updates: %s", e)
+            neigh_sock = None
+        for lease_dir in watches.values():
+            self._read_lease_dir(lease_dir)
+        fds = [stop_fd] + [fd for fd in (inotify_fd, neigh_sock) if fd is not None]
+        try:
+            while True:
+                readable = select.select(fds, [], [])[0]
+                if stop_fd in readable:
+                    break
+                if inotify_fd in readable:
+                    self._handle_inotify(inotify_fd, watches)
+                if neigh_sock in readable:
+                    self._handle_neigh(neigh_sock)
+        finally:
+            if inotify_fd is not None:
+                os.close(inotify_fd)
+            if neigh_sock is not None:
+                neigh_sock.close()
+
+    def _start(self):
+        self._stop_pipe = os.pipe()
+        self._thread = threading.Thread(
+            target=self._run, args=(self._stop_pipe[0],), name="lease-sniffer"
+        )
+        self._thread.daemon = True
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        os.write(self._stop_pipe[1], b"x")
+        self._thread.join()
+        for fd in self._stop_pipe:
+            os.close(fd)
+        self._thread = None
+        self._stop_pipe = None
+
+
 #: All the defined sniffers
-Sniffers = (TShark3ToLatest, TShark1To2, TcpdumpSniffer)
+Sniffers = (TShark3ToLatest, TShark1To2, TcpdumpSniffer, LeaseSniffer)
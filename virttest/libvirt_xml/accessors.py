@@ -836,7 +836,7 @@ class XMLElementList(AccessorGeneratorBase):
                 # To support converting xml elements directly to a list of
                 # xml objects, first create xmltreefile for new object
                 if self.has_subclass:
-                    new_xmltreefile = xml_utils.XMLTreeFile(
+                    new_xmltreefile = xml_utils.LazyXMLTreeFile(
                         tostring(child, encoding="unicode")
                     )
                     item = self.marshal_to(
@@ -954,7 +954,7 @@ class XMLElementList(AccessorGeneratorBase):
                 # To support directly deleting xml elements xml objects,
                 # first create xmltreefile for new object
                 if self.has_subclass:
-                    new_xmltreefile = xml_utils.XMLTreeFile(
+                    new_xmltreefile = xml_utils.LazyXMLTreeFile(
                         tostring(child, encoding="unicode")
                     )
                     item = self.marshal_to(
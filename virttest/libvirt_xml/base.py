@@ -118,7 +118,7 @@ class LibvirtXMLBase(propcan.PropCanBase):
 
     def set_xml(self, value):
         """
-        Accessor method for 'xml' property to load using xml_utils.XMLTreeFile
+        Accessor method for 'xml' property to load using xml_utils.LazyXMLTreeFile
         """
         # Always check to see if a "set" accessor is being called from __init__
         if not self.__super_get__("INITIALIZED"):
@@ -130,7 +130,7 @@ class LibvirtXMLBase(propcan.PropCanBase):
             except KeyError:
                 pass  # Allow other exceptions through
             # value could be filename or a string full of XML
-            self.__dict_set__("xml", xml_utils.XMLTreeFile(value))
+            self.__dict_set__("xml", xml_utils.LazyXMLTreeFile(value))
 
     def get_xml(self):
         """
@@ -177,9 +177,9 @@ class LibvirtXMLBase(propcan.PropCanBase):
         try:
             # file may not be accessible, obtain XML string value
             xmlstr = str(self.__dict_get__("xml"))
-            # Create fresh/new XMLTreeFile along with tmp files from XML content
-            # content
-            the_copy.__dict_set__("xml", xml_utils.XMLTreeFile(xmlstr))
+            # Create fresh/new in-memory XMLTreeFile from XML content, its
+            # tmp file is only created if needed
+            the_copy.__dict_set__("xml", xml_utils.LazyXMLTreeFile(xmlstr))
         except xcepts.LibvirtXMLError:  # Allow other exceptions through
             pass  # no XML was loaded yet
         return the_copy
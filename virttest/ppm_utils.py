@@ -10,7 +10,6 @@ import glob
 import logging
 import os
 import re
-import struct
 import time
 from functools import reduce
 
@@ -30,6 +29,12 @@ if Image is not None:
             _pil_logger = logging.getLogger(_logger_name)
             _pil_logger.setLevel(logging.CRITICAL)
 
+# numpy is optional, the pixel operations fall back to plain Python without it
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 
 try:
     import hashlib
@@ -158,11 +163,12 @@ def image_crop(width, height, data, x1, y1, dx, dy):
         dx = width - x1
     if dy > height - y1:
         dy = height - y1
-    newdata = b""
-    index = (x1 + y1 * width) * 3
-    for _ in range(dy):
-        newdata += data[index : (index + dx * 3)]
-        index += width * 3
+    view = memoryview(data)
+    start = (x1 + y1 * width) * 3
+    stop = start + dy * width * 3
+    newdata = b"".join(
+        view[index : index + dx * 3] for index in range(start, stop, width * 3)
+    )
     return (dx, dy, newdata)
 
 
@@ -224,6 +230,16 @@ def image_verify_ppm_file(filename):
         return False
 
 
+def _pixel_arrays(width, height, data1, data2):
+    """
+    Return numpy views of both images, one row of 3 channels per pixel.
+    """
+    size = width * height * 3
+    pixels1 = numpy.frombuffer(data1, dtype=numpy.uint8, count=size)
+    pixels2 = numpy.frombuffer(data2, dtype=numpy.uint8, count=size)
+    return pixels1.reshape(-1, 3), pixels2.reshape(-1, 3)
+
+
 def image_comparison(width, height, data1, data2):
     """
     Generate a green-red comparison image from two given images.
@@ -237,31 +253,33 @@ def image_comparison(width, height, data1, data2):
 
     :note: Input images must be the same size.
     """
-    newdata = ""
-    i = 0
-    while i < width * height * 3:
-        # Compute monochromatic value of current pixel in data1
-        pixel1_str = data1[i : i + 3]
-        temp = struct.unpack("BBB", pixel1_str)
-        value1 = int((temp[0] + temp[1] + temp[2]) / 3)
-        # Compute monochromatic value of current pixel in data2
-        pixel2_str = data2[i : i + 3]
-        temp = struct.unpack("BBB", pixel2_str)
-        value2 = int((temp[0] + temp[1] + temp[2]) / 3)
-        # Compute average of the two values
-        value = int((value1 + value2) / 2)
-        # Scale value to the upper half of the range [0, 255]
-        value = 128 + value // 2
-        # Compare pixels
-        if pixel1_str == pixel2_str:
-            # Equal -- give the pixel a greenish hue
-            newpixel = [0, value, 0]
+    if numpy is not None:
+        pixels1, pixels2 = _pixel_arrays(width, height, data1, data2)
+        # Monochromatic values of both images, averaged and scaled to the
+        # upper half of the range [0, 255]
+        value1 = pixels1.sum(axis=1, dtype=numpy.uint16) // 3
+        value2 = pixels2.sum(axis=1, dtype=numpy.uint16) // 3
+        value = (128 + (value1 + value2) // 4).astype(numpy.uint8)
+        equal = (pixels1 == pixels2).all(axis=1)
+        newpixels = numpy.zeros_like(pixels1)
+        # Equal pixels get a greenish hue, different ones a reddish hue
+        newpixels[:, 1] = numpy.where(equal, value, 0)
+        newpixels[:, 0] = numpy.where(equal, 0, value)
+        return (width, height, newpixels.tobytes())
+
+    size = width * height * 3
+    data1 = bytes(data1[:size])
+    data2 = bytes(data2[:size])
+    newdata = bytearray(size)
+    for i in range(0, size, 3):
+        r1, g1, b1 = data1[i], data1[i + 1], data1[i + 2]
+        r2, g2, b2 = data2[i], data2[i + 1], data2[i + 2]
+        value = 128 + ((r1 + g1 + b1) // 3 + (r2 + g2 + b2) // 3) // 4
+        if r1 == r2 and g1 == g2 and b1 == b2:
+            newdata[i + 1] = value
         else:
-            # Not equal -- give the pixel a reddish hue
-            newpixel = [value, 0, 0]
-        newdata += struct.pack("BBB", newpixel[0], newpixel[1], newpixel[2])
-        i += 3
-    return (width, height, newdata)
+            newdata[i] = value
+    return (width, height, bytes(newdata))
 
 
 def image_fuzzy_compare(width, height, data1, data2):
@@ -276,19 +294,25 @@ def image_fuzzy_compare(width, height, data1, data2):
 
     :note: Input images must be the same size.
     """
-    equal = 0.0
-    different = 0.0
-    i = 0
-    while i < width * height * 3:
-        pixel1_str = data1[i : i + 3]
-        pixel2_str = data2[i : i + 3]
-        # Compare pixels
-        if pixel1_str == pixel2_str:
-            equal += 1.0
-        else:
-            different += 1.0
-        i += 3
-    return equal / (equal + different)
+    if numpy is not None:
+        pixels1, pixels2 = _pixel_arrays(width, height, data1, data2)
+        equal = numpy.count_nonzero((pixels1 == pixels2).all(axis=1))
+        return float(equal) / (width * height)
+
+    view1 = memoryview(data1)
+    view2 = memoryview(data2)
+    row = width * 3
+    equal = 0
+    for start in range(0, height * row, row):
+        row1 = view1[start : start + row]
+        row2 = view2[start : start + row]
+        if row1 == row2:
+            equal += width
+            continue
+        for i in range(0, row, 3):
+            if row1[i : i + 3] == row2[i : i + 3]:
+                equal += 1
+    return float(equal) / (width * height)
 
 
 def image_average_hash(image, img_wd=8, img_ht=8):
@@ -113,24 +113,33 @@ class DevContainer(object):
         strict_mode="no",
         workaround_qemu_qmp_crash="no",
         allow_hotplugged_vm="yes",
+        probe_mode="help",
     ):
         """
         :param qemu_binary: qemu binary
         :param vm: related VM
         :param strict_mode: Use strict mode (set optional params)
+        :param probe_mode: How to probe the qemu capabilities, "help" parses
+                           the help of several qemu invocations, "qmp"
+                           introspects most of them through one QMP session
         """
 
         def get_hmp_cmds(qemu_binary):
             """:return: list of human monitor commands"""
-            _ = process.run(
-                "echo -e 'help\nquit' | %s -monitor "
-                "stdio -vnc none -S" % qemu_binary,
-                timeout=10,
-                ignore_status=True,
-                shell=True,
-                verbose=False,
-            ).stdout_text
-            _ = re.findall(r"^([^()\|\[\sA-Z]+\|?\w+)", _, re.M)
+            return parse_hmp_cmds(
+                process.run(
+                    "echo -e 'help\nquit' | %s -monitor "
+                    "stdio -vnc none -S" % qemu_binary,
+                    timeout=10,
+                    ignore_status=True,
+                    shell=True,
+                    verbose=False,
+                ).stdout_text
+            )
+
+        def parse_hmp_cmds(hmp_help):
+            """:return: list of human monitor commands in the help text"""
+            _ = re.findall(r"^([^()\|\[\sA-Z]+\|?\w+)", hmp_help, re.M)
             hmp_cmds = []
             for cmd in _:
                 if "|" not in cmd:
@@ -180,7 +189,8 @@ class DevContainer(object):
         self.__qemu_binary = qemu_binary
         self.__execute_qemu_last = None
         self.__execute_qemu_out = ""
-        # Check whether we need to add machine_type
+        # Check whether we need to add machine_type. This depends on the host
+        # and kvm state as much as on the binary, so it is never cached.
         cmd = (
             "echo -e 'quit' | %s -monitor stdio -nodefaults -nographic -S" % qemu_binary
         )
@@ -200,22 +210,47 @@ class DevContainer(object):
         else:
             self.__workaround_machine_type = False
             basic_qemu_cmd = qemu_binary
-        self.__qemu_help = self.execute_qemu("-help", 10)
+        self.__qemu_help = self._probe_qemu("-help", 10)
         # escape the '?' otherwise it will fail if we have a single-char
         # filename in cwd
-        self.__device_help = self.execute_qemu(r"-device \? 2>&1", 10)
-        self.__object_help = self.execute_qemu(r"-object \? 2>&1", 10)
-        self.__machines_info = utils_qemu.get_machines_info(qemu_binary)
-        self.__hmp_cmds = get_hmp_cmds(basic_qemu_cmd)
-        self.__qmp_cmds = get_qmp_cmds(
-            basic_qemu_cmd, workaround_qemu_qmp_crash == "always"
-        )
+        self.__device_help = self._probe_qemu(r"-device \? 2>&1", 10)
+        # QMP introspected capabilities, empty in "help" mode or when QMP
+        # is not usable
+        self.__qmp_caps = {}
+        if probe_mode == "qmp":
+            self.__qmp_caps = utils_qemu.get_qmp_capabilities(qemu_binary)
+            if not self.__qmp_caps:
+                LOG.warning(
+                    "Unable to introspect %s through QMP, falling back to "
+                    "its help output",
+                    qemu_binary,
+                )
+        if self.__qmp_caps:
+            self.__object_help = "".join(
+                "  %s\n" % obj for obj in self.__qmp_caps["objects"]
+            )
+            self.__machines_info = self.__qmp_caps["machines"]
+            self.__hmp_cmds = parse_hmp_cmds(self.__qmp_caps["hmp_help"])
+            self.__qmp_cmds = self.__qmp_caps["commands"]
+            self.__qemu_ver = self.__qmp_caps["version"]
+        else:
+            self.__object_help = self._probe_qemu(r"-object \? 2>&1", 10)
+            self.__machines_info = utils_qemu.get_machines_info(qemu_binary)
+            self.__hmp_cmds = self._probe(
+                "hmp_cmds %s" % basic_qemu_cmd, lambda: get_hmp_cmds(basic_qemu_cmd)
+            )
+            qmp_crash = workaround_qemu_qmp_crash == "always"
+            self.__qmp_cmds = self._probe(
+                "qmp_cmds %s workaround_qemu_qmp_crash=%s"
+                % (basic_qemu_cmd, qmp_crash),
+                lambda: get_qmp_cmds(basic_qemu_cmd, qmp_crash),
+            )
+            self.__qemu_ver = utils_qemu.get_qemu_version(self.__qemu_binary)[0]
         self.vmname = vmname
         self.strict_mode = strict_mode == "yes"
         self.__devices = []
         self.__buses = []
         self.allow_hotplugged_vm = allow_hotplugged_vm == "yes"
-        self.__qemu_ver = utils_qemu.get_qemu_version(self.__qemu_binary)[0]
         self.caps = Capabilities()
         self.mig_params = Capabilities()
         self._probe_capabilities()
@@ -424,9 +459,13 @@ class DevContainer(object):
         if self.has_option("incoming defer"):
             self.caps.set_flag(Flags.INCOMING_DEFER)
         # -machine memory-backend
-        machine_help = self.execute_qemu("-machine none,help")
-        if re.search(r"memory-backend=", machine_help, re.MULTILINE):
-            self.caps.set_flag(Flags.MACHINE_MEMORY_BACKEND)
+        if self.__qmp_caps:
+            if "memory-backend" in self.__qmp_caps["machine_props"]:
+                self.caps.set_flag(Flags.MACHINE_MEMORY_BACKEND)
+        else:
+            machine_help = self._probe_qemu("-machine none,help")
+            if re.search(r"memory-backend=", machine_help, re.MULTILINE):
+                self.caps.set_flag(Flags.MACHINE_MEMORY_BACKEND)
         # -object sev-guest
         if self.has_object("sev-guest"):
             self.caps.set_flag(Flags.SEV_GUEST)
@@ -444,9 +483,10 @@ class DevContainer(object):
             self.caps.set_flag(Flags.FLOPPY_DEVICE)
 
         # QMP: block-stream/block-commit @backing-mask-protocol
-        # TODO: probe cap via using the qmp command `query-qmp-schema`
-        #       instead of hard-coding the version range
-        if self.__qemu_ver in VersionInterval(
+        if self.__qmp_caps:
+            if "backing-mask-protocol" in self.get_qmp_cmd_args("block-stream"):
+                self.caps.set_flag(Flags.BLOCKJOB_BACKING_MASK_PROTOCOL)
+        elif self.__qemu_ver in VersionInterval(
             self.BLOCKJOB_BACKING_MASK_PROTOCOL_VERSION_SCOPE
         ):
             self.caps.set_flag(Flags.BLOCKJOB_BACKING_MASK_PROTOCOL)
@@ -464,6 +504,18 @@ class DevContainer(object):
             MigrationParams.XBZRLE_CACHE_SIZE: self.MIGRATION_XBZRLE_CACHE_SIZE_VERSION_SCOPE,
         }
 
+        if self.__qmp_caps:
+            mig_params_args = {
+                MigrationParams.DOWNTIME_LIMIT: "downtime-limit",
+                MigrationParams.MAX_BANDWIDTH: "max-bandwidth",
+                MigrationParams.XBZRLE_CACHE_SIZE: "xbzrle-cache-size",
+            }
+            mig_args = self.get_qmp_cmd_args("migrate-set-parameters")
+            for mig_param, arg in mig_params_args.items():
+                if arg in mig_args:
+                    self.mig_params.set_flag(mig_param)
+            return
+
         for mig_param, ver_scope in mig_params_mapping.items():
             if self.__qemu_ver in VersionInterval(ver_scope):
                 self.mig_params.set_flag(mig_param)
@@ -805,6 +857,39 @@ class DevContainer(object):
         """
         return cmd in self.__qmp_cmds
 
+    def _probe(self, probe, func):
+        """
+        Get a capability of this qemu, from the probe cache when possible.
+
+        :param probe: Unique name of the probe, it must include every
+                      setting the result depends on
+        :param func: Callable executing the probe
+        :return: Result of the probe
+        """
+        return utils_qemu.get_cached_probe(self.__qemu_binary, probe, func)
+
+    def _probe_qemu(self, options, timeout=5):
+        """
+        Get the output of this qemu, from the probe cache when possible.
+
+        :param options: additional qemu options
+        :param timeout: execution timeout
+        :return: Output of the qemu
+        """
+        if self.__workaround_machine_type:
+            probe = "execute_qemu -machine none %s" % options
+        else:
+            probe = "execute_qemu %s" % options
+        return self._probe(probe, lambda: self.execute_qemu(options, timeout))
+
+    def get_qmp_cmd_args(self, cmd):
+        """
+        :param cmd: Desired QMP command
+        :return: Names of the command arguments according to the QMP schema,
+                 empty unless the capabilities were probed through QMP
+        """
+        return self.__qmp_caps.get("command_args", {}).get(cmd, [])
+
     def execute_qemu(self, options, timeout=5):
         """
         Execute this qemu and return the stdout+stderr output.
@@ -7,6 +7,7 @@ Interfaces to the QEMU monitor.
 from __future__ import division
 
 import array
+import collections
 import json
 import logging
 import os
@@ -15,6 +16,7 @@ import selectors
 import socket
 import threading
 import time
+import weakref
 
 import six
 
@@ -253,6 +255,33 @@ def pick_supported_x_feature(
     return feature
 
 
+def _qmp_reader(monitor_ref):
+    """
+    Receive and dispatch the data of a QMP monitor until its socket closes.
+
+    Only a weak reference to the monitor is kept between two reads, so the
+    monitor can still be garbage collected (which closes its socket).
+
+    :param monitor_ref: Weak reference to the QMPMonitor
+    """
+    while True:
+        monitor = monitor_ref()
+        if monitor is None:
+            return
+        try:
+            if monitor._server_closed:
+                break
+            if monitor._data_available(monitor.READER_POLL_TIMEOUT):
+                monitor._read_objects()
+        except (MonitorError, OSError, ValueError):
+            break
+        del monitor
+    # Nothing more will be received, wake up the waiters
+    with monitor._cond:
+        monitor._reader_running = False
+        monitor._cond.notify_all()
+
+
 class VM(object):
     """
     Dummy class to represent "vm.name" for pickling to avoid circular deps
@@ -276,6 +305,7 @@ class Monitor(object):
     ACQUIRE_LOCK_TIMEOUT = 20
     DATA_AVAILABLE_TIMEOUT = 0
     CONNECT_TIMEOUT = 60
+    RECV_SIZE = 65536
 
     def __init__(self, vm, name, monitor_params, suppress_exceptions=False):
         """
@@ -302,6 +332,8 @@ class Monitor(object):
         self.open_log_files = {}
         self._supported_migrate_capabilities = None
         self._supported_migrate_parameters = None
+        # Received bytes not yet consumed as complete lines
+        self._buffer = bytearray()
 
         try:
             backend = monitor_params.get("chardev_backend", "unix_socket")
@@ -414,17 +446,40 @@ class Monitor(object):
 
         return s type: bytes
         """
-        s = b""
+        chunks = []
         while self._data_available():
             try:
-                data = self._socket.recv(1024)
+                data = self._socket.recv(self.RECV_SIZE)
             except socket.error as e:
                 raise MonitorSocketError("Could not receive data from monitor", e)
             if not data:
                 self._server_closed = True
                 break
-            s += data
-        return s
+            chunks.append(data)
+        return b"".join(chunks)
+
+    def _read_lines(self, timeout):
+        """
+        Receive data into the buffer and return the complete lines in it.
+
+        Reading stops as soon as the buffer ends with a complete line, or
+        when timeout expires.  An incomplete trailing line is kept in the
+        buffer and completed by the following reads.
+
+        :param timeout: Time to wait for the last line to be completed
+        :return: A list of lines (bytes)
+        """
+        end_time = time.time() + timeout
+        while self._data_available(end_time - time.time()):
+            self._buffer += self._recvall()
+            if self._buffer.endswith(b"\n"):
+                break
+        end = self._buffer.rfind(b"\n") + 1
+        if not end:
+            return []
+        data = bytes(self._buffer[:end])
+        del self._buffer[:end]
+        return data.splitlines()
 
     def _has_command(self, cmd):
         """
@@ -1782,6 +1837,8 @@ class QMPMonitor(Monitor):
     CMD_TIMEOUT = 900
     RESPONSE_TIMEOUT = 600
     PROMPT_TIMEOUT = 90
+    READER_POLL_TIMEOUT = 0.5
+    EVENTS_MAXLEN = 4096
 
     def __init__(self, vm, name, monitor_params, suppress_exceptions=False):
         """
@@ -1806,7 +1863,15 @@ class QMPMonitor(Monitor):
 
             self.protocol = "qmp"
             self._greeting = None
-            self._events = []
+            # Asynchronous events, the oldest are dropped when full
+            self._events = collections.deque(maxlen=self.EVENTS_MAXLEN)
+            # Responses not claimed by a caller yet
+            self._responses = []
+            # Number of reads which dispatched objects, waiters compare it
+            self._received = 0
+            self._cond = threading.Condition()
+            self._reader = None
+            self._reader_running = False
             self._supported_hmp_cmds = []
 
             # Make sure json is available
@@ -1835,6 +1900,8 @@ class QMPMonitor(Monitor):
                     " Output so far: %s" % output_str
                 )
 
+            self._start_reader()
+
             # Issue qmp_capabilities
             self.cmd("qmp_capabilities")
 
@@ -1856,45 +1923,94 @@ class QMPMonitor(Monitor):
             obj["id"] = q_id
         return obj
 
+    def _start_reader(self):
+        """
+        Start the thread receiving the responses and events in background.
+        """
+        self._reader_running = True
+        self._reader = threading.Thread(
+            target=_qmp_reader,
+            args=(weakref.ref(self),),
+            name="qmp-reader-%s-%s" % (self.vm.name, self.name),
+            daemon=True,
+        )
+        self._reader.start()
+
     def _read_objects(self, timeout=READ_OBJECTS_TIMEOUT):
         """
         Read bytes lines from the monitor and try to "decode" them.
-        Stop when all available lines have been successfully decoded, or when
-        timeout expires.  If any decoded objects are asynchronous events, store
-        them in self._events.  Return all decoded objects.
+        Stop when all available lines have been received, or when timeout
+        expires.  Store the asynchronous events in self._events and the
+        responses in self._responses, then wake up the waiters.  Return all
+        decoded objects.
+
+        Once the reader thread runs, it is the only one reading the socket
+        and the calls from other threads return nothing.
 
-        :param timeout: Time to wait for all lines to decode successfully
+        :param timeout: Time to wait for the last line to be received
         :return: A list of objects
         """
+        if self._reader_running and threading.current_thread() is not self._reader:
+            return []
         if not self._data_available():
             return []
-        s = b""
-        end_time = time.time() + timeout
-        while self._data_available(end_time - time.time()):
-            s += self._recvall()
-            # Make sure all lines are decodable
-            for line in s.splitlines():
-                if line:
-                    try:
-                        json.loads(line)
-                    except Exception:
-                        # Found an incomplete or broken line -- keep reading
-                        break
-            else:
-                # All lines are OK -- stop reading
-                break
-        # Decode all decodable lines
         objs = []
-        for line in s.splitlines():
+        for line in self._read_lines(timeout):
             try:
-                objs += [json.loads(line)]
-                self._log_lines(line.decode(errors="replace"))
-            except Exception:
-                pass
-        # Keep track of asynchronous events
-        self._events += [obj for obj in objs if "event" in obj]
+                objs.append(json.loads(line))
+            except ValueError:
+                continue
+            self._log_lines(line.decode(errors="replace"))
+        if objs:
+            with self._cond:
+                for obj in objs:
+                    if not isinstance(obj, dict):
+                        continue
+                    if "event" in obj:
+                        self._events.append(obj)
+                    elif "return" in obj or "error" in obj:
+                        self._responses.append(obj)
+                self._received += 1
+                self._cond.notify_all()
         return objs
 
+    def _wait_objects(self, received, end_time):
+        """
+        Wait until more objects are received.
+
+        :param received: Value of self._received already seen by the caller
+        :param end_time: Time to stop waiting at
+        :return: False if nothing more can be received before end_time
+        """
+        timeout = end_time - time.time()
+        with self._cond:
+            if self._reader_running:
+                return self._cond.wait_for(
+                    lambda: self._received != received or not self._reader_running,
+                    timeout,
+                )
+        # No reader thread, read the socket ourselves
+        if timeout <= 0 or self._server_closed:
+            return False
+        if not self._acquire_lock():
+            raise MonitorLockError(
+                "Could not acquire exclusive lock to read " "QMP data"
+            )
+        try:
+            if self._data_available(min(timeout, self.READER_POLL_TIMEOUT)):
+                self._read_objects()
+        finally:
+            self._lock.release()
+        return True
+
+    def _flush_responses(self):
+        """
+        Drop the responses nobody waited for.
+        """
+        self._read_objects()
+        with self._cond:
+            del self._responses[:]
+
     def _send(self, data, fds=None):
         """
         Send raw bytes data without waiting for response.
@@ -1928,13 +2044,15 @@ class QMPMonitor(Monitor):
         :return: The response dict, or None if none was found
         """
         end_time = time.time() + timeout
-        while self._data_available(end_time - time.time()):
-            for obj in self._read_objects():
-                if isinstance(obj, dict):
-                    if q_id is not None and obj.get("id") != q_id:
-                        continue
-                    if "return" in obj or "error" in obj:
+        while True:
+            with self._cond:
+                for obj in self._responses:
+                    if q_id is None or obj.get("id") == q_id:
+                        self._responses.remove(obj)
                         return obj
+                received = self._received
+            if not self._wait_objects(received, end_time):
+                return None
 
     def _get_supported_cmds(self):
         """
@@ -2062,8 +2180,8 @@ class QMPMonitor(Monitor):
             )
 
         try:
-            # Read any data that might be available
-            self._read_objects()
+            # Drop any stale response
+            self._flush_responses()
             # Send command
             q_id = utils_misc.generate_random_string(8)
             cmdobj = json.dumps(self._build_cmd(cmd, args, q_id))
@@ -2114,7 +2232,7 @@ class QMPMonitor(Monitor):
             )
 
         try:
-            self._read_objects()
+            self._flush_responses()
             self._send(data.encode())
             r = self._get_response(None, timeout)
             if r is None:
@@ -2214,7 +2332,8 @@ class QMPMonitor(Monitor):
             )
         try:
             self._read_objects()
-            return self._events[:]
+            with self._cond:
+                return list(self._events)
         finally:
             self._lock.release()
 
@@ -2229,6 +2348,31 @@ class QMPMonitor(Monitor):
             if e.get("event") == name:
                 return e
 
+    def wait_for_event(self, name, predicate=None, timeout=CMD_TIMEOUT):
+        """
+        Wait for an event with the given name.
+
+        The events received since the last clear_events() call are looked
+        at first, then the event is returned as soon as it is received.
+
+        :param name: The name of the event to wait for (e.g. 'DEVICE_DELETED')
+        :param predicate: Function called with each event of that name,
+                          returning whether it is the one to wait for
+        :param timeout: Time duration to wait for the event
+        :return: An event object or None if none is received in time
+        """
+        end_time = time.time() + timeout
+        while True:
+            with self._cond:
+                for event in self._events:
+                    if event.get("event") != name:
+                        continue
+                    if predicate is None or predicate(event):
+                        return event
+                received = self._received
+            if not self._wait_objects(received, end_time):
+                return None
+
     def human_monitor_cmd(self, cmd="", timeout=CMD_TIMEOUT, debug=True, fd=None):
         """
         Run human monitor command in QMP through human-monitor-command
@@ -2259,7 +2403,8 @@ class QMPMonitor(Monitor):
             raise MonitorLockError(
                 "Could not acquire exclusive lock to clear " "QMP event list"
             )
-        self._events = []
+        with self._cond:
+            self._events.clear()
         self._lock.release()
 
     def clear_event(self, name):
@@ -2272,12 +2417,10 @@ class QMPMonitor(Monitor):
             raise MonitorLockError(
                 "Could not acquire exclusive lock to clear " "QMP event list"
             )
-        while True:
-            event = self.get_event(name)
-            if event:
+        self._read_objects()
+        with self._cond:
+            for event in [e for e in self._events if e.get("event") == name]:
                 self._events.remove(event)
-            else:
-                break
         self._lock.release()
 
     def get_greeting(self):
@@ -2408,7 +2551,7 @@ class QMPMonitor(Monitor):
         self.verify_supported_cmd(cmd)
         self.clear_event(event)
         ret = self.cmd(cmd=cmd)
-        if not utils_misc.wait_for(lambda: self.get_event(event), timeout=120):
+        if not self.wait_for_event(event, timeout=120):
             raise QMPEventError(cmd, event, self.vm.name, self.name)
         return ret
 
@@ -2807,7 +2950,7 @@ class QMPMonitor(Monitor):
         # Send a system_wakeup monitor command
         self.cmd(cmd)
         # Look for WAKEUP QMP event
-        if not utils_misc.wait_for(lambda: self.get_event(qmp_event), 120):
+        if not self.wait_for_event(qmp_event, timeout=120):
             raise QMPEventError(cmd, qmp_event, self.vm.name, self.name)
         LOG.info("%s QMP event received" % qmp_event)
 
@@ -3053,7 +3196,7 @@ class QMPMonitor(Monitor):
         # Send a balloon monitor command
         self.send_args_cmd("%s value=%s" % (cmd, size))
         # Look for BALLOON QMP events
-        if not utils_misc.wait_for(lambda: self.get_event(qmp_event), 120):
+        if not self.wait_for_event(qmp_event, timeout=120):
             raise QMPEventError(cmd, qmp_event, self.vm.name, self.name)
         LOG.info("%s QMP event received" % qmp_event)
 
@@ -3232,7 +3375,7 @@ class QMPMonitor(Monitor):
         # Send a powerdown monitor command
         self.cmd(cmd)
         # Look for POWERDOWN QMP events
-        if not utils_misc.wait_for(lambda: self.get_event(qmp_event), 120):
+        if not self.wait_for_event(qmp_event, timeout=120):
             raise QMPEventError(cmd, qmp_event, self.vm.name, self.name)
         LOG.info("%s QMP event received" % qmp_event)
 
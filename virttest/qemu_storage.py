@@ -848,18 +848,10 @@ class QemuImg(storage.QemuImg):
         :return: Standard output text from the help command execution
         :rtype: str
         :note: Returns stdout even if the command fails, allowing callers to handle
-               parsing and error detection as needed
+               parsing and error detection as needed. The text is cached per
+               qemu-img binary, see :func:`utils_qemu.get_img_help_text`.
         """
-        cmd_help = f"{self.image_cmd} {cmd} -h"
-
-        result = process.run(
-            cmd=cmd_help,
-            ignore_status=True,
-            shell=True,
-            verbose=False,
-        )
-
-        return result.stdout_text
+        return utils_qemu.get_img_help_text(self.image_cmd, cmd)
 
     def _get_cmd_cap_force_share(self, cmd):
         """
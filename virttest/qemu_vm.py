@@ -1842,6 +1842,7 @@ class VM(virt_vm.BaseVM):
             params.get("strict_mode"),
             params.get("workaround_qemu_qmp_crash"),
             params.get("allow_hotplugged_vm"),
+            params.get("qemu_probe_mode", "help"),
         )
         StrDev = qdevices.QStringDevice
         QDevice = qdevices.QDevice
@@ -4494,6 +4495,7 @@ class VM(virt_vm.BaseVM):
                 self.params.get("strict_mode"),
                 self.params.get("workaround_qemu_qmp_crash"),
                 self.params.get("allow_hotplugged_vm"),
+                self.params.get("qemu_probe_mode", "help"),
             )
             if devices.has_device("pcie-pci-bridge"):
                 bridge_type = "pcie-pci-bridge"
@@ -5593,7 +5595,7 @@ class VM(virt_vm.BaseVM):
             Listen on QMP monitor for RESET event
 
             :note: During migration the qemu process finishes, but the
-                `monitor.get_event` function is not prepared to treat this
+                `monitor.wait_for_event` function is not prepared to treat this
                 properly and raises `qemu_monitor.MonitorSocketError`. Let's
                 return `False` in such case and keep listening for RESET event
                 on the new (dst) monitor.
@@ -5602,7 +5604,7 @@ class VM(virt_vm.BaseVM):
                 in this loop until a timeout and error is raised.
             """
             try:
-                return bool(self.monitor.get_event("RESET"))
+                return bool(self.monitor.wait_for_event("RESET", timeout=1))
             except (qemu_monitor.MonitorSocketError, AttributeError):
                 LOG.warning(
                     "MonitorSocketError while querying for RESET QMP "
@@ -9,15 +9,13 @@ Created on Dec 6, 2013
 
 import base64
 import importlib
+import io
 import logging
 import os
 import select
+import struct
 import time
 
-try:
-    from cStringIO import StringIO
-except ImportError:
-    from six import StringIO
 try:
     import pickle as cPickle
 except ImportError:
@@ -28,6 +26,11 @@ if __package__ is None:  # import when remote_runner.py script run directly
 else:
     from virttest.remote_commander import remote_interface
 
+# Length header of the binary framed messages, an unsigned 64 bit integer
+BINARY_LEN_FORMAT = ">Q"
+# Maximal size of a single read of a message
+READ_CHUNK_SIZE = 1 << 20
+
 
 class IOWrapper(object):
     """
@@ -58,6 +61,18 @@ class IOWrapper(object):
         """
         raise NotImplementedError()
 
+    def readinto(self, buf):
+        """
+        Blocking read of data into a preallocated buffer.
+
+        :param buf: Writable buffer, at most len(buf) bytes are read.
+        :type buf: memoryview
+        :return: Number of bytes read, 0 when the other side is closed.
+        """
+        data = self.read(len(buf))
+        buf[: len(data)] = data
+        return len(data)
+
     def write(self, data):
         """
         Write function should be implemented for object uded for writing.
@@ -97,6 +112,9 @@ class DataWrapper(object):
     Basic implementation of IOWrapper for stdio.
     """
 
+    #: Whether raw bytes pass through the stream unchanged
+    binary = True
+
     def decode(self, data):
         """
         Decodes the data which was read.
@@ -119,6 +137,8 @@ class DataWrapperBase64(DataWrapper):
     Basic implementation of IOWrapper for stdio.
     """
 
+    binary = False
+
     def decode(self, data):
         return base64.b64decode(data)
 
@@ -149,6 +169,9 @@ class StdIOWrapperIn(StdIOWrapper):
         else:
             return os.read(self._obj, max_len)
 
+    def readinto(self, buf):
+        return os.readv(self._obj, [buf])
+
 
 class StdIOWrapperOut(StdIOWrapper):
     """
@@ -185,44 +208,82 @@ def _map_path(mod_name, kls_name):
         mod = remote_interface
         return getattr(mod, kls_name)
     else:
-        mod = __import__(mod_name)
+        mod = importlib.import_module(mod_name)
         return getattr(mod, kls_name)
 
 
+class _Unpickler(cPickle.Unpickler):
+    """
+    Unpickler mapping the remote_interface classes to this side.
+    """
+
+    def find_class(self, module, name):
+        if module.endswith("remote_interface"):
+            return _map_path(module, name)
+        return super(_Unpickler, self).find_class(module, name)
+
+
 class Messenger(object):
     """
     Class could be used for communication between two python process connected
     by communication canal wrapped by IOWrapper class. Pickling is used
     for communication and thus it is possible to communicate every picleable
     object.
+
+    Messages are framed by a 10 characters length, encoded by the stream
+    wrappers like the message itself, so they can pass through terminals.
+    Streams carrying raw bytes can switch to binary framing, with a fixed
+    size binary length and the raw pickle, once both sides agreed on it.
     """
 
-    def __init__(self, stdin, stdout):
+    def __init__(self, stdin, stdout, binary=False):
         """
         :params stdin: Object for read data from communication interface.
         :type stdin: IOWrapper
         :params stdout: Object for write data to communication interface.
         :type stdout: IOWrapper
+        :param binary: Use binary framing from the start, only when the
+                       other side does as well.
+        :type binary: bool
         """
         self.stdin = stdin
         self.stdout = stdout
+        self.binary = False
+        if binary:
+            self.set_binary()
 
         # Unfortunately only static length of data length is supported.
-        self.enc_len_length = len(stdout.encode("0" * 10))
+        self.enc_len_length = len(stdout.encode(b"0" * 10))
 
     def close(self):
         self.stdin.close()
         self.stdout.close()
 
+    def supports_binary(self):
+        """
+        Check if both streams can carry binary framed messages.
+        """
+        return self.stdin.binary and self.stdout.binary
+
+    def set_binary(self):
+        """
+        Switch to binary framing of the messages.
+        """
+        if not self.supports_binary():
+            raise MessengerError("Streams can't carry binary framed messages.")
+        self.binary = True
+
     def format_msg(self, data):
         """
         Format message where first 10 char is length of message and rest is
         piclked message.
         """
         pdata = cPickle.dumps(data, cPickle.HIGHEST_PROTOCOL)
+        if self.binary:
+            return struct.pack(BINARY_LEN_FORMAT, len(pdata)) + pdata
         pdata = self.stdout.encode(pdata)
-        len_enc = self.stdout.encode("%10d" % len(pdata))
-        return "%s%s" % (len_enc, pdata)
+        len_enc = self.stdout.encode(b"%10d" % len(pdata))
+        return len_enc + pdata
 
     def flush_stdin(self):
         """
@@ -244,30 +305,52 @@ class Messenger(object):
     def _read_until_len(self, timeout=None):
         """
         Deal with terminal interfaces... Read input until gets string
-        contains " " and digits len(string) == 10
+        contains " " and digits len(string) == 10, or the binary length
+        header when binary framing is used.
 
         :param timeout: timeout of reading.
         """
-        data = ""
+        if self.binary:
+            len_length = struct.calcsize(BINARY_LEN_FORMAT)
+        else:
+            len_length = self.enc_len_length
+        data = b""
 
         endtime = None
         if timeout is not None:
             endtime = time.time() + timeout
 
-        while len(data) < self.enc_len_length and (
-            endtime is None or time.time() < endtime
-        ):
-            d = self.stdin.read(1, timeout)
+        while len(data) < len_length and (endtime is None or time.time() < endtime):
+            d = self.stdin.read(len_length - len(data), timeout)
             if d is None:
                 return None
             if len(d) == 0:
                 return d
             data += d
-        if len(data) < self.enc_len_length:
+        if len(data) < len_length:
             return None
 
+        if self.binary:
+            return data
         return self.stdout.decode(data)
 
+    def _read_data(self, length):
+        """
+        Read a message body into a buffer allocated at once.
+
+        :param length: Length of the message body.
+        :return: The message body.
+        """
+        data = bytearray(length)
+        view = memoryview(data)
+        pos = 0
+        while pos < length:
+            read = self.stdin.readinto(view[pos : pos + READ_CHUNK_SIZE])
+            if not read:
+                raise MessengerError("Other side closed inside a message.")
+            pos += read
+        return data
+
     def read_msg(self, timeout=None):
         """
         Read data from com interface.
@@ -285,19 +368,14 @@ class Messenger(object):
             return (False, None)
         rdata = None
         try:
-            cmd_len = int(data)
-            rdata = ""
-            rdata_len = 0
-            while rdata_len < cmd_len:
-                rdata += self.stdin.read(cmd_len - rdata_len)
-                rdata_len = len(rdata)
-            rdataIO = StringIO(self.stdin.decode(rdata))
-            unp = cPickle.Unpickler(rdataIO)
-            if cPickle.__name__ == "pickle":
-                unp.find_class = _map_path
+            if self.binary:
+                (cmd_len,) = struct.unpack(BINARY_LEN_FORMAT, data)
             else:
-                unp.find_global = _map_path
-            data = unp.load()
+                cmd_len = int(data)
+            rdata = self._read_data(cmd_len)
+            if not self.binary:
+                rdata = self.stdin.decode(rdata)
+            data = _Unpickler(io.BytesIO(rdata)).load()
         except Exception as e:
             logging.error("ERROR data:%s rdata:%s" % (data, rdata))
             try:
@@ -211,6 +211,22 @@ class CommanderMaster(messenger.Messenger):
         succ, msg = self.read_msg()
         if not succ or msg != "Started":
             raise remote_interface.CommanderError("Remote commander" " not started.")
+        if self.supports_binary():
+            self.negotiate_binary()
+
+    def negotiate_binary(self):
+        """
+        Switch to binary framing of the messages when the slave supports it.
+
+        Slaves without binary framing fail the request and keep talking in
+        the encoded framing, as does this side then.
+        """
+        try:
+            if self.manage.binary_transport().results:
+                self.set_binary()
+        except remote_interface.CommanderError:
+            # Forget the failed request, the slave doesn't know it.
+            self.cmds.clear()
 
     def set_responder(self, responder):
         """
@@ -363,8 +363,11 @@ class CmdSlave(object):
         ) = create_process_cmd()
         if self.pid == 0:  # Child process make commands
             commander._close_cmds_stdios(self)
+            # Both ends are forked from this process, they speak binary.
             self.msg = ms.Messenger(
-                ms.StdIOWrapperIn(self.r_pipe), ms.StdIOWrapperOut(self.w_pipe)
+                ms.StdIOWrapperIn(self.r_pipe),
+                ms.StdIOWrapperOut(self.w_pipe),
+                binary=True,
             )
             try:
                 self.basecmd.results = self.obj(
@@ -380,7 +383,9 @@ class CmdSlave(object):
             sys.exit(0)
         else:  # Parent process create communication interface to child process
             self.msg = ms.Messenger(
-                ms.StdIOWrapperIn(self.r_pipe), ms.StdIOWrapperOut(self.w_pipe)
+                ms.StdIOWrapperIn(self.r_pipe),
+                ms.StdIOWrapperOut(self.w_pipe),
+                binary=True,
             )
 
     def __call_nohup__(self, commander):
@@ -552,6 +557,7 @@ class CommanderSlave(ms.Messenger):
     def __init__(self, stdin, stdout, o_stdout, o_stderr):
         super(CommanderSlave, self).__init__(stdin, stdout)
         self._exit = False
+        self._binary_requested = False
         self.cmds = {}
         self.globals = {}
         self.locals = {}
@@ -601,6 +607,10 @@ class CommanderSlave(ms.Messenger):
                         # consideration at this point. It can stuck.
                         cmd(self)
                         self.write_msg(cmd.basecmd)
+                        if self._binary_requested:
+                            # The reply went out in the old framing.
+                            self._binary_requested = False
+                            self.set_binary()
                     except Exception:
                         err_msg = traceback.format_exc()
                         self.write_msg(remote_interface.CommanderError(err_msg))
@@ -751,6 +761,18 @@ class CommanderSlaveCmds(CommanderSlave):
         globals()[name] = mod
         sys.modules[name] = mod
 
+    def binary_transport(self):
+        """
+        Switch to binary framing of the messages, if the streams allow it.
+
+        The master switches too when it gets True back, all messages after
+        the reply are binary framed.
+
+        :return: True if the messages are binary framed from now on.
+        """
+        self._binary_requested = self.supports_binary()
+        return self._binary_requested
+
     def exit(self):
         """
         Method for killing command slave.
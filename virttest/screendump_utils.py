@@ -0,0 +1,181 @@
+"""
+Encode the regular screendumps of the VMs into JPEG video frames.
+
+Each screendump is read into memory once and hashed there. Frames that
+were already seen are linked to their previous encoding, the new ones are
+decoded, timestamped and JPEG-encoded by a pool of worker threads. When
+the workers fall behind, new frames are dropped instead of queued.
+"""
+
+import collections
+import glob
+import hashlib
+import io
+import logging
+import os
+import shutil
+import threading
+from concurrent import futures
+
+from virttest import png_utils, ppm_utils
+
+LOG = logging.getLogger("avocado." + __name__)
+
+#: Number of frame hashes remembered by default
+CACHE_SIZE = 1024
+#: Number of encoding threads used by default
+WORKERS = 2
+#: Number of frames waiting to be encoded by default
+QUEUE_SIZE = 64
+
+
+def read_screendump(filename):
+    """
+    Read a screendump into memory and remove its file.
+
+    :param filename: Path of the screendump produced by the VM
+    :return: A 2-tuple with the image data and the time the screendump
+             was taken, as reported by the file ctime.
+    """
+    timestamp = os.stat(filename).st_ctime
+    with open(filename, "rb") as screendump:
+        data = screendump.read()
+    os.unlink(filename)
+    return data, timestamp
+
+
+class FrameCache(object):
+    """
+    Least recently used mapping of frame hashes to their encoded file.
+    """
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        """
+        :param maxsize: Number of hashes kept, the least recently seen
+                        ones are forgotten first.
+        """
+        self.maxsize = maxsize
+        self._frames = collections.OrderedDict()
+
+    def __contains__(self, digest):
+        return digest in self._frames
+
+    def __len__(self):
+        return len(self._frames)
+
+    def get(self, digest):
+        """
+        Return the entry of the frame and mark it as recently seen.
+
+        :param digest: Hash of the frame data
+        :return: The entry stored for the frame, None if it is unknown.
+        """
+        try:
+            self._frames.move_to_end(digest)
+        except KeyError:
+            return None
+        return self._frames[digest]
+
+    def __setitem__(self, digest, entry):
+        self._frames[digest] = entry
+        self._frames.move_to_end(digest)
+        while len(self._frames) > self.maxsize:
+            self._frames.popitem(last=False)
+
+
+class ScreendumpEncoder(object):
+    """
+    Turn in-memory screendumps into timestamped JPEG files.
+
+    Frames are deduplicated by hash before decoding, an already encoded
+    frame is hard linked (or copied) into its new place instead. New
+    frames are dropped while the queue is full. The frame numbering is made contiguous again on :meth:`close`, so frames
+    that failed to encode don't stop the video encoding at a gap.
+    """
+
+    def __init__(
+        self,
+        quality=30,
+        workers=WORKERS,
+        cache_size=CACHE_SIZE,
+        queue_size=QUEUE_SIZE,
+    ):
+        """
+        :param quality: JPEG quality of the encoded frames
+        :param workers: Number of encoding threads
+        :param cache_size: Number of frame hashes remembered
+        :param queue_size: Number of frames waiting to be encoded at most
+        """
+        self.quality = quality
+        self.cache = FrameCache(cache_size)
+        self._slots = threading.BoundedSemaphore(queue_size)
+        self._pool = futures.ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="ScreendumpEncoder"
+        )
+        self._dirs = set()
+
+    def add(self, data, image_format, timestamp, filename):
+        """
+        Queue a screendump to be stored as a JPEG file.
+
+        :param data: Screendump image data
+        :param image_format: Format of the screendump, ``ppm`` or ``png``
+        :param timestamp: Time the screendump was taken, drawn on the frame
+        :param filename: Path of the JPEG file to produce
+        :return: True if the same frame was seen recently, False otherwise.
+        """
+        digest = hashlib.sha1(data).digest()
+        if ppm_utils.Image is None:
+            # Nothing gets encoded, so there is nothing to link either. The
+            # hashes are still kept for the inactivity checks of the caller.
+            seen = digest in self.cache
+            self.cache[digest] = (filename, None)
+            return seen
+        self._dirs.add(os.path.dirname(filename))
+        previous = self.cache.get(digest)
+        if previous is not None:
+            source, job = previous
+            job.add_done_callback(lambda _: self._link(source, filename))
+            return True
+        if not self._slots.acquire(blocking=False):
+            LOG.debug("Dropping screendump %s, the encoding queue is full", filename)
+            return False
+        job = self._pool.submit(self._encode, data, image_format, timestamp, filename)
+        job.add_done_callback(lambda _: self._slots.release())
+        self.cache[digest] = (filename, job)
+        return False
+
+    def _encode(self, data, image_format, timestamp, filename):
+        try:
+            image = ppm_utils.Image.open(io.BytesIO(data))
+            if image_format == "ppm":
+                image = ppm_utils.add_timestamp(image, timestamp)
+            elif image_format == "png":
+                image = png_utils.add_png_timestamp(image, timestamp)
+            image.save(filename, format="JPEG", quality=self.quality)
+        except (IOError, OSError) as details:
+            LOG.warning("Failed to encode screendump %s: %s", filename, details)
+
+    @staticmethod
+    def _link(source, filename):
+        try:
+            try:
+                os.link(source, filename)
+            except OSError:
+                shutil.copyfile(source, filename)
+        except (IOError, OSError) as details:
+            LOG.warning("Failed to store screendump %s: %s", filename, details)
+
+    def close(self):
+        """
+        Wait for the queued frames and renumber the frames of each
+        directory without gaps.
+        """
+        self._pool.shutdown(wait=True)
+        for screendump_dir in self._dirs:
+            pattern = os.path.join(screendump_dir, "[0-9][0-9][0-9][0-9].jpg")
+            frames = sorted(glob.glob(pattern))
+            for index, frame in enumerate(frames, 1):
+                name = "%04d.jpg" % index
+                if os.path.basename(frame) != name:
+                    os.rename(frame, os.path.join(screendump_dir, name))
@@ -10,12 +10,15 @@ from __future__ import division
 
 import collections
 import errno
+import fcntl
 import functools
 import json
 import logging
 import os
 import re
 import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 from avocado.core import exceptions
 from avocado.utils import process
@@ -42,6 +45,124 @@ from virttest import (
 LOG = logging.getLogger("avocado." + __name__)
 
 
+#: ioctl(2) request making a file share the extents of another (linux/fs.h)
+FICLONE = 0x40049409
+
+#: Chunk size of the data copies falling back to read/write
+COPY_CHUNK_SIZE = 1 << 20
+
+#: Size of the data ranges handed to each copy thread
+COPY_RANGE_SIZE = 64 << 20
+
+#: Number of threads copying the data ranges of an image
+COPY_WORKERS = 4
+
+
+def _copy_range(src_fd, dst_fd, offset, length):
+    """Copy length bytes at offset from src_fd to the same offset of dst_fd."""
+    while length > 0:
+        try:
+            copied = os.copy_file_range(
+                src_fd, dst_fd, min(length, 1 << 30), offset, offset
+            )
+        except (AttributeError, OSError):
+            # Not available in this python or for these filesystems
+            data = os.pread(src_fd, min(length, COPY_CHUNK_SIZE), offset)
+            copied = len(data) and os.pwrite(dst_fd, data, offset)
+        if not copied:
+            break
+        offset += copied
+        length -= copied
+
+
+def _data_regions(fd, size):
+    """
+    Get the data regions of a file, as (offset, length) tuples.
+
+    The whole file is one data region if the filesystem can't tell where
+    its holes are.
+    """
+    offset = 0
+    while offset < size:
+        try:
+            start = os.lseek(fd, offset, os.SEEK_DATA)
+        except OSError as details:
+            if details.errno == errno.ENXIO:
+                # Only a hole is left
+                return
+            yield offset, size - offset
+            return
+        end = os.lseek(fd, start, os.SEEK_HOLE)
+        yield start, end - start
+        offset = end
+
+
+def _split_regions(regions, range_size):
+    """Split the data regions into ranges of at most range_size bytes."""
+    for offset, length in regions:
+        for start in range(offset, offset + length, range_size):
+            yield start, min(range_size, offset + length - start)
+
+
+def copy_image_file(src, dst, reflink=True, workers=COPY_WORKERS):
+    """
+    Copy an image file, keeping it sparse.
+
+    The copy is a reflink of src when allowed and the filesystem supports
+    it. Otherwise the data regions of src, found with SEEK_DATA/SEEK_HOLE,
+    are copied by a pool of threads and its holes are kept sparse in dst.
+
+    :param src: Path of the file to copy.
+    :param dst: Path of the copy, overwritten if it exists.
+    :param reflink: Whether dst may share the extents of src.
+    :param workers: Number of threads copying the data ranges.
+    :return: The number of bytes copied, 0 for a reflink.
+    """
+    start = time.monotonic()
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        src_fd, dst_fd = src_file.fileno(), dst_file.fileno()
+        if reflink:
+            try:
+                fcntl.ioctl(dst_fd, FICLONE, src_fd)
+                LOG.debug("Reflinked %s -> %s", src, dst)
+                return 0
+            except OSError:
+                pass
+        size = os.fstat(src_fd).st_size
+        ranges = list(_split_regions(_data_regions(src_fd, size), COPY_RANGE_SIZE))
+        dst_file.truncate(size)
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            jobs = [
+                executor.submit(_copy_range, src_fd, dst_fd, offset, length)
+                for offset, length in ranges
+            ]
+            for job in jobs:
+                job.result()
+    copied = sum(length for _, length in ranges)
+    duration = time.monotonic() - start
+    LOG.debug(
+        "Copied %d of %d bytes %s -> %s in %.2fs (%.1f MiB/s)",
+        copied,
+        size,
+        src,
+        dst,
+        duration,
+        copied / 1048576.0 / max(duration, 1e-6),
+    )
+    return copied
+
+
+def _copy_image_mode(src, dst):
+    """
+    Copy the mode of an image file, keeping the copy writable.
+
+    The overlay restore makes the backups read-only, the images restored
+    from them by copy must still be writable by qemu.
+    """
+    shutil.copymode(src, dst)
+    os.chmod(dst, os.stat(dst).st_mode | 0o200)
+
+
 def preprocess_images(bindir, params, env):
     # Clone master image form vms.
     for vm_name in params.get("vms").split():
@@ -874,7 +995,8 @@ def copy_nfs_image(params, root_dir, basename=False):
                 and not utils_misc.get_image_info(source)["lcounts"].lower() == "true"
             ):
                 LOG.debug("Copying guest image from %s to %s", source, dst)
-                shutil.copy(source, dst)
+                copy_image_file(source, dst)
+                shutil.copymode(source, dst)
             else:
                 raise exceptions.TestSetupFail(
                     "Guest image is unavailable"
@@ -1049,10 +1171,18 @@ class QemuImg(object):
         if not os.path.isabs(backup_dir):
             backup_dir = os.path.join(root_dir, backup_dir)
         backup_set = get_backup_set(self.image_filename, backup_dir, action, good)
+        restore_method = params.get("image_restore_method", "copy")
         if self.is_remote_image():
             backup_func = self.copy_data_remote
         elif params.get("image_raw_device") == "yes":
             backup_func = self.copy_data_raw
+        elif restore_method == "overlay" and self.is_overlay_restorable():
+            if action == "restore":
+                backup_func = self.restore_data_overlay
+            else:
+                backup_func = self.backup_data_overlay
+        elif restore_method in ("reflink", "overlay"):
+            backup_func = self.copy_data_reflink
         else:
             backup_func = self.copy_data_file
 
@@ -1100,7 +1230,18 @@ class QemuImg(object):
             if action == "backup" and skip_existing and os.path.exists(dst):
                 LOG.debug("Image backup %s already exists, skipping...", dst)
                 continue
-            backup_func(src, dst)
+            start = time.monotonic()
+            copied = backup_func(src, dst)
+            if copied is not None:
+                LOG.info(
+                    "%s %s -> %s with %s in %.2fs, %d bytes copied",
+                    action.capitalize(),
+                    src,
+                    dst,
+                    backup_func.__name__,
+                    time.monotonic() - start,
+                    copied,
+                )
 
     def rm_backup_image(self):
         """
@@ -1116,6 +1257,9 @@ class QemuImg(object):
         image_name = os.path.join(
             backup_dir, "%s.backup" % os.path.basename(self.image_filename)
         )
+        if self.params.get("image_restore_method") == "overlay":
+            if self.flatten_overlay(image_name):
+                return
         LOG.debug("Removing image file %s as requested", image_name)
         if os.path.exists(image_name):
             os.unlink(image_name)
@@ -1192,11 +1336,136 @@ class QemuImg(object):
         if os.path.isfile(src):
             LOG.debug("Copying %s -> %s", src, dst)
             _dst = dst + ".part"
-            shutil.copy(src, _dst)
+            copied = copy_image_file(src, _dst, reflink=False)
+            _copy_image_mode(src, _dst)
             os.rename(_dst, dst)
+            return copied
         else:
             LOG.info("No source file %s, skipping copy...", src)
 
+    @staticmethod
+    def copy_data_reflink(src, dst):
+        """Reflink or sparse copy for files."""
+        if os.path.isfile(src):
+            LOG.debug("Cloning %s -> %s", src, dst)
+            _dst = dst + ".part"
+            copied = copy_image_file(src, _dst)
+            _copy_image_mode(src, _dst)
+            os.rename(_dst, dst)
+            return copied
+        else:
+            LOG.info("No source file %s, skipping clone...", src)
+
+    def is_overlay_restorable(self):
+        """
+        Check if the image can be restored as an overlay of its backup.
+
+        Only plain local qcow2 images are, as the overlay has to keep the
+        format of the image and be opened without extra options.
+        """
+        return (
+            self.image_format == "qcow2"
+            and not self.data_file
+            and not self.encryption_config.key_secret
+            and not self.is_remote_image()
+        )
+
+    def get_backing_file(self, filename):
+        """
+        Get the absolute path of the backing file of a local image.
+
+        :param filename: Path of the image.
+        :return: The backing file path, None if the image has no backing.
+        """
+        cmd = "%s info -U --output=json %s" % (
+            utils_misc.get_qemu_img_binary(self.params),
+            filename,
+        )
+        result = process.run(cmd, ignore_status=True, verbose=False)
+        if result.exit_status:
+            return None
+        info = json.loads(result.stdout_text)
+        return info.get("full-backing-filename")
+
+    def restore_data_overlay(self, src, dst):
+        """
+        Restore an image as a qcow2 overlay of its read-only backup.
+
+        The backup is not copied, the writes of the test go to the overlay
+        which the next restore simply throws away.
+        """
+        if not os.path.isfile(src):
+            LOG.info("No source file %s, skipping overlay...", src)
+            return
+        src = os.path.abspath(src)
+        LOG.debug("Creating overlay %s of %s", dst, src)
+        os.chmod(src, os.stat(src).st_mode & ~0o222)
+        _dst = dst + ".part"
+        process.run(
+            "%s create -q -f qcow2 -F qcow2 -b %s %s"
+            % (utils_misc.get_qemu_img_binary(self.params), src, _dst),
+            verbose=False,
+        )
+        os.rename(_dst, dst)
+        return 0
+
+    def backup_data_overlay(self, src, dst):
+        """
+        Back up an image that may be an overlay of its good backup.
+
+        Such an image is flattened with qemu-img convert, so the copy does
+        not depend on the good backup, which may be replaced or removed
+        later. When the good backup itself is the destination, the image
+        is recreated as an empty overlay of the new backup. Anything else
+        is reflinked or sparse copied.
+        """
+        if not os.path.isfile(src):
+            return self.copy_data_reflink(src, dst)
+        dst = os.path.abspath(dst)
+        good_backup = os.path.join(
+            os.path.dirname(dst), "%s.backup" % os.path.basename(src)
+        )
+        backing_file = self.get_backing_file(os.path.abspath(src))
+        if backing_file != good_backup:
+            return self.copy_data_reflink(src, dst)
+        LOG.debug("Flattening overlay %s -> %s", src, dst)
+        _dst = dst + ".part"
+        process.run(
+            "%s convert -q -O qcow2 %s %s"
+            % (utils_misc.get_qemu_img_binary(self.params), src, _dst),
+            verbose=False,
+        )
+        os.rename(_dst, dst)
+        copied = os.path.getsize(dst)
+        if dst == good_backup:
+            self.restore_data_overlay(dst, src)
+        return copied
+
+    def flatten_overlay(self, backup):
+        """
+        Merge the image back into its backup when it is an overlay of it.
+
+        Needed before the backup is removed, or the image would lose its
+        backing file.
+
+        :param backup: Path of the backup about to be removed.
+        :return: True if the backup was merged and moved to the image.
+        """
+        if not os.path.isfile(self.image_filename):
+            return False
+        backing_file = self.get_backing_file(self.image_filename)
+        if backing_file != os.path.abspath(backup):
+            return False
+        LOG.debug("Committing overlay %s into %s", self.image_filename, backup)
+        os.chmod(backup, os.stat(backup).st_mode | 0o200)
+        process.run(
+            "%s commit -q %s"
+            % (utils_misc.get_qemu_img_binary(self.params), self.image_filename),
+            verbose=False,
+        )
+        os.replace(backup, self.image_filename)
+        return True
+
     @staticmethod
     def clone_image(params, vm_name, image_name, root_dir):
         """
@@ -1227,9 +1496,12 @@ class QemuImg(object):
                 force_clone = params.get("force_image_clone", "no")
                 if not os.path.exists(image_fn) or force_clone == "yes":
                     LOG.info("Clone master image for vms.")
-                    process.run(
-                        params.get("image_clone_command") % (m_image_fn, image_fn)
-                    )
+                    clone_command = params.get("image_clone_command")
+                    if clone_command:
+                        process.run(clone_command % (m_image_fn, image_fn))
+                    else:
+                        copy_image_file(m_image_fn, image_fn)
+                        shutil.copymode(m_image_fn, image_fn)
             params["image_name_%s" % vm_name] = vm_image_name
             params["image_name_%s_%s" % (image_name, vm_name)] = vm_image_name
 
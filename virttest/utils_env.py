@@ -1,4 +1,5 @@
 import functools
+import hashlib
 import logging
 import os
 import threading
@@ -18,6 +19,8 @@ from avocado.core import exceptions
 from virttest import ip_sniffing, virt_vm
 
 ENV_VERSION = 1
+# Layout of the env file, bump it when the way it is stored changes
+ENV_FORMAT = 2
 
 LOG = logging.getLogger("avocado." + __name__)
 
@@ -48,6 +51,17 @@ def lock_safe(function):
     return wrapper
 
 
+def _get_file_identity(filename):
+    """
+    :return: The inode, mtime and size of a file, None if it doesn't exist.
+    """
+    try:
+        stat = os.stat(filename)
+    except OSError:
+        return None
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
 class Env(IterableUserDict):
     """
     A dict-like object containing global objects used by tests.
@@ -68,12 +82,16 @@ class Env(IterableUserDict):
         empty = {"version": version}
         self._filename = filename
         self._sniffer = None
+        # (filename, digest, file identity) of the last saved contents
+        self._saved = None
         self.save_lock = threading.RLock()
         if filename:
             try:
                 if os.path.isfile(filename):
                     with open(filename, "rb") as f:
                         env = cPickle.load(f)
+                    if env.get("env_format") == ENV_FORMAT:
+                        env = env["data"]
                     if env.get("version", 0) >= version:
                         self.data = env
                     else:
@@ -98,14 +116,34 @@ class Env(IterableUserDict):
         """
         Pickle the contents of the Env object into a file.
 
+        The file is replaced atomically, and left untouched when the contents
+        did not change since they were last saved and nobody else rewrote or
+        replaced the file meanwhile.
+
         :param filename: Filename to pickle the dict into.  If not supplied,
                 use the filename from which the dict was loaded.
         """
         filename = filename or self._filename
         if filename is None:
             raise EnvSaveError("No filename specified for this env file")
-        with self.save_lock, open(filename, "wb") as f:
-            cPickle.dump(self.data, f, protocol=0)
+        with self.save_lock:
+            content = cPickle.dumps(
+                {"env_format": ENV_FORMAT, "data": self.data},
+                protocol=cPickle.HIGHEST_PROTOCOL,
+            )
+            digest = hashlib.sha1(content).digest()
+            if self._saved == (filename, digest, _get_file_identity(filename)):
+                return
+            tmp_filename = "%s.%s.tmp" % (filename, os.getpid())
+            try:
+                with open(tmp_filename, "wb") as f:
+                    f.write(content)
+                os.replace(tmp_filename, filename)
+            except BaseException:
+                if os.path.exists(tmp_filename):
+                    os.unlink(tmp_filename)
+                raise
+            self._saved = (filename, digest, _get_file_identity(filename))
 
     def get_all_vms(self):
         """
@@ -131,6 +169,7 @@ class Env(IterableUserDict):
         Destroy all objects stored in Env and remove the backing file.
         """
         self.clean_objects()
+        self._saved = None
         if self._filename is not None:
             if os.path.isfile(self._filename):
                 os.unlink(self._filename)
@@ -235,6 +274,9 @@ class Env(IterableUserDict):
         """
         self.data.setdefault("address_cache", ip_sniffing.AddrCache())
         sniffers = ip_sniffing.Sniffers
+        sniffer_name = params.get("ip_sniffer")
+        if sniffer_name:
+            sniffers = [s for s in sniffers if s.name == sniffer_name]
 
         if not self._sniffer:
             remote_pp = params.get("remote_preprocess") == "yes"
@@ -262,7 +304,7 @@ class Env(IterableUserDict):
         if not self._sniffer:
             raise exceptions.TestError(
                 "Can't find any supported ip sniffer! "
-                "%s" % [s.command for s in sniffers]
+                "%s" % [s.name for s in sniffers]
             )
 
         self._sniffer.start()
@@ -13,6 +13,7 @@ import shelve
 import shutil
 import signal
 import socket
+import sqlite3
 import struct
 import sys
 import time
@@ -3137,7 +3138,7 @@ class ParamsNet(VMNet):
         """
         Generator over mac addresses found in params
         """
-        for nic_name in self.params.get("nics"):
+        for nic_name in self.params.objects("nics"):
             nic_obj_params = self.params.object_params(nic_name)
             mac = nic_obj_params.get("mac")
             if mac:
@@ -3174,6 +3175,127 @@ class ParamsNet(VMNet):
         nic.ip = new_ip
 
 
+class AddressPool(object):
+    """
+    Database of the networking information of VMs, backed by sqlite
+
+    Maps the database keys of VMs to the python string-formatted list of
+    their NICs, like a shelve.  The MAC addresses of the NICs are indexed,
+    so checking whether one is allocated doesn't parse every entry.  The
+    whole session runs in one transaction, committed by close().
+
+    A shelve previously stored under the same filename is imported when the
+    database is created.
+    """
+
+    SQLITE_HEADER = b"SQLite format 3\x00"
+
+    def __init__(self, filename):
+        self.filename = filename
+        legacy = {}
+        if not self._is_sqlite(filename):
+            legacy = self._read_shelve(filename)
+            if os.path.exists(filename):
+                os.unlink(filename)
+        self._conn = sqlite3.connect(filename, timeout=60, isolation_level=None)
+        self._conn.execute("BEGIN IMMEDIATE")
+        if not self._conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'nets'"
+        ).fetchone():
+            self._conn.execute(
+                "CREATE TABLE nets (db_key TEXT PRIMARY KEY, entry TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE macs (mac TEXT NOT NULL, db_key TEXT NOT NULL, "
+                "PRIMARY KEY (mac, db_key))"
+            )
+            self._conn.execute("CREATE INDEX macs_db_key ON macs (db_key)")
+            for db_key, entry in legacy.items():
+                self[db_key] = entry
+
+    @classmethod
+    def _is_sqlite(cls, filename):
+        try:
+            with open(filename, "rb") as db_file:
+                return db_file.read(len(cls.SQLITE_HEADER)) == cls.SQLITE_HEADER
+        except IOError:
+            return False
+
+    @staticmethod
+    def _read_shelve(filename):
+        try:
+            db = shelve.open(filename, "r")
+        except Exception:
+            return {}
+        try:
+            return dict(db)
+        finally:
+            db.close()
+
+    @staticmethod
+    def _entry_macs(entry):
+        try:
+            nics = eval(entry, {}, {})
+        except SyntaxError:
+            return set()
+        if not isinstance(nics, list):
+            return set()
+        return set(
+            nic["mac"] for nic in nics if isinstance(nic, dict) and nic.get("mac")
+        )
+
+    def __getitem__(self, db_key):
+        row = self._conn.execute(
+            "SELECT entry FROM nets WHERE db_key = ?", (db_key,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(db_key)
+        return row[0]
+
+    def __setitem__(self, db_key, entry):
+        self._conn.execute("INSERT OR REPLACE INTO nets VALUES (?, ?)", (db_key, entry))
+        self._conn.execute("DELETE FROM macs WHERE db_key = ?", (db_key,))
+        self._conn.executemany(
+            "INSERT INTO macs VALUES (?, ?)",
+            [(mac, db_key) for mac in self._entry_macs(entry)],
+        )
+
+    def __delitem__(self, db_key):
+        if not self._conn.execute(
+            "DELETE FROM nets WHERE db_key = ?", (db_key,)
+        ).rowcount:
+            raise KeyError(db_key)
+        self._conn.execute("DELETE FROM macs WHERE db_key = ?", (db_key,))
+
+    def keys(self):
+        return [row[0] for row in self._conn.execute("SELECT db_key FROM nets")]
+
+    def macs(self):
+        """
+        Return the MAC addresses allocated to any VM.
+        """
+        return [row[0] for row in self._conn.execute("SELECT DISTINCT mac FROM macs")]
+
+    def mac_allocated(self, mac):
+        """
+        Return whether a MAC address is allocated to any VM.
+
+        :param mac: MAC address string
+        """
+        return bool(
+            self._conn.execute(
+                "SELECT 1 FROM macs WHERE mac = ? LIMIT 1", (mac,)
+            ).fetchone()
+        )
+
+    def close(self):
+        """
+        Commit the changes and close the database.
+        """
+        self._conn.execute("COMMIT")
+        self._conn.close()
+
+
 class DbNet(VMNet):
     """
     Networking information from database
@@ -3218,7 +3340,7 @@ class DbNet(VMNet):
         if not hasattr(self, "lock"):
             self.lock = utils_misc.lock_file(self.db_lockfile)
             if not hasattr(self, "db"):
-                self.db = shelve.open(self.db_filename)
+                self.db = AddressPool(self.db_filename)
             else:
                 raise DbNoLockError
         else:
@@ -3293,15 +3415,11 @@ class DbNet(VMNet):
     def mac_index(self):
         """Generator of mac addresses found in database"""
         try:
-            for db_key in list(self.db.keys()):
-                for nic in self.db_entry(db_key):
-                    mac = nic.get("mac")
-                    if mac:
-                        yield mac
-                    else:
-                        continue
+            macs = self.db.macs()
         except AttributeError:
             raise DbNoLockError
+        for mac in macs:
+            yield mac
 
 
 ADDRESS_POOL_FILENAME = os.path.join(data_dir.get_tmp_dir(), "address_pool")
@@ -3405,18 +3523,18 @@ class VirtNet(DbNet, ParamsNet):
                 % (nic.mac, str(nic_index_or_name))
             )
         self.free_mac_address(nic_index_or_name)
-        attempts_remaining = attempts
-        while attempts_remaining > 0:
-            mac_attempt = nic.complete_mac_address(self.mac_prefix)
-            self.lock_db()
-            if mac_attempt not in self.mac_index():
+        params_macs = set(ParamsNet.mac_index(self))
+        self.lock_db()
+        try:
+            for _ in xrange(attempts):
+                mac_attempt = nic.complete_mac_address(self.mac_prefix)
+                if mac_attempt in params_macs or self.db.mac_allocated(mac_attempt):
+                    continue
                 nic.mac = mac_attempt.lower()
-                self.unlock_db()
-                self.update_db()
+                self.save_to_db()
                 return self[nic_index_or_name].mac
-            else:
-                attempts_remaining -= 1
-                self.unlock_db()
+        finally:
+            self.unlock_db()
         raise NetError(
             "%s/%s MAC generation failed with prefix %s after %d "
             "attempts for NIC %s on VM %s (%s)"
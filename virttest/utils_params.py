@@ -22,6 +22,20 @@ class Params(IterableUserDict):
 
     lock = Lock()
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # The object index is rebuilt on demand
+        state.pop("_object_cache", None)
+        return state
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self._object_cache = None
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self._object_cache = None
+
     def __getitem__(self, key):
         """overrides the error messages of missing params[$key]"""
         try:
@@ -72,15 +86,42 @@ class Params(IterableUserDict):
         :param obj_name: The name of the object (objects are listed by the
                 objects() method).
         """
-        suffix = "_" + obj_name
-        self.lock.acquire()
-        new_dict = self.copy()
-        self.lock.release()
-        for key in list(new_dict.keys()):
-            if key.endswith(suffix):
-                new_key = key.split(suffix)[0]
-                new_dict[new_key] = new_dict[key]
-        return new_dict
+        new_params = self.__class__()
+        new_params.data = self.data.copy()
+        new_params.data.update(self._get_object_overrides(obj_name))
+        return new_params
+
+    def _get_object_overrides(self, obj_name):
+        """
+        Return the values the suffixed keys of an object give to their
+        suffixless versions.
+
+        All the suffixes of the keys are indexed on the first call, and the
+        result of each object is cached until the params are modified.
+
+        :param obj_name: The name of the object.
+        :return: A dict of the suffixless keys and their values.
+        """
+        cache = self.__dict__.get("_object_cache")
+        if cache is None or "index" not in cache:
+            # Publish the cache before reading the keys, a concurrent
+            # modification drops it instead of leaving a stale index.
+            cache = self._object_cache = {"overrides": {}}
+            index = {}
+            for key in list(self.data):
+                start = key.find("_")
+                while start != -1:
+                    index.setdefault(key[start:], []).append(key)
+                    start = key.find("_", start + 1)
+            cache["index"] = index
+        overrides = cache["overrides"].get(obj_name)
+        if overrides is None:
+            suffix = "_" + obj_name
+            overrides = {}
+            for key in cache["index"].get(suffix, ()):
+                overrides[key.split(suffix)[0]] = self.data[key]
+            cache["overrides"][obj_name] = overrides
+        return overrides
 
     def object_counts(self, count_key, base_name):
         """
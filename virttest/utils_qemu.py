@@ -2,16 +2,206 @@
 QEMU related utility functions.
 """
 
+import hashlib
 import json
+import logging
+import os
 import re
+import shlex
+import struct
+import tempfile
 
 from avocado.utils import process
 
+from virttest import data_dir
+
+LOG = logging.getLogger("avocado." + __name__)
+
 QEMU_VERSION_RE = re.compile(
     r"QEMU (?:PC )?emulator version\s" r"([0-9]+\.[0-9]+\.[0-9]+)" r"(?:\s\((.*?)\))?"
 )
 DEVICE_CATEGORY_RE = re.compile(r"([A-Z]\S+) devices:")
 
+# Bump whenever the probes stored in the capability cache change
+_PROBE_CACHE_VERSION = 2
+# Probe results already loaded by this process, by cache file
+_probe_cache = {}
+# Cache keys of the binaries identified by this process, by path and stat
+_probe_cache_keys = {}
+
+
+def _get_build_id(bin_path):
+    """
+    Read the GNU build id note of an ELF binary
+
+    :param bin_path: Path to the binary
+    :return: Hex string of the build id, None if it has none
+    """
+    try:
+        with open(bin_path, "rb") as binary:
+            header = binary.read(64)
+            if header[:4] != b"\x7fELF":
+                return None
+            is_64 = header[4] == 2
+            endian = "<" if header[5] == 1 else ">"
+            if is_64:
+                (phoff,) = struct.unpack(endian + "Q", header[32:40])
+                phentsize, phnum = struct.unpack(endian + "HH", header[54:58])
+            else:
+                (phoff,) = struct.unpack(endian + "I", header[28:32])
+                phentsize, phnum = struct.unpack(endian + "HH", header[42:46])
+            for index in range(phnum):
+                binary.seek(phoff + index * phentsize)
+                phdr = binary.read(phentsize)
+                # PT_NOTE
+                if struct.unpack(endian + "I", phdr[:4])[0] != 4:
+                    continue
+                if is_64:
+                    (offset,) = struct.unpack(endian + "Q", phdr[8:16])
+                    (size,) = struct.unpack(endian + "Q", phdr[32:40])
+                else:
+                    (offset,) = struct.unpack(endian + "I", phdr[4:8])
+                    (size,) = struct.unpack(endian + "I", phdr[16:20])
+                binary.seek(offset)
+                notes = binary.read(size)
+                pos = 0
+                while pos + 12 <= len(notes):
+                    namesz, descsz, note_type = struct.unpack(
+                        endian + "III", notes[pos : pos + 12]
+                    )
+                    pos += 12
+                    name = notes[pos : pos + namesz]
+                    pos += (namesz + 3) & ~3
+                    desc = notes[pos : pos + descsz]
+                    pos += (descsz + 3) & ~3
+                    # NT_GNU_BUILD_ID
+                    if note_type == 3 and name == b"GNU\x00":
+                        return desc.hex()
+    except (OSError, struct.error):
+        pass
+    return None
+
+
+def get_probe_cache_dir():
+    """
+    Return the directory of the qemu capability probe cache
+    """
+    return data_dir.get_cache_dir("qemu")
+
+
+def _get_probe_cache_file(bin_path):
+    """
+    Return the capability cache file of a qemu binary
+
+    The file name is derived from the binary path, mtime, size and build
+    id, so rebuilding or replacing the binary invalidates the cache.
+
+    :param bin_path: Path to qemu binary
+    :return: Path of the cache file, None if the binary can't be found
+    """
+    real_path = os.path.realpath(bin_path)
+    try:
+        stat = os.stat(real_path)
+    except OSError:
+        return None
+    # Reading the build id is not free, it's done once per binary version
+    identity = (real_path, stat.st_mtime_ns, stat.st_size)
+    digest = _probe_cache_keys.get(identity)
+    if digest is None:
+        key = json.dumps(
+            [
+                _PROBE_CACHE_VERSION,
+                real_path,
+                stat.st_mtime_ns,
+                stat.st_size,
+                _get_build_id(real_path),
+            ]
+        )
+        digest = _probe_cache_keys[identity] = hashlib.sha256(key.encode()).hexdigest()
+    return os.path.join(get_probe_cache_dir(), "%s.json" % digest)
+
+
+def _load_probe_cache(cache_file):
+    try:
+        with open(cache_file) as cache:
+            return json.load(cache)["probes"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return {}
+
+
+def get_cached_probe(bin_path, probe, func):
+    """
+    Return the result of a capability probe of a qemu binary
+
+    Results are kept in an on-disk cache shared by all processes, the
+    probe is only executed when the binary was not probed before. Empty
+    results usually mean the probe failed, so they are not stored.
+
+    :param bin_path: Path to qemu binary
+    :param probe: Unique name of the probe
+    :param func: Callable executing the probe, its result must be JSON
+                 serializable
+    :return: Result of the probe
+    """
+    cache_file = _get_probe_cache_file(bin_path)
+    if cache_file is None:
+        return func()
+    probes = _probe_cache.get(cache_file)
+    if probes is None:
+        probes = _probe_cache[cache_file] = _load_probe_cache(cache_file)
+    if probe in probes:
+        return probes[probe]
+    result = func()
+    if not result:
+        return result
+    probes[probe] = result
+    tmp_file = None
+    try:
+        # Keep the probes stored meanwhile by other processes
+        stored = _load_probe_cache(cache_file)
+        stored.update(probes)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+        fd, tmp_file = tempfile.mkstemp(dir=os.path.dirname(cache_file))
+        with os.fdopen(fd, "w") as cache:
+            json.dump({"binary": bin_path, "probes": stored}, cache)
+        os.replace(tmp_file, cache_file)
+    except OSError as details:
+        LOG.warning("Unable to store qemu capabilities of %s: %s", bin_path, details)
+        if tmp_file and os.path.exists(tmp_file):
+            os.unlink(tmp_file)
+    return result
+
+
+def purge_probe_cache(bin_path=None):
+    """
+    Remove cached capability probes
+
+    :param bin_path: Path to qemu binary, all binaries when None
+    :return: Number of removed cache files
+    """
+    if bin_path is not None:
+        cache_file = _get_probe_cache_file(bin_path)
+        cache_files = [cache_file] if cache_file else []
+    else:
+        cache_dir = get_probe_cache_dir()
+        try:
+            cache_files = [
+                os.path.join(cache_dir, name)
+                for name in os.listdir(cache_dir)
+                if name.endswith(".json")
+            ]
+        except OSError:
+            cache_files = []
+    removed = 0
+    for cache_file in cache_files:
+        _probe_cache.pop(cache_file, None)
+        try:
+            os.unlink(cache_file)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
 
 def _get_info(bin_path, options, include_stderr=False):
     """
@@ -39,13 +229,34 @@ def get_qemu_version(bin_path):
     :raise OSError: If unable to get that
     :return: A tuple of normalized version and package version
     """
-    output = _get_info(bin_path, "-version")
+    output = get_cached_probe(
+        bin_path, "-version", lambda: _get_info(bin_path, "-version")
+    )
     matches = QEMU_VERSION_RE.match(output)
     if matches is None:
         raise OSError("Unable to get the version of qemu")
     return matches.groups()
 
 
+def get_img_help_text(bin_path, cmd=""):
+    """
+    Return the help text of qemu-img or of one of its subcommands
+
+    :param bin_path: Path to qemu-img binary
+    :param cmd: The subcommand, empty for the global help text listing
+                all the subcommands
+    :return: Help text, as printed on stdout
+    """
+
+    def _probe():
+        result = process.run(
+            "%s %s -h" % (bin_path, cmd), verbose=False, ignore_status=True
+        )
+        return result.stdout_text
+
+    return get_cached_probe(bin_path, ("%s -h" % cmd).strip(), _probe)
+
+
 def get_machines_info(bin_path):
     """
     Return all machines information supported by qemu
@@ -53,7 +264,9 @@ def get_machines_info(bin_path):
     :param bin_path: Path to qemu binary
     :return: A dict of all machines
     """
-    output = _get_info(bin_path, r"-machine help", True)
+    output = get_cached_probe(
+        bin_path, "-machine help", lambda: _get_info(bin_path, r"-machine help", True)
+    )
     machines = re.findall(r"^([a-z]\S+)\s+(.*)$", output, re.M)
     return dict(machines)
 
@@ -136,6 +349,118 @@ def find_supported_devices(bin_path, pattern, category=None):
     return devices
 
 
+def run_qmp_session(bin_path, commands, timeout=10):
+    """
+    Execute QMP commands in a single qemu process
+
+    :param bin_path: Path to qemu binary
+    :param commands: List of (id, command, arguments) tuples, the arguments
+                     may be None
+    :param timeout: Timeout of the whole session
+    :return: Dict of the command returns by id, failed commands are absent
+    """
+    requests = [{"execute": "qmp_capabilities"}]
+    for cmd_id, cmd, arguments in commands:
+        request = {"execute": cmd, "id": cmd_id}
+        if arguments:
+            request["arguments"] = arguments
+        requests.append(request)
+    requests.append({"execute": "quit"})
+    payload = "\n".join(json.dumps(request) for request in requests)
+    output = process.run(
+        "echo %s | %s -machine none -nodefaults -nographic -S -qmp stdio"
+        % (shlex.quote(payload), bin_path),
+        timeout=timeout,
+        ignore_status=True,
+        shell=True,
+        verbose=False,
+    ).stdout_text
+    returns = {}
+    for line in output.splitlines():
+        try:
+            response = json.loads(line)
+        except ValueError:
+            continue
+        if isinstance(response, dict) and "return" in response and "id" in response:
+            returns[response["id"]] = response["return"]
+    return returns
+
+
+def _introspect_qmp(bin_path):
+    """
+    Gather the capabilities of a qemu binary through one QMP session
+
+    :param bin_path: Path to qemu binary
+    :return: Dict of capabilities, empty if the session failed
+    """
+    returns = run_qmp_session(
+        bin_path,
+        [
+            ("version", "query-version", None),
+            ("commands", "query-commands", None),
+            ("schema", "query-qmp-schema", None),
+            ("objects", "qom-list-types", {"implements": "user-creatable"}),
+            ("machines", "query-machines", None),
+            ("machine_props", "qom-list-properties", {"typename": "none-machine"}),
+            ("options", "query-command-line-options", None),
+            ("hmp_help", "human-monitor-command", {"command-line": "help"}),
+        ],
+    )
+    if "version" not in returns or "commands" not in returns:
+        return {}
+    version = returns["version"]
+    # Only keep the arguments of the commands from the (big) schema
+    schema = {entity["name"]: entity for entity in returns.get("schema", [])}
+    command_args = {}
+    for entity in schema.values():
+        if entity.get("meta-type") == "command":
+            arg_type = schema.get(entity.get("arg-type"), {})
+            command_args[entity["name"]] = [
+                member["name"] for member in arg_type.get("members", [])
+            ]
+    machines = {}
+    for machine in returns.get("machines", []):
+        description = machine.get("description", "")
+        if machine.get("alias"):
+            machines[machine["alias"]] = "%s (alias of %s)" % (
+                description,
+                machine["name"],
+            )
+        if machine.get("is-default"):
+            description += " (default)"
+        machines[machine["name"]] = description
+    return {
+        "version": "%(major)d.%(minor)d.%(micro)d" % version["qemu"],
+        "package": version.get("package", "").strip(" ()") or None,
+        "commands": [cmd["name"] for cmd in returns["commands"]],
+        "command_args": command_args,
+        "objects": [obj["name"] for obj in returns.get("objects", [])],
+        "machines": machines,
+        "machine_props": [prop["name"] for prop in returns.get("machine_props", [])],
+        "options": {
+            opt["option"]: [param["name"] for param in opt.get("parameters", [])]
+            for opt in returns.get("options", [])
+        },
+        "hmp_help": returns.get("hmp_help", ""),
+    }
+
+
+def get_qmp_capabilities(bin_path):
+    """
+    Return the capabilities of qemu introspected through QMP
+
+    query-version, query-commands, query-qmp-schema, qom-list-types,
+    query-machines, qom-list-properties, query-command-line-options and
+    the HMP help are gathered from one qemu process and cached.
+
+    :param bin_path: Path to qemu binary
+    :return: Dict with the "version", "package", "commands",
+             "command_args", "objects", "machines", "machine_props",
+             "options" and "hmp_help" keys, empty if QMP is unusable
+    """
+    return get_cached_probe(bin_path, "qmp", lambda: _introspect_qmp(bin_path))
+
+
 def get_maxcpus_hard_limit(bin_path, machine_type):
     """
     Return maximum limit CPUs supported by specified machine type
@@ -933,7 +933,17 @@ class BaseVM(object):
             except (VMIPAddressMissingError, VMAddressVerificationError) as e:
                 return False
 
-        ipaddr = utils_misc.wait_for(_get_address, timeout, step=interval)
+        # Look again as soon as the address cache gets updated (or after
+        # interval, the address doesn't always come from the cache)
+        end_time = time.time() + timeout
+        ipaddr = _get_address()
+        while not ipaddr and time.time() < end_time:
+            wait_time = max(0, min(interval, end_time - time.time()))
+            if hasattr(self.address_cache, "wait_for_update"):
+                self.address_cache.wait_for_update(wait_time)
+            else:
+                time.sleep(wait_time)
+            ipaddr = _get_address()
         if not ipaddr:
             # Read guest address via serial console and update VM address
             # cache to avoid get out-dated address.
@@ -27,14 +27,24 @@ individual nodes within a virtualization test cluster. It handles:
 Key components:
 - Node: Main class representing a cluster node with agent capabilities
 - NodeError: Exception class for node-specific errors
+- run_on_nodes: Run an operation on many nodes with a bounded thread pool
 
 The module is designed to work with the remote nodes, with special handling
 for remote agent deployment and management.
 """
 
+import atexit
+import hashlib
 import inspect
+import json
 import logging
 import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import aexpect
 import avocado
@@ -49,6 +59,72 @@ from . import ClusterError, proxy
 
 LOG = logging.getLogger("avocado." + __name__)
 
+#: Maximum number of nodes operated on at the same time by `run_on_nodes`
+MAX_PARALLEL_NODES = 8
+
+_agent_archive = None
+_agent_archive_lock = threading.Lock()
+
+
+def _agent_pkg_sources():
+    """
+    Get the local trees deployed to the agents, with their path relative
+    to the agent directory on the nodes.
+    """
+    agent_pkg_path = os.path.join(os.path.dirname(avocado_vt.__file__), "vt_agent")
+    sources = [(agent_pkg_path, "vt_agent")]
+    for pkg in (avocado, virttest):
+        pkg_path = os.path.dirname(inspect.getfile(pkg))
+        sources.append((pkg_path, os.path.join("vt_agent", os.path.basename(pkg_path))))
+    aexpect_source = os.path.dirname(os.path.dirname(inspect.getsourcefile(aexpect)))
+    sources.append((aexpect_source, os.path.join("vt_agent", "aexpect")))
+    return sources
+
+
+def _walk_sources(sources):
+    """
+    Yield the local path and archive name of the files of the sources,
+    sorted so that the same content always comes in the same order.
+    """
+    for source, arcname in sources:
+        for root, dirs, files in os.walk(source):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                if os.path.isfile(path):
+                    relpath = os.path.relpath(path, source)
+                    yield path, os.path.join(arcname, relpath)
+
+
+def _get_agent_archive():
+    """
+    Get the compressed archive of the agent packages.
+
+    The archive is built once per process, named after the digest of the
+    content of the packages, so nodes can tell whether they already have it.
+
+    :return: The content digest and the path of the archive.
+    :rtype: tuple
+    """
+    global _agent_archive
+    with _agent_archive_lock:
+        if _agent_archive is None:
+            files = list(_walk_sources(_agent_pkg_sources()))
+            digest = hashlib.sha256()
+            for path, arcname in files:
+                digest.update(arcname.encode() + b"\0")
+                with open(path, "rb") as source_file:
+                    digest.update(hashlib.sha256(source_file.read()).digest())
+            digest = digest.hexdigest()
+            tmpdir = tempfile.mkdtemp(prefix="vt_agent_pkgs_")
+            atexit.register(shutil.rmtree, tmpdir, True)
+            archive = os.path.join(tmpdir, "%s.tar.gz" % digest)
+            with tarfile.open(archive, "w:gz", compresslevel=6) as tar:
+                for path, arcname in files:
+                    tar.add(path, arcname)
+            _agent_archive = (digest, archive)
+        return _agent_archive
+
 
 class NodeError(ClusterError):
     """Exception raised for errors specific to Node operations."""
@@ -65,8 +141,8 @@ class Node(object):
 
     :param params: A dictionary of parameters for configuring the node.
                    Expected keys include 'address', 'hostname', 'password',
-                   'username', 'proxy_port', 'shell_port', 'shell_prompt',
-                   'agent_base_dir'.
+                   'username', 'proxy_port', 'proxy_encoding', 'shell_port',
+                   'shell_prompt', 'agent_base_dir'.
     :type params: dict
     :param name: A unique name for this node.
     :type name: str
@@ -87,7 +163,9 @@ class Node(object):
 
         self._proxy_port = self._config.get("proxy_port", "9999")
         self._uri = "http://%s:%s/" % (self._host, self._proxy_port)
-        self._proxy = proxy.get_server_proxy(self._uri)
+        self._proxy = proxy.get_server_proxy(
+            self._uri, self._config.get("proxy_encoding", "json")
+        )
         self._agent_pid = None
         self.tag = None
 
@@ -278,28 +356,80 @@ class Node(object):
             return False
         return True
 
+    def _push_agent_archive(self, session):
+        """
+        Make sure the node has the archive of the current agent packages.
+
+        The archives are cached on the node under the agent base directory,
+        next to a manifest recording their size and how long their upload
+        took. An archive is only uploaded when the node has none with the
+        same content digest, and the archives of other versions are removed.
+
+        :param session: A session to the node.
+        :type session: aexpect.client.RemoteSession
+        :return: The path of the archive on the node.
+        :rtype: str
+        """
+        digest, archive = _get_agent_archive()
+        cache_dir = os.path.join(self._agent_base_dir, "pkg_cache")
+        remote_archive = os.path.join(cache_dir, os.path.basename(archive))
+        manifest_file = os.path.join(cache_dir, "%s.json" % digest)
+
+        status, output = session.cmd_status_output(
+            "test -f %s && cat %s" % (remote_archive, manifest_file)
+        )
+        if status == 0:
+            try:
+                manifest = json.loads(output)
+                LOG.info(
+                    "Node %s: agent packages %s already cached, saved "
+                    "transferring %d bytes (about %.1fs)",
+                    self.name,
+                    digest[:12],
+                    manifest["size"],
+                    manifest["seconds"],
+                )
+                return remote_archive
+            except (ValueError, KeyError):
+                pass
+
+        session.cmd("rm -rf %s && mkdir -p %s" % (cache_dir, cache_dir))
+        size = os.path.getsize(archive)
+        start = time.monotonic()
+        tmp_archive = "%s.%s.tmp" % (remote_archive, self.name)
+        self._scp_to_remote(archive, tmp_archive)
+        seconds = time.monotonic() - start
+        session.cmd("mv -f %s %s" % (tmp_archive, remote_archive))
+        manifest = json.dumps({"digest": digest, "size": size, "seconds": seconds})
+        session.cmd("echo '%s' > %s" % (manifest, manifest_file))
+        LOG.info(
+            "Node %s: transferred agent packages %s, %d bytes in %.1fs",
+            self.name,
+            digest[:12],
+            size,
+            seconds,
+        )
+        return remote_archive
+
     def _setup_agent_pkgs(self):
         """
         Set up necessary Python packages on the remote agent node.
 
         This involves:
-        1. Copying ``avocado`` and ``virttest`` package sources to the agent.
+        1. Extracting the agent, ``avocado``, ``virttest`` and ``aexpect``
+           package sources from the archive cached on the node, see
+           `_push_agent_archive`.
         2. Patching ``avocado/__init__.py`` to prevent plugin initialization.
         3. Patching ``virttest/data_dir.py`` to fix a type error.
-        4. Copying ``aexpect`` source to the agent and installing it in
-           develop mode.
+        4. Installing the agent, and ``aexpect`` in develop mode.
         """
-        agent_pkg_path = os.path.join(os.path.dirname(avocado_vt.__file__), "vt_agent")
-        self._scp_to_remote(agent_pkg_path, self._agent_dir)
-
         dest_path = os.path.join(self._agent_dir, "vt_agent")
 
-        for pkg in (avocado, virttest):
-            pkg_path = os.path.dirname(inspect.getfile(pkg))
-            self._scp_to_remote(pkg_path, dest_path)
-
         session = self._create_session()
         try:
+            remote_archive = self._push_agent_archive(session)
+            session.cmd("tar -xzf %s -C %s" % (remote_archive, self._agent_dir))
+
             # FIXME: Using sed to patch code is highly fragile. This disables
             #  plugin initialization to avoid errors when avocado is used as a
             #  library. A better approach would be to use an avocado API or
@@ -320,11 +450,6 @@ class Node(object):
             )
 
             target_file = os.path.join(dest_path, "aexpect")
-            session.cmd_output("rm -rf %s" % target_file, timeout=300)
-            aexpect_source_file = os.path.dirname(
-                os.path.dirname(inspect.getsourcefile(aexpect))
-            )
-            self._scp_to_remote(aexpect_source_file, target_file)
             session.cmd("cd %s && python3 setup.py develop" % target_file)
         finally:
             session.close()
@@ -458,3 +583,59 @@ class Node(object):
             )
         except Exception as e:
             LOG.error(f"SCP failed: {e}")
+
+
+def run_on_nodes(nodes, func, action, max_workers=MAX_PARALLEL_NODES):
+    """
+    Call a function on each node, at most `max_workers` nodes at a time.
+
+    The time each node took is logged, as well as the error of the nodes
+    that failed. The function is called on every node even if some fail.
+
+    :param nodes: The nodes to operate on.
+    :type nodes: list of Node
+    :param func: The function to call, with the node as only argument.
+    :type func: callable
+    :param action: The description of the operation used in the logs,
+                   e.g. "start the agent server".
+    :type action: str
+    :param max_workers: The maximum number of nodes operated on at once.
+    :type max_workers: int
+    :return: The errors of the nodes that failed, by node name.
+    :rtype: dict
+    """
+
+    def __run(node):
+        start = time.monotonic()
+        try:
+            func(node)
+        except Exception as err:
+            LOG.error(
+                "Node %s: failed to %s after %.1fs: %s",
+                node.name,
+                action,
+                time.monotonic() - start,
+                err,
+            )
+            return err
+        LOG.info("Node %s: %s took %.1fs", node.name, action, time.monotonic() - start)
+        return None
+
+    nodes = list(nodes)
+    if not nodes:
+        return {}
+    start = time.monotonic()
+    with ThreadPoolExecutor(
+        max_workers=max(1, min(max_workers, len(nodes))),
+        thread_name_prefix="vt_cluster",
+    ) as executor:
+        errors = dict(zip([node.name for node in nodes], executor.map(__run, nodes)))
+    errors = {name: err for name, err in errors.items() if err is not None}
+    LOG.info(
+        "Took %.1fs to %s on %d nodes, %d failed",
+        time.monotonic() - start,
+        action,
+        len(nodes),
+        len(errors),
+    )
+    return errors
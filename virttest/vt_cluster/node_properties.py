@@ -45,11 +45,14 @@ def save_properties():
 
     props = {}
     for node in cluster.get_all_nodes():
-        props[node.name] = {}
-        props[node.name]["hostname"] = node.proxy.host.platform.get_hostname()
-        props[node.name]["cpu_vendor_id"] = node.proxy.host.cpu.get_cpu_vendor_id()
-        props[node.name]["cpu_model_name"] = node.proxy.host.cpu.get_cpu_model_name()
-        # TODO: Support more other properties of the nodes
+        with node.proxy.batch() as batch:
+            calls = {
+                "hostname": batch.host.platform.get_hostname(),
+                "cpu_vendor_id": batch.host.cpu.get_cpu_vendor_id(),
+                "cpu_model_name": batch.host.cpu.get_cpu_model_name(),
+            }
+            # TODO: Support more other properties of the nodes
+        props[node.name] = {name: call.result() for name, call in calls.items()}
 
     with open(cluster.metadata_file, "w") as metadata_file:
         json.dump(props, metadata_file)
@@ -19,22 +19,37 @@ This module provides interfaces for communicating with remote agent nodes
 in a virtualization test cluster. It handles XML-RPC communication and
 provides error handling for distributed test operations.
 
+Calls are sent over a pool of keep-alive HTTP connections per node, so
+concurrent threads neither share nor re-open connections. By default the
+calls are encoded as JSON, which agents that only speak XML-RPC reject,
+in which case the proxy falls back to XML-RPC.
+
 Key components:
 - ServerProxyError: Exception class for proxy operation errors
 - _ClientProxy: Client-side proxy for communicating with remote agents
 - get_server_proxy: Factory function to create proxy instances
 """
 
+import base64
+import datetime
+import gzip
 import importlib
 import importlib.util
 import json
 import logging
+import threading
+from urllib import parse
 from xmlrpc import client
 
 from . import ClusterError
 
 LOG = logging.getLogger("avocado." + __name__)
 
+#: Path of the JSON encoded calls on the agent server
+JSON_RPC_PATH = "/json"
+#: Encodings of the calls, in order of preference
+ENCODINGS = ("json", "xml")
+
 
 class ServerProxyError(ClusterError):
     """
@@ -76,46 +91,211 @@ class _ClientMethod:
         try:
             return self.__send(self.__name, args)
         except client.Fault as e:
-            fault_code = e.faultCode
-            fault_string = json.loads(e.faultString)
-            LOG.error(
-                "ClientProxy: Fault occurred calling method '%s': Code=%s, String=%s",
-                self.__name,
-                fault_code,
-                fault_string,
+            _raise_remote_error(self.__name, e)
+
+
+def _raise_remote_error(name, e):
+    """
+    Raise the error reported by the fault of a remote call.
+
+    :param name: The name of the called method.
+    :param e: The fault returned by the agent.
+    :type e: xmlrpc.client.Fault
+    """
+    fault_code = e.faultCode
+    fault_string = json.loads(e.faultString)
+    LOG.error(
+        "ClientProxy: Fault occurred calling method '%s': Code=%s, String=%s",
+        name,
+        fault_code,
+        fault_string,
+    )
+    if "." in fault_string.get("exc_type"):
+        root_mod_name = ".".join(fault_string.get("exc_type").split(".")[:-1])
+        exc_type_name = fault_string.get("exc_type").split(".")[-1]
+    else:
+        root_mod_name = None
+        exc_type_name = fault_string.get("exc_type")
+
+    kargs = fault_string.get("exc_value")
+
+    # FIXME: For backward compatibility with the current framework interfaces,
+    #        this code reconstructs the remote exception locally. A better
+    #        approach would be to use a structured error code mechanism
+    #        instead of dynamically importing and reconstructing exceptions.
+    try:
+        if root_mod_name:
+            actual_root_mod = importlib.import_module(root_mod_name)
+            specific_exception_class = getattr(actual_root_mod, exc_type_name)
+        else:
+            specific_exception_class = getattr(
+                importlib.import_module("builtins"), exc_type_name, None
             )
-            if "." in fault_string.get("exc_type"):
-                root_mod_name = ".".join(fault_string.get("exc_type").split(".")[:-1])
-                exc_type_name = fault_string.get("exc_type").split(".")[-1]
-            else:
-                root_mod_name = None
-                exc_type_name = fault_string.get("exc_type")
+            if specific_exception_class is None:
+                specific_exception_class = eval(exc_type_name)
 
-            kargs = fault_string.get("exc_value")
+        if isinstance(kargs, dict):
+            raise specific_exception_class(**kargs)
+        elif isinstance(kargs, str):
+            raise specific_exception_class(kargs)
+        else:
+            raise specific_exception_class()
+    except Exception:
+        raise ServerProxyError(fault_code, fault_string.get("tb_info")) from e
+
+
+def _json_default(obj):
+    """
+    Encode the values JSON lacks the way XML-RPC marshals them.
+    """
+    if isinstance(obj, client.Binary):
+        obj = obj.data
+    if isinstance(obj, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(obj).decode("ascii")}
+    if isinstance(obj, client.DateTime):
+        return {"__datetime__": obj.value}
+    if isinstance(obj, datetime.datetime):
+        return {"__datetime__": obj.strftime("%Y%m%dT%H:%M:%S")}
+    if hasattr(obj, "__dict__"):
+        return vars(obj)
+    raise TypeError("cannot marshal %s objects" % type(obj))
+
+
+def _json_object_hook(obj):
+    if len(obj) == 1:
+        if "__bytes__" in obj:
+            return base64.b64decode(obj["__bytes__"])
+        if "__datetime__" in obj:
+            return datetime.datetime.strptime(obj["__datetime__"], "%Y%m%dT%H:%M:%S")
+    return obj
+
+
+class _JSONTransport(client.Transport):
+    """
+    Transport reading JSON encoded responses instead of XML-RPC ones.
+    """
+
+    def parse_response(self, response):
+        data = response.read()
+        if response.getheader("Content-Encoding", "") == "gzip":
+            data = gzip.decompress(data)
+        if self.verbose:
+            print("body:", repr(data))
+        return json.loads(data, object_hook=_json_object_hook)
 
-            # FIXME: For backward compatibility with the current framework interfaces,
-            #        this code reconstructs the remote exception locally. A better
-            #        approach would be to use a structured error code mechanism
-            #        instead of dynamically importing and reconstructing exceptions.
-            try:
-                if root_mod_name:
-                    actual_root_mod = importlib.import_module(root_mod_name)
-                    specific_exception_class = getattr(actual_root_mod, exc_type_name)
-                else:
-                    specific_exception_class = getattr(
-                        importlib.import_module("builtins"), exc_type_name, None
-                    )
-                    if specific_exception_class is None:
-                        specific_exception_class = eval(exc_type_name)
 
-                if isinstance(kargs, dict):
-                    raise specific_exception_class(**kargs)
-                elif isinstance(kargs, str):
-                    raise specific_exception_class(kargs)
-                else:
-                    raise specific_exception_class()
-            except Exception:
-                raise ServerProxyError(fault_code, fault_string.get("tb_info")) from e
+class _TransportPool(object):
+    """
+    Thread-safe pool of keep-alive transports to a single server.
+
+    A transport holds one HTTP connection and must not be used by two
+    threads at the same time, so each request borrows an idle one, or
+    creates it, and returns it once the response has been read.
+
+    :param transport_class: The `xmlrpc.client.Transport` class to create.
+    """
+
+    def __init__(self, transport_class=client.Transport):
+        self._transport_class = transport_class
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def request(self, host, handler, request_body, verbose=False):
+        with self._lock:
+            transport = self._idle.pop() if self._idle else None
+        if transport is None:
+            transport = self._transport_class(use_builtin_types=True)
+        try:
+            response = transport.request(host, handler, request_body, verbose)
+        except Exception:
+            transport.close()
+            raise
+        with self._lock:
+            self._idle.append(transport)
+        return response
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for transport in idle:
+            transport.close()
+
+
+class BatchCall(object):
+    """
+    A call queued in a batch, holding its outcome once the batch is sent.
+    """
+
+    def __init__(self, name, args):
+        self.name = name
+        self.args = args
+        self._done = False
+        self._value = None
+        self._fault = None
+
+    def result(self):
+        """
+        Get the value returned by the call.
+
+        :return: The value returned by the remote method.
+        :raise ServerProxyError: If the batch was not sent yet, or the way
+                                 a direct call would report the fault of
+                                 the remote method.
+        """
+        if not self._done:
+            raise ServerProxyError(0, f"The batch calling '{self.name}' was not sent")
+        if self._fault is not None:
+            _raise_remote_error(self.name, self._fault)
+        return self._value
+
+    def exception(self):
+        """
+        Get the error raised by the call.
+
+        :return: The exception `result` raises, None if the call succeeded.
+        """
+        try:
+            self.result()
+        except Exception as e:
+            return e
+        return None
+
+
+class _Batch(object):
+    """
+    Queue calls to an agent and send them in a single request.
+
+    Calls look like direct ones, `batch.service.method(*args)`, but return
+    a `BatchCall` whose result is available once the batch is sent, which
+    happens when leaving the context.
+    """
+
+    def __init__(self, proxy):
+        self._proxy = proxy
+        self._calls = []
+
+    def __getattr__(self, name):
+        return _ClientMethod(self._queue, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.send()
+
+    def _queue(self, name, args):
+        call = BatchCall(name, args)
+        self._calls.append(call)
+        return call
+
+    def send(self):
+        """
+        Send the queued calls and set their outcome.
+        """
+        calls, self._calls = self._calls, []
+        if calls:
+            self._proxy._multicall(calls)
 
 
 class _ClientProxy(client.ServerProxy):
@@ -128,39 +308,129 @@ class _ClientProxy(client.ServerProxy):
 
     :param uri: The URI of the remote XML-RPC server (agent server).
     :type uri: str
+    :param encoding: The encoding of the calls, one of `ENCODINGS`. JSON
+                     encoded calls fall back to XML-RPC when the agent
+                     does not support them.
+    :type encoding: str
     """
 
-    def __init__(self, uri):
-        super(_ClientProxy, self).__init__(uri, allow_none=True, use_builtin_types=True)
+    def __init__(self, uri, encoding="json"):
+        if encoding not in ENCODINGS:
+            raise ValueError("Unsupported proxy encoding: %s" % encoding)
+        super(_ClientProxy, self).__init__(
+            uri,
+            transport=_TransportPool(),
+            allow_none=True,
+            use_builtin_types=True,
+        )
         self._uri = uri
+        self._encoding = encoding
+        self._json_transport = _TransportPool(_JSONTransport)
 
     def __getattr__(self, name):
-        return _ClientMethod(self._ServerProxy__request, name)
+        return _ClientMethod(self._request, name)
+
+    def _request(self, methodname, params):
+        if self._encoding == "json":
+            try:
+                return self._json_request(methodname, params)
+            except client.ProtocolError as e:
+                if e.errcode != 404:
+                    raise
+                LOG.debug(
+                    "ClientProxy: %s does not support JSON calls, using XML-RPC",
+                    self._uri,
+                )
+                self._encoding = "xml"
+                self._json_transport.close()
+        return self._ServerProxy__request(methodname, params)
+
+    def batch(self):
+        """
+        Get a batch queueing calls to send them to the agent at once.
+
+        Example::
+
+            with node.proxy.batch() as batch:
+                hostname = batch.host.platform.get_hostname()
+                vendor = batch.host.cpu.get_cpu_vendor_id()
+            print(hostname.result(), vendor.result())
+
+        :return: The batch, sent when leaving its context.
+        :rtype: _Batch
+        """
+        return _Batch(self)
+
+    def _multicall(self, calls):
+        """
+        Send the calls in a single request and set their outcome.
+
+        Agents without multicall support get the calls one by one.
+
+        :param calls: The calls to send.
+        :type calls: list of BatchCall
+        """
+        call_list = [{"methodName": c.name, "params": list(c.args)} for c in calls]
+        try:
+            results = self._request("system.multicall", (call_list,))
+        except client.Fault as e:
+            if "system.multicall" not in e.faultString:
+                _raise_remote_error("system.multicall", e)
+            LOG.debug("ClientProxy: %s does not support multicall", self._uri)
+            results = []
+            for call in calls:
+                try:
+                    results.append([self._request(call.name, call.args)])
+                except client.Fault as fault:
+                    results.append(
+                        {"faultCode": fault.faultCode, "faultString": fault.faultString}
+                    )
+
+        for call, result in zip(calls, results):
+            if isinstance(result, dict):
+                call._fault = client.Fault(result["faultCode"], result["faultString"])
+            else:
+                call._value = result[0]
+            call._done = True
+
+    def _json_request(self, methodname, params):
+        request = json.dumps(
+            {"method": methodname, "params": params}, default=_json_default
+        )
+        response = self._json_transport.request(
+            parse.urlsplit(self._uri).netloc, JSON_RPC_PATH, request.encode()
+        )
+        if "error" in response:
+            raise client.Fault(response["error"]["code"], response["error"]["message"])
+        return response["result"]
 
     def __getstate__(self):
         """
         Custom pickle serialization to avoid connection attempts.
 
-        Only serialize the URI, not the transport or other connection objects.
+        Only serialize the URI and the encoding, not the transports or
+        other connection objects.
         """
-        return {"uri": self._uri}
+        return {"uri": self._uri, "encoding": self._encoding}
 
     def __setstate__(self, state):
         """
         Custom pickle de-serialized to reconstruct the proxy.
 
-        Reinitialize the proxy with the stored URI.
+        Reinitialize the proxy with the stored URI and encoding.
         """
-        self.__init__(state["uri"])
+        self.__init__(state["uri"], state.get("encoding", "json"))
 
 
-def get_server_proxy(uri):
+def get_server_proxy(uri, encoding="json"):
     """
     Get the server proxy.
 
     :param uri: The URI of the server proxy. e.g: http://$host:$proxy_port/
     :type uri: str
+    :param encoding: The encoding of the calls, "json" or "xml".
+    :type encoding: str
     :return: The proxy obj.
     :rtype: _ClientProxy
     """
-    return _ClientProxy(uri)
+    return _ClientProxy(uri, encoding)
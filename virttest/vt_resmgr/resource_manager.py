@@ -198,11 +198,25 @@ class _VTResourceManager(object):
         do the startup work across all cluster worker nodes
         """
         LOG.debug(f"Startup the cluster resource manager")
+        # Start the backing service and attach the pools in a single round
+        # trip per node, the batched calls run in order on the node
         for node in cluster.get_all_nodes():
-            node.proxy.resource.start_resource_backing_service()
-
-        for pool_id in self.pools:
-            self.attach_pool(pool_id)
+            pools = self._get_node_pools(node)
+            LOG.debug(f"Attach the pools {[p.name for p in pools]} to {node.name}")
+            with node.proxy.batch() as batch:
+                started = batch.resource.start_resource_backing_service()
+                calls = [
+                    (
+                        pool,
+                        batch.resource.create_pool_connection(
+                            pool.customize_pool_config(node.name)
+                        ),
+                    )
+                    for pool in pools
+                ]
+            started.result()
+            for pool, call in calls:
+                pool.attached_to(node, call.result())
 
         # The pool's status could change after being attached to worker nodes
         self._dump()
@@ -214,11 +228,18 @@ class _VTResourceManager(object):
         Note: This function is called only once in job's post_tests
         """
         LOG.debug(f"Teardown the cluster resource manager")
-        for pool_id in self.pools:
-            self.detach_pool(pool_id)
-
         for node in cluster.get_all_nodes():
-            node.proxy.resource.stop_resource_backing_service()
+            pools = self._get_node_pools(node)
+            LOG.debug(f"Detach the pools {[p.name for p in pools]} from {node.name}")
+            with node.proxy.batch() as batch:
+                calls = [
+                    (pool, batch.resource.destroy_pool_connection(pool.uuid))
+                    for pool in pools
+                ]
+                stopped = batch.resource.stop_resource_backing_service()
+            for pool, call in calls:
+                pool.detached_from(node, call.result())
+            stopped.result()
 
     def _get_pool_by_name(self, pool_name):
         pools = [p for p in self.pools.values() if p.name == pool_name]
@@ -227,6 +248,9 @@ class _VTResourceManager(object):
     def _get_pool_by_id(self, pool_id):
         return self.pools.get(pool_id)
 
+    def _get_node_pools(self, node):
+        return [p for p in self.pools.values() if node.name in p.accessing_nodes]
+
     def _get_pool_by_resource(self, resource_id):
         pools = [p for p in self.pools.values() if resource_id in p.resources]
         return pools[0] if pools else None
@@ -184,9 +184,19 @@ class ResourcePool(ABC):
         default local filesystem pool, the path is not set yet and must be
         updated after connecting the pool to a worker node.
         """
-        r, o = node.proxy.resource.create_pool_connection(
+        result = node.proxy.resource.create_pool_connection(
             self.customize_pool_config(node.name)
         )
+        return self.attached_to(node, result)
+
+    def attached_to(self, node, result):
+        """
+        Record the connection of the pool to a specific worker node.
+
+        :param result: The result of create_pool_connection on the node,
+                       which can be called directly or in a batch
+        """
+        r, o = result
         if r != 0:
             raise Exception(o["out"])
         self.connected_nodes.append(node)
@@ -197,7 +207,16 @@ class ResourcePool(ABC):
         Detach the pool from a specific worker node
         Then it cannot be accessed from the node.
         """
-        r, o = node.proxy.resource.destroy_pool_connection(self.uuid)
+        result = node.proxy.resource.destroy_pool_connection(self.uuid)
+        return self.detached_from(node, result)
+
+    def detached_from(self, node, result):
+        """
+        Record the disconnection of the pool from a specific worker node.
+
+        :param result: The result of destroy_pool_connection on the node
+        """
+        r, o = result
         if r != 0:
             raise Exception(o["out"])
         self.connected_nodes.remove(node)
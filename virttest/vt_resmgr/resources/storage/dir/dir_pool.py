@@ -58,8 +58,8 @@ class DirPool(ResourcePool):
         config["spec"]["path"] = pool_params.get("path", "")
         return config
 
-    def attach_to(self, node):
-        r, o = super().attach_to(node)
+    def attached_to(self, node, result):
+        r, o = super().attached_to(node, result)
 
         # The path can be updated only when attaching it to a node
         self.spec["path"] = o["out"]["spec"]["path"]
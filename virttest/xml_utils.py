@@ -25,6 +25,10 @@ temporary) is provided by the sourcefilename attribute, and a (closed)
 file object attribute sourcebackupfile.  See the ElementTree documentation
 for methods provided by that class.
 
+The LazyXMLTreeFile class provides the same interface as XMLTreeFile but
+keeps the XML in memory, only creating its temporary file when the name
+attribute is requested.
+
 Finally, the TemplateXML class represents XML templates that support
 dynamic keyword substitution based on a dictionary.  Substitution keys
 in the XML template (string or file) follow the 'bash' variable reference
@@ -361,6 +365,117 @@ class XMLTreeFile(ElementTree.ElementTree, XMLBackup):
         return super().find(path)
 
 
+class LazyXMLTreeFile(XMLTreeFile):
+    """
+    XMLTreeFile kept in memory, backed by a temporary file only on demand.
+
+    Parsing, copying and stringifying never touch the disk.  The temporary
+    file is created the first time the name attribute is requested (e.g. to
+    hand it over to virsh) and rewritten whenever the tree changed since.
+    """
+
+    def __init__(self, xml):
+        """
+        Initialize from a string or filename containing XML source.
+
+        param: xml: A filename or string containing XML
+        """
+
+        self._tempfile = None
+        self._written = None
+        try:
+            with open(xml, "r") as source_file:
+                self._source = source_file.read()
+            self.sourcefilename = xml
+        except (IOError, OSError):
+            # Assume xml is a string, kept in memory as the original source
+            self._source = xml
+        self._parse(self._source)
+
+    def _parse(self, source):
+        try:
+            ElementTree.ElementTree.__init__(
+                self, element=ElementTree.fromstring(source)
+            )
+        except expat.ExpatError:
+            raise IOError("Error parsing XML: '%s'" % source)
+
+    @property
+    def name(self):
+        """Filename of the temporary file holding the current tree"""
+        if self._tempfile is None:
+            self._tempfile = TempXMLFile()
+            self._tempfile.close()
+        xmlstr = str(self)
+        if xmlstr != self._written:
+            self._write_tempfile(xmlstr)
+        return self._tempfile.name
+
+    def _write_tempfile(self, xmlstr):
+        with open(self._tempfile.name, "w") as tempfile_obj:
+            tempfile_obj.write(xmlstr)
+        self._written = xmlstr
+
+    def __str__(self):
+        return ElementTree.tostring(self.getroot(), encoding=ENCODING)
+
+    def write(self, filename=None, encoding=ENCODING):
+        """
+        Write current XML tree to filename, or the temporary file if any.
+        """
+
+        if filename is not None:
+            ElementTree.ElementTree.write(self, filename, encoding)
+        elif self._tempfile is not None:
+            self._write_tempfile(str(self))
+
+    def read(self, xml):
+        try:
+            ElementTree.ElementTree.__init__(self, element=None, file=xml)
+        except expat.ExpatError:
+            raise IOError("Error parsing XML: '%s'" % xml)
+        self.write()
+
+    def flush(self):
+        pass
+
+    def close(self):
+        pass
+
+    def backup(self):
+        """Overwrite original source from current tree"""
+        self._source = str(self)
+        if self.sourcefilename is not None:
+            ElementTree.ElementTree.write(self, self.sourcefilename, ENCODING)
+
+    def restore(self):
+        """Overwrite and reparse current tree from original source"""
+        if self.sourcefilename is not None:
+            with open(self.sourcefilename, "r") as source_file:
+                self._source = source_file.read()
+        self._parse(self._source)
+        self.write()
+
+    def backup_copy(self):
+        """Return a copy of instance"""
+        return self.__class__(str(self))
+
+    def unlink(self):
+        """
+        Delete the temporary file, if it was ever created
+        """
+        if self._tempfile is not None:
+            self._tempfile.unlink()
+            self._tempfile = None
+            self._written = None
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.unlink()
+
+    def __del__(self):
+        self.unlink()
+
+
 class Sub(object):
     """String substituter using string.Template"""
 